@@ -0,0 +1,240 @@
+"""Micro-benchmarks of CPU hot spots, compared against committed baselines.
+
+Each benchmark times one hot function on synthetic input, without network access:
+
+    bigquery_query_parameters   CyberbizBigQueryClient._build_query_parameters with a 512-float embedding
+    product_decode              ProductRepository._parse_product of a Storefront product JSON object
+    discover_response_serialize FastMCP's tool result serialization of a 10-product DiscoverProductsResponse
+    vector_search_sql           filters and SQL built for search_by_vector_similarity
+    shop_context_dispatch       ShopContextMiddleware.dispatch around a no-op endpoint
+
+Timings are the best of several repeats, in nanoseconds per call. They are also divided by a
+fixed pure-Python calibration workload, so that baselines recorded on one machine can be compared
+on another: a regression is a slowdown of the normalized time beyond the tolerance.
+
+Usage:
+    python benchmarks/micro.py run [--filter product]
+    python benchmarks/micro.py save                    # record benchmarks/micro_baseline.json
+    python benchmarks/micro.py compare [--tolerance 0.15]   # exit status 1 on regressions
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import timeit
+from pathlib import Path
+from typing import Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from product_memory import product_json  # noqa: E402
+
+# Config requires a port, though nothing is served
+os.environ.setdefault("PORT", "8000")
+
+BASELINE_PATH = Path(__file__).resolve().parent / "micro_baseline.json"
+# Oldest Python supported by the server (requires-python in pyproject.toml); baselines are only recorded on it or later
+MIN_PYTHON = (3, 14)
+REPEAT = 7
+
+# Benchmark name -> setup returning (function to time, operations per call)
+BENCHMARKS: dict[str, Callable[[], tuple[Callable[[], object], int]]] = {}
+
+
+def benchmark(func: Callable[[], tuple[Callable[[], object], int]]):
+    BENCHMARKS[func.__name__] = func
+    return func
+
+
+def calibration() -> tuple[Callable[[], object], int]:
+    """Fixed interpreter workload (dict, string and arithmetic operations) used as the unit of time."""
+
+    def work() -> int:
+        values = {}
+        for i in range(200):
+            values[f"k{i}"] = i * 3 % 7
+        return sum(len(key) + value for key, value in values.items())
+
+    return work, 1
+
+
+@benchmark
+def bigquery_query_parameters() -> tuple[Callable[[], object], int]:
+    from services.cyberbiz_bigquery_client import CyberbizBigQueryClient
+
+    client = CyberbizBigQueryClient(client=None, shop_id=1)  # type: ignore[arg-type]
+    params = {
+        "shop_id": 1,
+        "embedding": [((i * 7919) % 1000) / 1000 - 0.5 for i in range(512)],
+        "limit": 100,
+        "threshold": 0.2,
+        "min_price": 100.0,
+        "genre": "normal",
+    }
+    return lambda: client._build_query_parameters(params), 1
+
+
+@benchmark
+def product_decode() -> tuple[Callable[[], object], int]:
+    from repositories.product_repository import ProductRepository
+
+    data = product_json(1, 4)
+    return lambda: ProductRepository._parse_product(data), 1
+
+
+@benchmark
+def discover_response_serialize() -> tuple[Callable[[], object], int]:
+    from fastmcp.tools.tool import default_serializer
+
+    from models.product import Product
+    from tools.discover_products import DiscoverProductsResponse
+
+    response = DiscoverProductsResponse(
+        status="success",
+        products=[Product.model_validate(product_json(product_id, 4)) for product_id in range(1, 11)],
+    )
+    return lambda: default_serializer(response), 1
+
+
+@benchmark
+def vector_search_sql() -> tuple[Callable[[], object], int]:
+    from repositories.product_repository import ProductRepository
+    from services.vector_search_options import VectorSearchOptions
+
+    options = VectorSearchOptions(fraction_lists_to_search=0.05)
+
+    def build() -> str:
+        where_filter, _ = ProductRepository._build_vector_filters(100.0, 2000.0, "shop", "normal")
+        return ProductRepository._vector_search_sql(where_filter, options)
+
+    return build, 1
+
+
+@benchmark
+def shop_context_dispatch() -> tuple[Callable[[], object], int]:
+    from starlette.requests import Request
+    from starlette.responses import Response
+
+    from middleware import ShopContextMiddleware
+
+    middleware = ShopContextMiddleware(app=None)  # type: ignore[arg-type]
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/mcp",
+        "query_string": b"",
+        "headers": [(b"x-shop-id", b"1234"), (b"x-shop-domain", b"shop.cyberbiz.co")],
+    }
+    response = Response()
+
+    async def call_next(request: Request) -> Response:
+        return response
+
+    batch = 1000
+
+    async def dispatch_batch() -> None:
+        for _ in range(batch):
+            await middleware.dispatch(Request(scope), call_next)
+
+    loop = asyncio.new_event_loop()
+    return lambda: loop.run_until_complete(dispatch_batch()), batch
+
+
+def measure(setup: Callable[[], tuple[Callable[[], object], int]]) -> float:
+    """Best time of REPEAT runs, in nanoseconds per operation."""
+    func, operations = setup()
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=REPEAT, number=number)) / number / operations * 1e9
+
+
+def run(name_filter: str | None) -> dict:
+    """Measure the calibration workload and every benchmark whose dependencies are installed."""
+    # Measured before and after the benchmarks, as the first measurement may run on a CPU still ramping up
+    calibration_ns = measure(calibration)
+    results: dict = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "calibration_ns": calibration_ns,
+        "benchmarks": {},
+        "skipped": {},
+    }
+    for name, setup in BENCHMARKS.items():
+        if name_filter and name_filter not in name:
+            continue
+        try:
+            results["benchmarks"][name] = measure(setup)
+        except ImportError as e:
+            results["skipped"][name] = f"missing dependency: {e.name}"
+    results["calibration_ns"] = min(calibration_ns, measure(calibration))
+    return results
+
+
+def print_results(results: dict) -> None:
+    print(f"Python {results['python']} ({results['machine']}), calibration {results['calibration_ns']:.0f} ns")
+    print(f"{'benchmark':<30}{'ns/op':>14}{'calibrated':>12}")
+    for name, nanoseconds in results["benchmarks"].items():
+        print(f"{name:<30}{nanoseconds:>14.0f}{nanoseconds / results['calibration_ns']:>12.3f}")
+    for name, reason in results["skipped"].items():
+        print(f"{name:<30}{'skipped, ' + reason:>26}")
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> bool:
+    """Print the change of every benchmark against the baseline, returning whether none regressed."""
+    print(f"{'benchmark':<30}{'baseline':>12}{'current':>12}{'change':>9}")
+    ok = True
+    for name, nanoseconds in results["benchmarks"].items():
+        if name not in baseline["benchmarks"]:
+            print(f"{name:<30}{'no baseline':>12}")
+            continue
+        current = nanoseconds / results["calibration_ns"]
+        previous = baseline["benchmarks"][name] / baseline["calibration_ns"]
+        change = current / previous - 1
+        regressed = change > tolerance
+        ok = ok and not regressed
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<30}{previous:>12.3f}{current:>12.3f}{change:>+9.1%}{flag}")
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["run", "save", "compare"])
+    parser.add_argument("--filter", help="Only run benchmarks whose name contains this text")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed slowdown, e.g. 0.15 for 15%%")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    args = parser.parse_args()
+
+    python = f"{sys.version_info.major}.{sys.version_info.minor}"
+    if args.command == "save" and sys.version_info < MIN_PYTHON:
+        required = ".".join(map(str, MIN_PYTHON))
+        sys.exit(f"Not saving a baseline on Python {python}, the server requires Python {required} or later")
+    baseline: dict = {}
+    if args.command == "compare":
+        if not args.baseline.exists():
+            sys.exit(f"No baseline at {args.baseline}, record one with: python benchmarks/micro.py save")
+        baseline = json.loads(args.baseline.read_text())
+        # Interpreter releases change the speed of the calibration and of the benchmarks differently
+        if baseline["python"].rsplit(".", 1)[0] != python:
+            sys.exit(f"Baseline recorded on Python {baseline['python']}, compare with the same Python version")
+
+    results = run(args.filter)
+    print_results(results)
+
+    if args.command == "save":
+        if results["skipped"]:
+            sys.exit("Not saving a baseline with skipped benchmarks, install all dependencies first")
+        args.baseline.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"Saved {args.baseline}")
+    elif args.command == "compare":
+        print()
+        if not compare(results, baseline, args.tolerance):
+            sys.exit(f"Regressions beyond {args.tolerance:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Memory benchmark of cached products: pydantic Product trees vs CompactProduct.
+
+Builds synthetic catalogs shaped like Storefront product JSON and reports the heap
+used per 10k products in each representation.
+
+Usage:
+    python benchmarks/product_memory.py [--products 10000] [--variants 4]
+"""
+
+import argparse
+import gc
+import json
+import random
+import sys
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from models.compact_product import CompactProduct  # noqa: E402
+from models.product import Product  # noqa: E402
+
+VENDORS = [f"品牌{i}" for i in range(50)]
+PRODUCT_TYPES = ["上衣", "褲子", "外套", "鞋子", "配件", "保養品", "食品", "票券"]
+CHANNELS = ["online", "pos"]
+SIZES = ["S", "M", "L", "XL"]
+
+
+def product_json(product_id: int, variant_count: int) -> dict:
+    """Synthetic Storefront product JSON."""
+    rng = random.Random(product_id)
+    image_base = f"https://cdn.cybassets.com/media/W1siZiIsIjEzNjYx/products/{product_id}/"
+    photos = [f"{image_base}{rng.getrandbits(64):016x}.jpg" for _ in range(3)]
+    variants = []
+    for index in range(variant_count):
+        photo = photos[index % len(photos)]
+        variants.append(
+            {
+                "id": product_id * 100 + index,
+                "title": f"{SIZES[index % len(SIZES)]} / 黑色",
+                "name": f"商品 {product_id} - {SIZES[index % len(SIZES)]}",
+                "options": [SIZES[index % len(SIZES)], "黑色"],
+                "price": float(rng.randint(100, 5000)),
+                "compare_at_price": None,
+                "max_usable_bonus": 0,
+                "inventory_availability": "in_stock",
+                "weight": 0.5,
+                "quantity": rng.randint(0, 100),
+                "featured_image": {"src": photo, "alt": None, "position": index % len(photos) + 1},
+                "photo_urls": [
+                    {
+                        "thumb": photo.replace(".jpg", "_thumb.jpg"),
+                        "large": photo.replace(".jpg", "_large.jpg"),
+                        "original": photo,
+                    }
+                ],
+            }
+        )
+    return {
+        "id": product_id,
+        "title": f"經典款商品 {product_id}",
+        "handle": f"product-{product_id}",
+        "price": variants[0]["price"],
+        "photo_urls": photos,
+        "brief": "舒適透氣，日常穿搭首選。" * 3,
+        "slogan": None,
+        "vendor": rng.choice(VENDORS),
+        "channel": rng.choice(CHANNELS),
+        "temperature_types": ["normal"],
+        "product_type": rng.choice(PRODUCT_TYPES),
+        "store_type": "shop",
+        "genre": "normal",
+        "product_url": f"https://shop.example.com/products/product-{product_id}",
+        "descriptions": [{"type": "description", "body_html": "<p>" + "商品詳細說明。" * 40 + "</p>"}],
+        "options": [{"name": "尺寸", "types": SIZES}, {"name": "顏色", "types": ["黑色"]}],
+        "variants": variants,
+    }
+
+
+def measure(build) -> tuple[int, object]:
+    """Heap bytes retained by the object returned by build()."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return retained, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=10_000)
+    parser.add_argument("--variants", type=int, default=4)
+    args = parser.parse_args()
+
+    # Both representations are built from the encoded JSON, so that neither shares strings with the other
+    payloads = [json.dumps(product_json(product_id, args.variants)) for product_id in range(1, args.products + 1)]
+    products_size, products = measure(lambda: [Product.model_validate_json(payload) for payload in payloads])
+    compact_size, compact = measure(
+        lambda: [CompactProduct.from_product(Product.model_validate_json(payload)) for payload in payloads]
+    )
+
+    assert all(packed.to_product() == product for packed, product in zip(compact, products))
+
+    scale = 10_000 / args.products
+    print(f"{args.products} products, {args.variants} variants each")
+    print(f"{'representation':<16}{'MiB per 10k':>12}{'bytes/product':>15}")
+    for name, size in (("Product", products_size), ("CompactProduct", compact_size)):
+        print(f"{name:<16}{size * scale / 2**20:>12.1f}{size / args.products:>15.0f}")
+    print(f"reduction: {1 - compact_size / products_size:.0%}")
+
+
+if __name__ == "__main__":
+    main()
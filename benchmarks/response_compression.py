@@ -0,0 +1,61 @@
+"""CPU and size benchmark of response compression.
+
+Serializes representative product lists (like a discover_products response) the way
+FastMCP serializes tool results, then compresses them with gzip (and brotli if installed).
+
+Usage:
+    python benchmarks/response_compression.py [--products 10 50] [--repeat 200]
+"""
+
+import argparse
+import gzip
+import sys
+import time
+from pathlib import Path
+
+from fastmcp.tools.tool import default_serializer
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from product_memory import product_json  # noqa: E402
+
+from models.product import Product, ProductSearchResult  # noqa: E402
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def timed(func, repeat: int) -> tuple[float, object]:
+    """Average milliseconds per call and the last result."""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return (time.perf_counter() - started) * 1000 / repeat, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, nargs="+", default=[10, 50])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    for count in args.products:
+        result = ProductSearchResult(
+            products=[Product.model_validate(product_json(product_id, 4)) for product_id in range(1, count + 1)]
+        )
+        body = default_serializer(result).encode()
+        print(f"\n{count} products")
+        print(f"{'compression':<24}{'ms':>8}{'bytes':>10}")
+        print(f"{'none':<24}{0:>8.3f}{len(body):>10}")
+        elapsed_ms, compressed = timed(lambda: gzip.compress(body, compresslevel=6), args.repeat)
+        print(f"{'gzip (level 6)':<24}{elapsed_ms:>8.3f}{len(compressed):>10}")
+        if brotli is not None:
+            elapsed_ms, compressed = timed(lambda: brotli.compress(body, quality=4), args.repeat)
+            print(f"{'brotli (quality 4)':<24}{elapsed_ms:>8.3f}{len(compressed):>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Recall, latency and cost benchmark of VECTOR_SEARCH options on a shop's real product embeddings.
+
+Runs every query with brute force (exact search, the ground truth) and then with BigQuery's default
+options and each fraction_lists_to_search. Reports recall@k against the exact results, latency
+percentiles, and the bytes billed and slot time recorded by the BigQuery ledger, so that
+VECTOR_SEARCH_OPTIONS can be chosen per shop from measurements.
+
+Needs the same GCP credentials and environment (.env) as the server, and bills BigQuery jobs.
+BigQuery's query cache is left on: rerunning the benchmark shows cached results, see the cache column.
+
+Usage:
+    python benchmarks/vector_search_recall.py --shop-id 1234 --queries-file queries.txt \\
+        [--k 10] [--fractions 0.002,0.01,0.05,0.2]
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from dependencies import get_bigquery_base_client  # noqa: E402
+from repositories.product_repository import ProductRepository  # noqa: E402
+from services.bigquery_ledger import BigQueryLedger  # noqa: E402
+from services.cyberbiz_bigquery_client import CyberbizBigQueryClient  # noqa: E402
+from services.embedding_client import EmbeddingClient  # noqa: E402
+from services.vector_search_options import VectorSearchOptions  # noqa: E402
+
+
+async def search(
+    client: CyberbizBigQueryClient, embedding: list[float], k: int, options: VectorSearchOptions
+) -> tuple[list[int], float]:
+    """Top k product ids of one query and the milliseconds the search took."""
+    sql = ProductRepository._vector_search_sql("", options)
+    # No similarity threshold, recall is measured on the raw top k
+    params = {"embedding": embedding, "limit": k, "threshold": -1.0}
+    started = time.perf_counter()
+    rows = await client.query(sql, params, kind=options.label())
+    return [row["product_id"] for row in rows], (time.perf_counter() - started) * 1000
+
+
+async def run(shop_id: int, queries: list[str], k: int, fractions: list[float]) -> None:
+    ledger = BigQueryLedger()
+    # No byte limits, brute force on a large shop is expected to exceed them
+    client = CyberbizBigQueryClient(get_bigquery_base_client(), shop_id, ledger=ledger)
+    embeddings = await EmbeddingClient().generate_embeddings(queries)
+
+    settings = [VectorSearchOptions(use_brute_force=True), VectorSearchOptions()]
+    settings += [VectorSearchOptions(fraction_lists_to_search=fraction) for fraction in fractions]
+    results: dict[str, list[tuple[list[int], float]]] = {}
+    for options in settings:
+        results[options.label()] = [await search(client, embedding, k, options) for embedding in embeddings]
+
+    exact = [set(ids) for ids, _ in results["brute_force"]]
+    stats = {s["kind"]: s for s in ledger.snapshot(shop_id)}
+    print(f"shop {shop_id}, {len(queries)} queries, recall@{k}")
+    print(
+        f"{'options':<34}{'recall':>8}{'p50 ms':>9}{'p95 ms':>9}{'MB billed/q':>13}{'slot ms/q':>11}{'cache':>7}"
+    )
+    for label, runs in results.items():
+        recall = statistics.fmean(
+            len(expected & set(ids)) / len(expected) if expected else 1.0 for expected, (ids, _) in zip(exact, runs)
+        )
+        latencies = [latency for _, latency in runs]
+        p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else latencies[0]
+        kind = stats[label]
+        print(
+            f"{label:<34}{recall:>8.3f}{statistics.median(latencies):>9.0f}{p95:>9.0f}"
+            f"{kind['bytes_billed'] / kind['jobs'] / 1e6:>13.1f}{kind['slot_ms'] / kind['jobs']:>11.0f}"
+            f"{kind['cache_hits']:>7}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shop-id", type=int, required=True)
+    parser.add_argument("--queries-file", type=Path, help="One query per line")
+    parser.add_argument("--query", action="append", default=[], help="A query, may be repeated")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--fractions", default="0.002,0.01,0.05,0.2", help="Comma separated fraction_lists_to_search")
+    args = parser.parse_args()
+
+    queries = list(args.query)
+    if args.queries_file:
+        queries += [line.strip() for line in args.queries_file.read_text(encoding="utf-8").splitlines() if line.strip()]
+    if not queries:
+        parser.error("give at least one --query or a --queries-file")
+    fractions = [float(fraction) for fraction in args.fractions.split(",") if fraction.strip()]
+    asyncio.run(run(args.shop_id, queries, args.k, fractions))
+
+
+if __name__ == "__main__":
+    main()
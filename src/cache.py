@@ -0,0 +1,231 @@
+"""In-process caches, sharing one memory budget."""
+
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Generic, Hashable, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+# Least recently used entries of each cache compared when choosing what to evict for the budget
+EVICTION_SAMPLE = 5
+
+
+def estimate_size(value: Any) -> int:
+    """
+    Estimate the bytes held by a value and everything it references, counting shared objects once.
+
+    Follows containers, object __dict__ and __slots__, so it covers pydantic models and dataclasses.
+    """
+    seen: set[int] = set()
+    size = 0
+    stack = [value]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or obj is None or isinstance(obj, (bool, type)):
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, (str, bytes, bytearray, int, float)):
+            continue
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        else:
+            if hasattr(obj, "__dict__"):
+                stack.append(vars(obj))
+            for cls in type(obj).__mro__:
+                for slot in getattr(cls, "__slots__", ()):
+                    if hasattr(obj, slot):
+                        stack.append(getattr(obj, slot))
+    return size
+
+
+class _Entry:
+    __slots__ = ("expires_at", "value", "size", "hits")
+
+    def __init__(self, expires_at: float, value: Any, size: int):
+        self.expires_at = expires_at
+        self.value = value
+        self.size = size
+        self.hits = 0
+
+
+class MemoryBudget:
+    """
+    Global limit on the estimated bytes held by all registered caches.
+
+    When the caches together exceed the budget, entries are evicted across caches by cost and
+    benefit: among the least recently used entries of every cache, the one with the fewest hits
+    per byte goes first, so a large, rarely hit entry is evicted before a small, popular one.
+    """
+
+    def __init__(self, max_bytes: int):
+        """
+        Initialize memory budget.
+
+        Args:
+            max_bytes: Maximum estimated bytes held by all registered caches
+        """
+        self.max_bytes = max_bytes
+        self.used_bytes = 0
+        self._caches: dict[str, "TTLCache"] = {}
+
+    def register(self, name: str, cache: "TTLCache") -> None:
+        """Add a cache to the budget, replacing a cache registered under the same name."""
+        previous = self._caches.get(name)
+        if previous is not None:
+            self.used_bytes -= previous.bytes
+        self._caches[name] = cache
+        self.used_bytes += cache.bytes
+
+    def charge(self, delta: int) -> None:
+        """Record bytes added to (or, if negative, removed from) a registered cache."""
+        self.used_bytes += delta
+
+    def enforce(self) -> None:
+        """Evict entries across caches until the budget is met."""
+        while self.used_bytes > self.max_bytes:
+            victim: tuple[float, TTLCache, Hashable] | None = None
+            for cache in self._caches.values():
+                candidate = cache._eviction_candidate()
+                if candidate is not None and (victim is None or candidate[0] < victim[0]):
+                    victim = (candidate[0], cache, candidate[1])
+            if victim is None:
+                return
+            victim[1]._evict(victim[2])
+
+    def snapshot(self) -> dict:
+        """Budget usage, and per cache its entries, bytes, hits, misses and evictions for the budget."""
+        return {
+            "max_bytes": self.max_bytes,
+            "used_bytes": self.used_bytes,
+            "caches": {
+                name: {
+                    "entries": len(cache),
+                    "bytes": cache.bytes,
+                    "hits": cache.hits,
+                    "misses": cache.misses,
+                    "evictions": cache.evictions,
+                }
+                for name, cache in sorted(self._caches.items())
+            },
+        }
+
+
+class TTLCache(Generic[K, V]):
+    """LRU cache whose entries expire after a fixed time-to-live."""
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        budget: MemoryBudget | None = None,
+        name: str | None = None,
+        sizeof: Callable[[V], int] = estimate_size,
+        on_evict: Callable[[K], None] | None = None,
+    ):
+        """
+        Initialize TTL cache.
+
+        Args:
+            maxsize: Maximum number of entries, least recently used entries are evicted first
+            ttl: Seconds after which an entry expires, unless set with its own ttl
+            budget: Optional memory budget shared with other caches, which may evict entries of this cache
+            name: Name of the cache in the budget's report, required with a budget
+            sizeof: Estimates the bytes of a value, used with a budget
+            on_evict: Called with the key of each entry the budget evicts
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.budget = budget
+        self.sizeof = sizeof
+        self.on_evict = on_evict
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[K, _Entry] = OrderedDict()
+        if budget is not None:
+            if name is None:
+                raise ValueError("A cache with a memory budget needs a name")
+            budget.register(name, self)
+
+    def get(self, key: K) -> V | None:
+        """Get a value, or None if it is missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        entry.hits += 1
+        self.hits += 1
+        return entry.value
+
+    def peek(self, key: K) -> V | None:
+        """Get a value like get(), without counting a hit or miss or making it recently used."""
+        entry = self._entries.get(key)
+        if entry is None or entry.expires_at <= time.monotonic():
+            return None
+        return entry.value
+
+    def set(self, key: K, value: V, ttl: float | None = None) -> None:
+        """Store a value, evicting the least recently used entry if the cache is full."""
+        size = self.sizeof(value) if self.budget is not None else 0
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = _Entry(time.monotonic() + (self.ttl if ttl is None else ttl), value, size)
+        self._charge(size)
+        while len(self._entries) > self.maxsize:
+            self._remove(next(iter(self._entries)))
+        if self.budget is not None:
+            self.budget.enforce()
+
+    def pop(self, key: K) -> V | None:
+        """Remove a value, returning it if it was present."""
+        if key not in self._entries:
+            return None
+        return self._remove(key).value
+
+    def __contains__(self, key: K) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry.expires_at > time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key: K) -> _Entry:
+        entry = self._entries.pop(key)
+        self._charge(-entry.size)
+        return entry
+
+    def _charge(self, delta: int) -> None:
+        self.bytes += delta
+        if self.budget is not None:
+            self.budget.charge(delta)
+
+    def _eviction_candidate(self) -> tuple[float, K] | None:
+        """(score, key) of the sampled least recently used entry with the fewest hits per byte, if any."""
+        now = time.monotonic()
+        best: tuple[float, K] | None = None
+        for index, (key, entry) in enumerate(self._entries.items()):
+            if index >= EVICTION_SAMPLE:
+                break
+            # Expired entries cost memory for no benefit
+            score = -1.0 if entry.expires_at <= now else (entry.hits + 1) / max(entry.size, 1)
+            if best is None or score < best[0]:
+                best = (score, key)
+        return best
+
+    def _evict(self, key: K) -> None:
+        self._remove(key)
+        self.evictions += 1
+        if self.on_evict is not None:
+            self.on_evict(key)
@@ -1,5 +1,6 @@
 """Configuration settings for the MCP server."""
 
+import logging
 import os
 
 from dotenv import load_dotenv
@@ -7,6 +8,26 @@ from dotenv import load_dotenv
 # Load .env file before reading environment variables
 load_dotenv(dotenv_path=os.getenv("ENV_FILE", ".env"))
 
+logger = logging.getLogger(__name__)
+
+
+def _parse_byte_limits(value: str) -> dict[str, int]:
+    """
+    Parse "kind=bytes,kind=bytes" into a dict, e.g. "default=10000000000,vector_search=2000000000".
+
+    A malformed value is logged and parsed as no limits, rather than failing at import.
+    """
+    limits = {}
+    for item in value.split(","):
+        if item.strip():
+            kind, _, limit = item.partition("=")
+            try:
+                limits[kind.strip()] = int(limit)
+            except ValueError:
+                logger.error("Invalid BIGQUERY_MAX_BYTES_BILLED %r, queries are not byte limited", value)
+                return {}
+    return limits
+
 
 class Config:
     """Configuration class that loads from environment variables with sensible defaults."""
@@ -16,10 +37,117 @@ class Config:
     PORT: int = int(os.getenv("PORT", ""))
     TRANSPORT: str = os.getenv("TRANSPORT", "")
 
+    # Logging: level, "json" or "text" lines, and fraction of high-volume per-request messages kept
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "WARNING")
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "json")
+    LOG_SAMPLE_RATE: float = float(os.getenv("LOG_SAMPLE_RATE", "0.01"))
+
+    # Bearer token of the /debug/profile route, which is disabled when empty
+    DEBUG_TOKEN: str = os.getenv("DEBUG_TOKEN", "")
+    DEBUG_PROFILE_MAX_SECONDS: float = float(os.getenv("DEBUG_PROFILE_MAX_SECONDS", "300"))
+
+    # Bearer token of the /metrics route, which is disabled when empty
+    METRICS_TOKEN: str = os.getenv("METRICS_TOKEN", "")
+
+    # gzip/brotli compression of HTTP responses larger than RESPONSE_COMPRESSION_MIN_SIZE bytes
+    RESPONSE_COMPRESSION_ENABLED: bool = os.getenv("RESPONSE_COMPRESSION_ENABLED", "true").lower() == "true"
+    RESPONSE_COMPRESSION_MIN_SIZE: int = int(os.getenv("RESPONSE_COMPRESSION_MIN_SIZE", "1024"))
+
+    # Stateless streamable-http: no MCP session is pinned to a replica, so any replica can serve any request
+    STATELESS_HTTP: bool = os.getenv("STATELESS_HTTP", "false").lower() == "true"
+    # Store of search cursors and idempotent results: redis://... shared by all replicas, or empty for in-process
+    STATE_STORE_URL: str = os.getenv("STATE_STORE_URL", "")
+    STATE_STORE_MAX_ENTRIES: int = int(os.getenv("STATE_STORE_MAX_ENTRIES", "12000"))
+    # Idempotent results kept by the in-process store, apart from search cursors so that they cannot evict them
+    IDEMPOTENCY_MAX_ENTRIES: int = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "10000"))
+
+    # Bearer token of the /webhooks/product-changes route, which is disabled when empty. Change events are kept
+    # CACHE_INVALIDATION_RETENTION seconds and applied by every replica within CACHE_INVALIDATION_POLL_INTERVAL seconds
+    CACHE_INVALIDATION_TOKEN: str = os.getenv("CACHE_INVALIDATION_TOKEN", "")
+    CACHE_INVALIDATION_RETENTION: float = float(os.getenv("CACHE_INVALIDATION_RETENTION", "86400"))
+    CACHE_INVALIDATION_POLL_INTERVAL: float = float(os.getenv("CACHE_INVALIDATION_POLL_INTERVAL", "2"))
+
+    # Estimated bytes all in-process caches may hold together before evicting each other's entries
+    MEMORY_BUDGET_BYTES: int = int(os.getenv("MEMORY_BUDGET_BYTES", str(256 * 1024 * 1024)))
+
+    # Seconds a tool call may take, including all its upstream calls
+    REQUEST_TIMEOUT: float = float(os.getenv("REQUEST_TIMEOUT", "60"))
+
     # GCP for AI
     CYBERBIZ_GCP_PROJECT_ID: str = os.getenv("CYBERBIZ_GCP_PROJECT_ID", "")
     CYBERBIZ_GENAI_LOCATION: str = os.getenv("CYBERBIZ_GENAI_LOCATION", "")
 
+    # Storefront API request hedging
+    STOREFRONT_HEDGING_ENABLED: bool = os.getenv("STOREFRONT_HEDGING_ENABLED", "false").lower() == "true"
+    STOREFRONT_HEDGE_PERCENTILE: float = float(os.getenv("STOREFRONT_HEDGE_PERCENTILE", "95"))
+    STOREFRONT_HEDGE_BUDGET_RATIO: float = float(os.getenv("STOREFRONT_HEDGE_BUDGET_RATIO", "0.05"))
+
+    # Conditional revalidation (ETag/Last-Modified) of cached Storefront product responses
+    STOREFRONT_REVALIDATION_ENABLED: bool = os.getenv("STOREFRONT_REVALIDATION_ENABLED", "true").lower() == "true"
+    STOREFRONT_REVALIDATION_MAX_ENTRIES: int = int(os.getenv("STOREFRONT_REVALIDATION_MAX_ENTRIES", "5000"))
+    STOREFRONT_REVALIDATION_TTL: float = float(os.getenv("STOREFRONT_REVALIDATION_TTL", "3600"))
+
+    # Product details fetched PRODUCT_BULK_FETCH_SIZE at a time through the list endpoint filtered by ID,
+    # or with at most PRODUCT_DETAIL_CONCURRENCY concurrent requests per call where bulk fetches are unsupported
+    PRODUCT_BULK_FETCH_ENABLED: bool = os.getenv("PRODUCT_BULK_FETCH_ENABLED", "true").lower() == "true"
+    PRODUCT_BULK_FETCH_SIZE: int = int(os.getenv("PRODUCT_BULK_FETCH_SIZE", "50"))
+    PRODUCT_DETAIL_CONCURRENCY: int = int(os.getenv("PRODUCT_DETAIL_CONCURRENCY", "10"))
+    # Storefront API values of a variant's inventory_availability meaning it cannot be purchased, comma-separated
+    UNAVAILABLE_INVENTORY_AVAILABILITY: frozenset[str] = frozenset(
+        value.strip()
+        for value in os.getenv("UNAVAILABLE_INVENTORY_AVAILABILITY", "out_of_stock,sold_out,unavailable").split(",")
+        if value.strip()
+    )
+
+    # Vector search pagination: candidates fetched once and served page by page through a cursor
+    VECTOR_SEARCH_CANDIDATE_DEPTH: int = int(os.getenv("VECTOR_SEARCH_CANDIDATE_DEPTH", "100"))
+    SEARCH_CURSOR_TTL: float = float(os.getenv("SEARCH_CURSOR_TTL", "900"))
+    # VECTOR_SEARCH options by shop_id as JSON, e.g. {"default": {"fraction_lists_to_search": 0.05},
+    # "1234": {"use_brute_force": true}}; empty for BigQuery's defaults
+    VECTOR_SEARCH_OPTIONS: str = os.getenv("VECTOR_SEARCH_OPTIONS", "")
+    # Highest fraction_lists_to_search a client may request with X-Vector-Search-Options
+    VECTOR_SEARCH_MAX_REQUESTED_FRACTION: float = float(os.getenv("VECTOR_SEARCH_MAX_REQUESTED_FRACTION", "0.1"))
+
+    # Query embedding cache, vectors stored as float32, float16 or int8
+    EMBEDDING_CACHE_MAX_ENTRIES: int = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "10000"))
+    EMBEDDING_CACHE_TTL: float = float(os.getenv("EMBEDDING_CACHE_TTL", "3600"))
+    EMBEDDING_CACHE_DTYPE: str = os.getenv("EMBEDDING_CACHE_DTYPE", "float32")
+
+    # Local catalog snapshot serving product list and detail reads
+    CATALOG_SNAPSHOT_ENABLED: bool = os.getenv("CATALOG_SNAPSHOT_ENABLED", "false").lower() == "true"
+    CATALOG_SNAPSHOT_PATH: str = os.getenv("CATALOG_SNAPSHOT_PATH", "catalog_snapshot.db")
+    CATALOG_SNAPSHOT_MAX_STALENESS: float = float(os.getenv("CATALOG_SNAPSHOT_MAX_STALENESS", "900"))
+    CATALOG_SYNC_INTERVAL: float = float(os.getenv("CATALOG_SYNC_INTERVAL", "300"))
+    CATALOG_FULL_SYNC_INTERVAL: float = float(os.getenv("CATALOG_FULL_SYNC_INTERVAL", "21600"))
+    CATALOG_SYNC_PAGE_SIZE: int = int(os.getenv("CATALOG_SYNC_PAGE_SIZE", "50"))
+    # In-memory BM25 index built from the snapshot, answering keyword searches
+    KEYWORD_INDEX_ENABLED: bool = os.getenv("KEYWORD_INDEX_ENABLED", "true").lower() == "true"
+
+    # Maximum bytes billed per BigQuery query kind ("kind=bytes,..."), "default" applying to unlisted kinds
+    BIGQUERY_MAX_BYTES_BILLED: dict[str, int] = _parse_byte_limits(
+        os.getenv(
+            "BIGQUERY_MAX_BYTES_BILLED",
+            "default=10000000000,vector_search=2000000000,vector_search_multi=4000000000",
+        )
+    )
+
+    # Scope an access token needs for check_order, and the short-lived cache absorbing agents polling orders
+    REQUIRED_SCOPES_CHECK_ORDER: str = os.getenv("REQUIRED_SCOPES_CHECK_ORDER", "read_orders")
+    # Audience of the Storefront API: check_order only sends the customer's token upstream if it was issued for
+    # it (the MCP authorization server must be the Storefront issuer); empty disables check_order
+    STOREFRONT_TOKEN_AUDIENCE: str = os.getenv("STOREFRONT_TOKEN_AUDIENCE", "")
+    ORDER_STATUS_CACHE_TTL: float = float(os.getenv("ORDER_STATUS_CACHE_TTL", "30"))
+    ORDER_STATUS_CACHE_MAX_ENTRIES: int = int(os.getenv("ORDER_STATUS_CACHE_MAX_ENTRIES", "5000"))
+
+    # Seconds a place/modify/cancel order result is returned to retries with the same idempotency_key, and to
+    # duplicates of a call made without one
+    IDEMPOTENCY_TTL: float = float(os.getenv("IDEMPOTENCY_TTL", "3600"))
+    IDEMPOTENCY_DERIVED_KEY_TTL: float = float(os.getenv("IDEMPOTENCY_DERIVED_KEY_TTL", "10"))
+
+    # Circuit breakers for upstreams (Storefront API, Vertex AI, BigQuery)
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD: int = int(os.getenv("CIRCUIT_BREAKER_FAILURE_THRESHOLD", "5"))
+    CIRCUIT_BREAKER_RECOVERY_TIMEOUT: float = float(os.getenv("CIRCUIT_BREAKER_RECOVERY_TIMEOUT", "30"))
+
     def validate(self) -> None:
         """Validate configuration."""
         if self.TRANSPORT not in ["sse", "streamable-http"]:
@@ -1,11 +1,18 @@
-"""Request context management for shop information."""
+"""Request context management for shop information and request deadlines."""
 
-from contextvars import ContextVar
+import time
+from contextvars import ContextVar, Token
 from typing import Optional
 
 # Context variables for shop information
 _shop_id: ContextVar[Optional[int]] = ContextVar("shop_id", default=None)
 _shop_domain: ContextVar[Optional[str]] = ContextVar("shop_domain", default=None)
+# time.monotonic() by which the current request must be answered
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+
+class DeadlineExceededError(TimeoutError):
+    """Raised instead of starting an upstream call once the request deadline has passed."""
 
 
 def set_shop_id(shop_id: int) -> None:
@@ -32,3 +39,46 @@ def get_shop_domain() -> str:
     if shop_domain is None:
         raise ValueError("shop_domain not found in request context")
     return shop_domain
+
+
+def set_deadline(timeout: float) -> Token:
+    """Set the request deadline to timeout seconds from now, returning a token for reset_deadline."""
+    return _deadline.set(time.monotonic() + timeout)
+
+
+def reset_deadline(token: Token) -> None:
+    """Restore the deadline that was in effect before set_deadline."""
+    _deadline.reset(token)
+
+
+def get_deadline() -> Optional[float]:
+    """Get the request deadline (a time.monotonic() value), or None if the request has none."""
+    return _deadline.get()
+
+
+def deadline_passed() -> bool:
+    """Whether the current request has a deadline and it has passed."""
+    deadline = _deadline.get()
+    return deadline is not None and time.monotonic() >= deadline
+
+
+def remaining_time(limit: Optional[float] = None) -> Optional[float]:
+    """
+    Get the time budget of an upstream call.
+
+    Args:
+        limit: Optional timeout of the call itself, in seconds
+
+    Returns:
+        Seconds until the request deadline, capped at limit, or limit if the request has no deadline
+
+    Raises:
+        DeadlineExceededError: If the request deadline has passed
+    """
+    deadline = _deadline.get()
+    if deadline is None:
+        return limit
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise DeadlineExceededError("Request deadline exceeded")
+    return remaining if limit is None else min(limit, remaining)
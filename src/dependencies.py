@@ -1,13 +1,47 @@
 """Dependency injection providers for shared client instances."""
 
+import hashlib
+import logging
 from functools import lru_cache
 
+import httpx
+from fastmcp.server.dependencies import get_access_token, get_http_headers
 from google.cloud import bigquery
 
+from cache import MemoryBudget, TTLCache
 from config import config
 from context import get_shop_id, get_shop_domain
+from services.bigquery_ledger import BigQueryLedger
 from services.cyberbiz_bigquery_client import CyberbizBigQueryClient
 from services.embedding_client import EmbeddingClient
+from models.order import Order
+from repositories.order_repository import OrderRepository
+from repositories.product_repository import ProductRepository
+from services.catalog_changes import CatalogChangeLog, CatalogInvalidator
+from services.catalog_snapshot import CatalogSnapshot
+from services.catalog_sync import CatalogSyncer
+from services.hedging import RequestHedger
+from services.idempotency import IdempotencyStore
+from services.keyword_index import KeywordIndex
+from services.search_cursors import SearchCursorStore
+from services.state_store import InMemoryStateStore, StateStore, create_state_store
+from services.storefront_client import StorefrontClient
+from services.vector_search_options import VectorSearchOptions, VectorSearchOptionsResolver
+
+logger = logging.getLogger(__name__)
+
+# Header through which a client can override the VECTOR_SEARCH options of its requests
+VECTOR_SEARCH_OPTIONS_HEADER = "x-vector-search-options"
+
+
+@lru_cache(maxsize=1)
+def get_memory_budget() -> MemoryBudget:
+    """
+    Get the singleton MemoryBudget instance.
+
+    Cached because all in-process caches must share one budget.
+    """
+    return MemoryBudget(max_bytes=config.MEMORY_BUDGET_BYTES)
 
 
 @lru_cache(maxsize=1)
@@ -17,7 +51,7 @@ def get_embedding_client() -> EmbeddingClient:
 
     Cached because it's expensive to initialize and has no request-specific state.
     """
-    return EmbeddingClient()
+    return EmbeddingClient(memory_budget=get_memory_budget())
 
 
 @lru_cache(maxsize=1)
@@ -31,6 +65,16 @@ def get_bigquery_base_client() -> bigquery.Client:
     return bigquery.Client(project=config.CYBERBIZ_GCP_PROJECT_ID)
 
 
+@lru_cache(maxsize=1)
+def get_bigquery_ledger() -> BigQueryLedger:
+    """
+    Get the singleton BigQueryLedger instance.
+
+    Cached because job statistics are accumulated across all requests.
+    """
+    return BigQueryLedger()
+
+
 def get_bigquery_client() -> CyberbizBigQueryClient:
     """
     Get a BigQueryClient for the current request.
@@ -45,4 +89,257 @@ def get_bigquery_client() -> CyberbizBigQueryClient:
     return CyberbizBigQueryClient(
         client=get_bigquery_base_client(),
         shop_id=shop_id,
+        ledger=get_bigquery_ledger(),
+        max_bytes_billed=config.BIGQUERY_MAX_BYTES_BILLED,
+    )
+
+
+@lru_cache(maxsize=1)
+def get_storefront_client() -> StorefrontClient:
+    """
+    Get the singleton StorefrontClient instance.
+
+    Cached so that connections are pooled, and latency statistics used for
+    request hedging and responses kept for revalidation are shared across all requests.
+    """
+    return StorefrontClient(
+        http_client=httpx.AsyncClient(limits=httpx.Limits(max_connections=200, max_keepalive_connections=50)),
+        hedger=RequestHedger(
+            percentile=config.STOREFRONT_HEDGE_PERCENTILE,
+            budget_ratio=config.STOREFRONT_HEDGE_BUDGET_RATIO,
+            enabled=config.STOREFRONT_HEDGING_ENABLED,
+            metric_prefix="storefront",
+        ),
+        revalidation_cache=TTLCache(
+            maxsize=config.STOREFRONT_REVALIDATION_MAX_ENTRIES,
+            ttl=config.STOREFRONT_REVALIDATION_TTL,
+            budget=get_memory_budget(),
+            name="storefront_revalidation",
+        ) if config.STOREFRONT_REVALIDATION_ENABLED else None,
+    )
+
+
+@lru_cache(maxsize=1)
+def get_state_store() -> StateStore:
+    """
+    Get the singleton StateStore instance.
+
+    Cached because it holds the connection pool to the external store, or the in-process entries.
+    """
+    return create_state_store(
+        config.STATE_STORE_URL, maxsize=config.STATE_STORE_MAX_ENTRIES, budget=get_memory_budget()
+    )
+
+
+def _unbudgeted_state_store(maxsize: int) -> StateStore:
+    """
+    Get a StateStore for state that must not be evicted to save memory, as correctness depends on it.
+
+    The shared Redis store if one is configured, else a new in-process store of its own, holding
+    at most maxsize entries and outside the memory budget.
+    """
+    if config.STATE_STORE_URL and not config.STATE_STORE_URL.startswith("memory://"):
+        return get_state_store()
+    return InMemoryStateStore(maxsize=maxsize)
+
+
+@lru_cache(maxsize=1)
+def get_catalog_change_log() -> CatalogChangeLog:
+    """
+    Get the singleton CatalogChangeLog instance.
+
+    The log decides what cached data is stale, so it is kept outside the memory budget.
+    """
+    return CatalogChangeLog(
+        state_store=_unbudgeted_state_store(config.STATE_STORE_MAX_ENTRIES),
+        retention=config.CACHE_INVALIDATION_RETENTION,
+    )
+
+
+@lru_cache(maxsize=1)
+def get_search_cursor_store() -> SearchCursorStore:
+    """Get the singleton SearchCursorStore instance."""
+    return SearchCursorStore(
+        state_store=get_state_store(), ttl=config.SEARCH_CURSOR_TTL, change_log=get_catalog_change_log()
+    )
+
+
+@lru_cache(maxsize=1)
+def get_catalog_snapshot() -> CatalogSnapshot | None:
+    """
+    Get the singleton CatalogSnapshot instance, or None if the snapshot is disabled.
+
+    Cached because it holds the SQLite connection and the set of active shops.
+    """
+    if not config.CATALOG_SNAPSHOT_ENABLED:
+        return None
+    return CatalogSnapshot(path=config.CATALOG_SNAPSHOT_PATH, max_staleness=config.CATALOG_SNAPSHOT_MAX_STALENESS)
+
+
+@lru_cache(maxsize=1)
+def get_keyword_index() -> KeywordIndex | None:
+    """
+    Get the singleton KeywordIndex instance, or None if the catalog snapshot is disabled.
+
+    The index is built from the catalog snapshot, so it only exists alongside it.
+    """
+    if not config.CATALOG_SNAPSHOT_ENABLED or not config.KEYWORD_INDEX_ENABLED:
+        return None
+    return KeywordIndex(budget=get_memory_budget())
+
+
+@lru_cache(maxsize=1)
+def get_catalog_syncer() -> CatalogSyncer | None:
+    """Get the singleton CatalogSyncer instance, or None if the snapshot is disabled."""
+    snapshot = get_catalog_snapshot()
+    if snapshot is None:
+        return None
+    return CatalogSyncer(
+        snapshot=snapshot,
+        storefront_client=get_storefront_client(),
+        interval=config.CATALOG_SYNC_INTERVAL,
+        full_sync_interval=config.CATALOG_FULL_SYNC_INTERVAL,
+        page_size=config.CATALOG_SYNC_PAGE_SIZE,
+        keyword_index=get_keyword_index(),
+        parse_product=ProductRepository._parse_product,
+    )
+
+
+@lru_cache(maxsize=1)
+def get_catalog_invalidator() -> CatalogInvalidator | None:
+    """
+    Get the singleton CatalogInvalidator instance, or None if the snapshot is disabled.
+
+    Cached because it tracks which product changes were applied to this process's snapshot.
+    """
+    syncer = get_catalog_syncer()
+    if syncer is None:
+        return None
+    return CatalogInvalidator(
+        change_log=get_catalog_change_log(),
+        snapshot=syncer.snapshot,
+        syncer=syncer,
+        poll_interval=config.CACHE_INVALIDATION_POLL_INTERVAL,
+    )
+
+
+@lru_cache(maxsize=1)
+def get_vector_search_options() -> VectorSearchOptionsResolver:
+    """
+    Get the singleton resolver of the VECTOR_SEARCH options configured per shop.
+
+    A malformed VECTOR_SEARCH_OPTIONS is logged once and replaced by the default options.
+    """
+    try:
+        return VectorSearchOptionsResolver.from_config(
+            config.VECTOR_SEARCH_OPTIONS, max_requested_fraction=config.VECTOR_SEARCH_MAX_REQUESTED_FRACTION
+        )
+    except ValueError as e:
+        logger.error("Invalid VECTOR_SEARCH_OPTIONS, searches use the default options: %s", e)
+        return VectorSearchOptionsResolver(
+            VectorSearchOptions(), max_requested_fraction=config.VECTOR_SEARCH_MAX_REQUESTED_FRACTION
+        )
+
+
+def get_requested_vector_search_options() -> VectorSearchOptions | None:
+    """Get the VECTOR_SEARCH options requested through the X-Vector-Search-Options header, if valid, before clamping."""
+    header = get_http_headers().get(VECTOR_SEARCH_OPTIONS_HEADER)
+    if not header:
+        return None
+    try:
+        return VectorSearchOptions.from_json(header)
+    except ValueError as e:
+        logger.warning("Invalid X-Vector-Search-Options header %s: %s", header, e)
+        return None
+
+
+@lru_cache(maxsize=1)
+def get_bulk_fetch_support() -> TTLCache[str, bool]:
+    """
+    Get the singleton cache of which shops' APIs serve bulk product detail fetches.
+
+    Cached so that a shop is probed once an hour rather than on every request.
+    """
+    return TTLCache(maxsize=10000, ttl=3600, budget=get_memory_budget(), name="bulk_fetch_support")
+
+
+def get_product_repository() -> ProductRepository:
+    """
+    Get a ProductRepository for the current request.
+
+    Raises:
+        ValueError: If shop_id is not available in request context
+    """
+    return ProductRepository(
+        bigquery_client=get_bigquery_client(),
+        embedding_client=get_embedding_client(),
+        storefront_client=get_storefront_client(),
+        search_cursor_store=get_search_cursor_store(),
+        catalog_snapshot=get_catalog_snapshot(),
+        keyword_index=get_keyword_index(),
+        vector_search_options=get_vector_search_options(),
+        bulk_fetch_support=get_bulk_fetch_support(),
     )
+
+
+@lru_cache(maxsize=1)
+def get_order_status_cache() -> TTLCache[tuple, Order] | None:
+    """
+    Get the singleton order status cache, or None if it is disabled (ORDER_STATUS_CACHE_TTL=0).
+
+    Cached because orders must outlive the request that fetched them.
+    """
+    if config.ORDER_STATUS_CACHE_TTL <= 0:
+        return None
+    return TTLCache(
+        maxsize=config.ORDER_STATUS_CACHE_MAX_ENTRIES,
+        ttl=config.ORDER_STATUS_CACHE_TTL,
+        budget=get_memory_budget(),
+        name="order_status",
+    )
+
+
+def get_order_repository() -> OrderRepository:
+    """Get an OrderRepository for the current request."""
+    return OrderRepository(storefront_client=get_storefront_client(), status_cache=get_order_status_cache())
+
+
+@lru_cache(maxsize=1)
+def get_idempotency_state_store() -> StateStore:
+    """
+    Get the singleton StateStore of idempotent results and running-call markers.
+
+    The in-process store is separate from the one of search cursors, with its own entry limit
+    and outside the memory budget, so that cursor traffic cannot evict idempotent results.
+    """
+    return _unbudgeted_state_store(config.IDEMPOTENCY_MAX_ENTRIES)
+
+
+@lru_cache(maxsize=1)
+def get_idempotency_store() -> IdempotencyStore:
+    """
+    Get the singleton IdempotencyStore instance.
+
+    Cached because it tracks the calls running in this process, to join their duplicates.
+    """
+    return IdempotencyStore(
+        state_store=get_idempotency_state_store(),
+        ttl=config.IDEMPOTENCY_TTL,
+        lock_ttl=config.REQUEST_TIMEOUT,
+        derived_ttl=config.IDEMPOTENCY_DERIVED_KEY_TTL,
+    )
+
+
+def get_customer_scope() -> str:
+    """
+    Identify the customer of the current request, to keep per-customer state apart.
+
+    The `sub` claim of the access token, else a digest of the token, or "" for anonymous requests.
+    """
+    token = get_access_token()
+    if token is None:
+        return ""
+    subject = (token.claims or {}).get("sub")
+    if subject:
+        return f"sub:{subject}"
+    return f"token:{hashlib.sha256(token.token.encode()).hexdigest()}"
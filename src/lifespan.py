@@ -0,0 +1,44 @@
+"""Process lifespan managing background tasks."""
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from config import config
+from dependencies import get_catalog_invalidator, get_catalog_syncer, get_state_store
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan() -> AsyncIterator[None]:
+    """
+    Start background tasks when the process starts and cancel them when it stops.
+
+    Entered once around the whole server rather than passed to FastMCP, whose lifespan
+    runs once per MCP session, and so once per request in stateless HTTP mode.
+    """
+    tasks: list[asyncio.Task] = []
+
+    if config.STATELESS_HTTP and (not config.STATE_STORE_URL or config.STATE_STORE_URL.startswith("memory://")):
+        logger.warning(
+            "STATELESS_HTTP=true without a shared STATE_STORE_URL: search cursors and idempotent results are only "
+            "seen by the replica that created them, so retries reaching another replica may repeat order changes"
+        )
+
+    catalog_syncer = get_catalog_syncer()
+    if catalog_syncer is not None:
+        tasks.append(asyncio.create_task(catalog_syncer.run()))
+
+    catalog_invalidator = get_catalog_invalidator()
+    if catalog_invalidator is not None:
+        tasks.append(asyncio.create_task(catalog_invalidator.run()))
+
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await get_state_store().close()
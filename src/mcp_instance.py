@@ -1,11 +1,11 @@
 """MCP server instance."""
 
-import logging
-
 from fastmcp import FastMCP
 
-# Configure logging
-logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+from config import config
+from utils import configure_logging
+
+configure_logging(level=config.LOG_LEVEL, json_format=config.LOG_FORMAT == "json", sample_rate=config.LOG_SAMPLE_RATE)
 
 mcp = FastMCP(
     name="CYBERBIZ-Shopping-MCP",
@@ -0,0 +1,19 @@
+"""In-process metrics counters for the MCP server."""
+
+import threading
+from collections import defaultdict
+
+_lock = threading.Lock()
+_counters: dict[str, int] = defaultdict(int)
+
+
+def increment(name: str, value: int = 1) -> None:
+    """Increment a named counter."""
+    with _lock:
+        _counters[name] += value
+
+
+def snapshot() -> dict[str, int]:
+    """Return a copy of all counters, sorted by name."""
+    with _lock:
+        return dict(sorted(_counters.items()))
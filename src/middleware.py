@@ -1,10 +1,28 @@
-"""Middleware to extract shop information from headers."""
+"""Middleware to extract shop information from headers, enforce tool call deadlines and compress responses."""
 
+import asyncio
 import logging
+import zlib
+
+from fastmcp.exceptions import ToolError
+from fastmcp.server.dependencies import get_http_headers
+from fastmcp.server.middleware import CallNext, Middleware as McpMiddleware, MiddlewareContext
+
+from starlette.datastructures import Headers, MutableHeaders
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
 from starlette.responses import Response
-from context import set_shop_id, set_shop_domain
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+import metrics
+import profiling
+from context import DeadlineExceededError, reset_deadline, set_deadline, set_shop_id, set_shop_domain
+from utils import SAMPLED
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, responses fall back to gzip
+    brotli = None
 
 logger = logging.getLogger(__name__)
 
@@ -12,7 +30,7 @@ logger = logging.getLogger(__name__)
 class ShopContextMiddleware(BaseHTTPMiddleware):
     """Middleware to extract shop_id and shop_domain from headers and set in context."""
 
-    EXEMPT_PATHS = {"/health"}
+    EXEMPT_PATHS = {"/health", "/metrics", "/debug/profile", "/debug/bigquery", "/webhooks/product-changes"}
 
     async def dispatch(self, request: Request, call_next):
         """Extract shop_id and shop_domain from headers and set in context."""
@@ -35,15 +53,187 @@ class ShopContextMiddleware(BaseHTTPMiddleware):
         try:
             shop_id = int(shop_id_str)
         except ValueError:
-            logger.error(f"Invalid X-Shop-ID header: {shop_id_str}")
+            logger.error("Invalid X-Shop-ID header: %s", shop_id_str)
             raise ValueError(f"Invalid X-Shop-ID: {shop_id_str}")
 
         # Set in context
         set_shop_id(shop_id)
         set_shop_domain(shop_domain)
 
-        logger.info(f"Request context set: shop_id={shop_id}, shop_domain={shop_domain}")
+        logger.info("Request context set: shop_id=%s, shop_domain=%s", shop_id, shop_domain, extra=SAMPLED)
 
         # Continue processing
         response = await call_next(request)
         return response
+
+
+class DeadlineMiddleware(McpMiddleware):
+    """
+    Give every tool call a deadline, stored in the request context.
+
+    Upstream calls only use the time left until the deadline (see context.remaining_time).
+    When it passes, the tool call is cancelled together with all its outstanding upstream
+    calls, so that no work continues after the client has given up.
+    """
+
+    TIMEOUT_HEADER = "x-request-timeout"
+
+    def __init__(self, default_timeout: float):
+        """
+        Initialize deadline middleware.
+
+        Args:
+            default_timeout: Seconds a tool call may take. Clients can shorten it with an X-Request-Timeout header.
+        """
+        self.default_timeout = default_timeout
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next: CallNext):
+        timeout = self._timeout()
+        token = set_deadline(timeout)
+        try:
+            async with asyncio.timeout(timeout) as scope:
+                return await call_next(context)
+        except TimeoutError as e:
+            if not (scope.expired() or isinstance(e, DeadlineExceededError)):
+                raise
+            metrics.increment("deadline.exceeded")
+            logger.warning("Tool call %s exceeded its %.1fs deadline", context.message.name, timeout)
+            raise ToolError(f"Request timed out after {timeout:.1f} seconds") from e
+        finally:
+            reset_deadline(token)
+
+    def _timeout(self) -> float:
+        """The default timeout, or the client's shorter X-Request-Timeout."""
+        header = get_http_headers().get(self.TIMEOUT_HEADER)
+        if header:
+            try:
+                requested = float(header)
+            except ValueError:
+                logger.warning("Invalid X-Request-Timeout header: %s", header)
+            else:
+                if requested > 0:
+                    return min(requested, self.default_timeout)
+        return self.default_timeout
+
+
+class ProfilingMiddleware(McpMiddleware):
+    """Count finished tool calls for profiles taken over the next N tool calls (see profiling.profile)."""
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next: CallNext):
+        try:
+            return await call_next(context)
+        finally:
+            session = profiling.active_session()
+            if session is not None:
+                session.tool_call_finished()
+
+
+class _Compressor:
+    """Streaming gzip or brotli compressor."""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._gzip = zlib.compressobj(gzip_level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        """Compress a chunk, flushing it so that streamed chunks can be decoded as they arrive."""
+        if self.encoding == "br":
+            return self._brotli.process(data) + (self._brotli.finish() if final else self._brotli.flush())
+        return self._gzip.compress(data) + self._gzip.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class CompressionMiddleware:
+    """
+    Compress HTTP responses with brotli (if installed) or gzip, as negotiated by Accept-Encoding.
+
+    Single-message responses smaller than minimum_size are sent as is. Streamed responses,
+    including server-sent event streams, are compressed chunk by chunk with a sync flush after
+    every chunk, so that every event reaches the client as soon as it is sent.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        """
+        Initialize compression middleware.
+
+        Args:
+            app: ASGI application
+            minimum_size: Bodies smaller than this many bytes are not compressed
+            gzip_level: zlib compression level (1-9)
+            brotli_quality: Brotli quality (0-11)
+        """
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = self._negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Message | None = None
+        compressor: _Compressor | None = None
+        passthrough = False
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start_message, compressor, passthrough
+            if message["type"] == "http.response.start":
+                # Held back until the first body chunk shows whether to compress
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough or start_message is None:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                headers = MutableHeaders(raw=start_message["headers"])
+                if (
+                    "content-encoding" in headers
+                    or (not more_body and len(body) < self.minimum_size)
+                ):
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+
+                compressor = _Compressor(encoding, self.gzip_level, self.brotli_quality)
+                data = compressor.compress(body, final=not more_body)
+                del headers["content-length"]
+                headers["content-encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if not more_body:
+                    headers["content-length"] = str(len(data))
+                await send(start_message)
+            else:
+                data = compressor.compress(body, final=not more_body)
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+    @staticmethod
+    def _negotiate(accept_encoding: str) -> str | None:
+        """Pick the preferred supported encoding accepted by the client, or None."""
+        accepted = set()
+        for part in accept_encoding.lower().split(","):
+            name, _, params = part.partition(";")
+            quality = params.strip().removeprefix("q=")
+            try:
+                if params and float(quality) == 0:
+                    continue
+            except ValueError:
+                continue
+            accepted.add(name.strip())
+        if brotli is not None and "br" in accepted:
+            return "br"
+        if "gzip" in accepted:
+            return "gzip"
+        return None
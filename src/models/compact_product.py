@@ -0,0 +1,245 @@
+"""Memory-compact representation of products kept in in-process caches and indexes.
+
+A pydantic Product tree costs an object (with its __dict__ and field set) per variant,
+photo and description, and repeats the same strings across products and variants.
+CompactProduct stores the same data in slotted records and tuples:
+- Categorical strings (vendor, channel, product type, inventory availability, option names,
+  dict keys) are interned, so each distinct value is stored once per process.
+- Photo URLs are stored as suffixes of a per-product prefix, and identical strings within
+  a product (the same photo on several variants, featured images) share one object.
+
+Products are converted back into Product models only when a response is built.
+"""
+
+import os
+import sys
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from models.product import Product, ProductDescription, ProductOption, ProductVariant, ProductVariantPhoto
+
+# Shared key tuples of frozen dicts, e.g. the keys of every variant's featured_image
+_KEY_TUPLES: dict[tuple[str, ...], tuple[str, ...]] = {}
+
+
+class _UrlSuffix(str):
+    """A URL stored without its product's URL prefix."""
+    __slots__ = ()
+
+
+@dataclass(slots=True, frozen=True)
+class _FrozenDict:
+    """A JSON object stored as a shared key tuple and a value tuple."""
+    keys: tuple[str, ...]
+    values: tuple[Any, ...]
+
+
+@dataclass(slots=True, frozen=True)
+class CompactVariant:
+    id: int
+    title: str
+    name: str | None
+    options: tuple[str, ...] | None
+    price: float
+    compare_at_price: float | None
+    max_usable_bonus: int | None
+    inventory_availability: str | None
+    weight: float | None
+    quantity: int | None
+    featured_image: _FrozenDict | None
+    # Tuples of (thumb, large, original)
+    photos: tuple[tuple[str | None, str | None, str | None], ...] | None
+
+
+@dataclass(slots=True, frozen=True)
+class CompactProduct:
+    """A Product stored in slotted records, see the module docstring."""
+    id: int
+    title: str
+    handle: str | None
+    price: float | None
+    url_prefix: str
+    photo_urls: tuple[str, ...] | None
+    brief: str | None
+    slogan: str | None
+    vendor: str | None
+    channel: str | None
+    temperature_types: tuple[str, ...] | None
+    product_type: str | None
+    store_type: str | None
+    genre: str | None
+    product_url: str | None
+    # Tuples of (type, body_html)
+    descriptions: tuple[tuple[str | None, str | None], ...] | None
+    # Tuples of (name, types)
+    options: tuple[tuple[str, tuple[str, ...]], ...] | None
+    variants: tuple[CompactVariant, ...]
+
+    @classmethod
+    def from_product(cls, product: Product) -> "CompactProduct":
+        """Pack a Product."""
+        packer = _Packer(_url_prefix(product))
+        return cls(
+            id=product.id,
+            title=product.title,
+            handle=product.handle,
+            price=product.price,
+            url_prefix=packer.url_prefix,
+            photo_urls=_tuple_or_none(product.photo_urls, packer.url),
+            brief=product.brief,
+            slogan=product.slogan,
+            vendor=_intern(product.vendor),
+            channel=_intern(product.channel),
+            temperature_types=_tuple_or_none(product.temperature_types, _intern),
+            product_type=_intern(product.product_type),
+            store_type=_intern(product.store_type),
+            genre=_intern(product.genre),
+            product_url=product.product_url,
+            descriptions=_tuple_or_none(
+                product.descriptions, lambda description: (_intern(description.type), description.body_html)
+            ),
+            options=_tuple_or_none(
+                product.options, lambda option: (_intern(option.name), tuple(packer.string(v) for v in option.types))
+            ),
+            variants=tuple(
+                CompactVariant(
+                    id=variant.id,
+                    title=packer.string(variant.title),
+                    name=packer.string(variant.name),
+                    options=_tuple_or_none(variant.options, packer.string),
+                    price=variant.price,
+                    compare_at_price=variant.compare_at_price,
+                    max_usable_bonus=variant.max_usable_bonus,
+                    inventory_availability=_intern(variant.inventory_availability),
+                    weight=variant.weight,
+                    quantity=variant.quantity,
+                    featured_image=None if variant.featured_image is None else packer.json(variant.featured_image),
+                    photos=_tuple_or_none(
+                        variant.photo_urls,
+                        lambda photo: (packer.url(photo.thumb), packer.url(photo.large), packer.url(photo.original)),
+                    ),
+                )
+                for variant in product.variants
+            ),
+        )
+
+    def to_product(self) -> Product:
+        """Unpack into a Product model."""
+        prefix = self.url_prefix
+        return Product(
+            id=self.id,
+            title=self.title,
+            handle=self.handle,
+            price=self.price,
+            photo_urls=None if self.photo_urls is None else [_unpack_url(url, prefix) for url in self.photo_urls],
+            brief=self.brief,
+            slogan=self.slogan,
+            vendor=self.vendor,
+            channel=self.channel,
+            temperature_types=None if self.temperature_types is None else list(self.temperature_types),
+            product_type=self.product_type,
+            store_type=self.store_type,
+            genre=self.genre,
+            product_url=self.product_url,
+            descriptions=None if self.descriptions is None else [
+                ProductDescription(type=type_, body_html=body_html) for type_, body_html in self.descriptions
+            ],
+            options=None if self.options is None else [
+                ProductOption(name=name, types=list(types)) for name, types in self.options
+            ],
+            variants=[
+                ProductVariant(
+                    id=variant.id,
+                    title=variant.title,
+                    name=variant.name,
+                    options=None if variant.options is None else list(variant.options),
+                    price=variant.price,
+                    compare_at_price=variant.compare_at_price,
+                    max_usable_bonus=variant.max_usable_bonus,
+                    inventory_availability=variant.inventory_availability,
+                    weight=variant.weight,
+                    quantity=variant.quantity,
+                    featured_image=None if variant.featured_image is None else _unpack_json(
+                        variant.featured_image, prefix
+                    ),
+                    photo_urls=None if variant.photos is None else [
+                        ProductVariantPhoto(
+                            thumb=_unpack_url(thumb, prefix),
+                            large=_unpack_url(large, prefix),
+                            original=_unpack_url(original, prefix),
+                        )
+                        for thumb, large, original in variant.photos
+                    ],
+                )
+                for variant in self.variants
+            ],
+        )
+
+
+class _Packer:
+    """Packs the strings of one product, sharing identical ones."""
+
+    def __init__(self, url_prefix: str):
+        self.url_prefix = sys.intern(url_prefix)
+        self._strings: dict[str, str] = {}
+        self._urls: dict[str, _UrlSuffix] = {}
+
+    def string(self, value: str | None) -> Any:
+        if value is None:
+            return None
+        return self._strings.setdefault(value, value)
+
+    def url(self, value: str | None) -> Any:
+        if value is None or not self.url_prefix or not value.startswith(self.url_prefix):
+            return self.string(value)
+        suffix = self._urls.get(value)
+        if suffix is None:
+            suffix = self._urls[value] = _UrlSuffix(value[len(self.url_prefix):])
+        return suffix
+
+    def json(self, value: Any) -> Any:
+        if isinstance(value, dict):
+            keys = tuple(sys.intern(key) for key in value)
+            keys = _KEY_TUPLES.setdefault(keys, keys)
+            return _FrozenDict(keys=keys, values=tuple(self.json(item) for item in value.values()))
+        if isinstance(value, list):
+            return [self.json(item) for item in value]
+        if isinstance(value, str):
+            return self.url(value)
+        return value
+
+
+def _url_prefix(product: Product) -> str:
+    """Longest common prefix of a product's photo URLs, cut after a path separator."""
+    urls = list(product.photo_urls or [])
+    for variant in product.variants:
+        for photo in variant.photo_urls or []:
+            urls.extend(url for url in (photo.thumb, photo.large, photo.original) if url)
+    if not urls:
+        return ""
+    prefix = os.path.commonprefix(urls)
+    return prefix[:prefix.rfind("/") + 1]
+
+
+def _unpack_url(value: str | None, prefix: str) -> str | None:
+    if isinstance(value, _UrlSuffix):
+        return prefix + value
+    return value
+
+
+def _unpack_json(value: Any, prefix: str) -> Any:
+    if isinstance(value, _FrozenDict):
+        return {key: _unpack_json(item, prefix) for key, item in zip(value.keys, value.values)}
+    if isinstance(value, list):
+        return [_unpack_json(item, prefix) for item in value]
+    if isinstance(value, _UrlSuffix):
+        return prefix + value
+    return value
+
+
+def _intern(value: str | None) -> str | None:
+    return None if value is None else sys.intern(value)
+
+
+def _tuple_or_none(values: list | None, pack: Callable[[Any], Any]) -> tuple | None:
+    return None if values is None else tuple(pack(value) for value in values)
@@ -1 +1,40 @@
 """Order data models."""
+
+from pydantic import BaseModel
+
+
+class OrderLineItem(BaseModel):
+    """A product ordered in an order."""
+    product_id: int | None = None
+    variant_id: int | None = None
+    title: str
+    quantity: int
+    price: float | None = None
+
+
+class OrderShipping(BaseModel):
+    """Shipping status of an order."""
+    status: str | None = None
+    carrier: str | None = None
+    tracking_number: str | None = None
+    estimated_delivery: str | None = None
+
+
+class Order(BaseModel):
+    """Status and contents of a customer's order."""
+    id: str
+    status: str | None = None
+    payment_status: str | None = None
+    fulfillment_status: str | None = None
+    created_at: str | None = None
+    total_price: float | None = None
+    currency: str | None = None
+    line_items: list[OrderLineItem] = []
+    shipping: OrderShipping | None = None
+
+
+class OrderLookupError(BaseModel):
+    """An order that could not be looked up."""
+    order_id: str
+    error_code: str
+    message: str
@@ -70,3 +70,14 @@ class Product(BaseModel):
     descriptions: list[ProductDescription] | None = None
     options: list[ProductOption] | None = None
     variants: list[ProductVariant]
+
+
+class ProductSearchResult(BaseModel):
+    """Products found by a search, possibly served from a degraded fallback path."""
+    products: list[Product]
+    degraded: bool = False
+    degraded_reason: str | None = None
+    # Opaque cursor to the next page of a search served from server-side results
+    next_cursor: str | None = None
+    # Ranked products left out because the Storefront API no longer has them
+    missing_product_ids: list[int] | None = None
@@ -0,0 +1,183 @@
+"""On-demand sampling profiler for live servers.
+
+Nothing runs while no profile is being taken. A profile session starts a background thread
+that samples the stacks of all other threads every few milliseconds through
+sys._current_frames(), and optionally traces allocations with tracemalloc. Stacks are
+aggregated in the collapsed format ("frame;frame;frame count" per line) read by
+flamegraph.pl, speedscope and most other flamegraph tools.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+# Frames kept for each allocation traced by tracemalloc
+TRACEMALLOC_FRAMES = 10
+
+_active_session: "ProfileSession | None" = None
+
+
+class ProfilerBusyError(Exception):
+    """Raised when a profile is requested while another one is being taken."""
+
+
+class SamplingProfiler:
+    """Samples the stacks of all threads except its own at a fixed interval."""
+
+    def __init__(self, interval: float):
+        """
+        Initialize sampling profiler.
+
+        Args:
+            interval: Seconds between samples
+        """
+        self.interval = interval
+        self.samples = 0
+        self._stacks: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self) -> str:
+        """Sampled stacks in collapsed format, most frequent first."""
+        return "\n".join(f"{stack} {count}" for stack, count in self._stacks.most_common())
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                frames = []
+                while frame is not None:
+                    code = frame.f_code
+                    frames.append(f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                frames.append(thread_names.get(thread_id, str(thread_id)))
+                self._stacks[";".join(reversed(frames))] += 1
+            self.samples += 1
+
+
+class ProfileSession:
+    """A profile taken for a fixed time or until a number of tool calls finished."""
+
+    def __init__(self, seconds: float, tool_calls: int | None, trace_memory: bool, interval: float):
+        """
+        Initialize profile session.
+
+        Args:
+            seconds: Seconds to profile, or the maximum when profiling tool calls
+            tool_calls: Stop after this many tool calls finished, if given
+            trace_memory: Also take a tracemalloc snapshot of the largest allocation sites
+            interval: Seconds between stack samples
+        """
+        self.seconds = seconds
+        self.tool_calls = tool_calls
+        self.trace_memory = trace_memory
+        self.tool_calls_finished = 0
+        self._profiler = SamplingProfiler(interval)
+        self._done = asyncio.Event()
+        self._started_tracemalloc = False
+        self._started_at = 0.0
+
+    def tool_call_finished(self) -> None:
+        """Count a finished tool call, ending the session after the requested number of calls."""
+        self.tool_calls_finished += 1
+        if self.tool_calls is not None and self.tool_calls_finished >= self.tool_calls:
+            self._done.set()
+
+    async def run(self, top_allocations: int = 20) -> dict:
+        """
+        Take the profile.
+
+        Args:
+            top_allocations: Number of allocation sites reported with trace_memory
+
+        Returns:
+            Profile with the collapsed stacks, sample count, duration, tool calls profiled,
+            and with trace_memory the largest allocation sites
+        """
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self._started_tracemalloc = True
+        self._started_at = time.monotonic()
+        self._profiler.start()
+        try:
+            try:
+                await asyncio.wait_for(self._done.wait(), timeout=self.seconds)
+            except TimeoutError:
+                pass
+            finally:
+                self._profiler.stop()
+
+            result: dict = {
+                "duration": round(time.monotonic() - self._started_at, 3),
+                "samples": self._profiler.samples,
+                "tool_calls": self.tool_calls_finished,
+                "collapsed": self._profiler.collapsed(),
+            }
+            if self.trace_memory:
+                snapshot = tracemalloc.take_snapshot().filter_traces([
+                    tracemalloc.Filter(False, tracemalloc.__file__),
+                    tracemalloc.Filter(False, __file__),
+                ])
+                result["allocations"] = [
+                    {
+                        "site": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                        "size_bytes": stat.size,
+                        "count": stat.count,
+                    }
+                    for stat in snapshot.statistics("lineno")[:top_allocations]
+                ]
+        finally:
+            # Tracing slows down every allocation, only keep it on if someone else turned it on
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+        return result
+
+
+async def profile(
+    seconds: float,
+    tool_calls: int | None = None,
+    trace_memory: bool = False,
+    interval: float = 0.005,
+) -> dict:
+    """
+    Take a profile of the running process. Only one profile can be taken at a time.
+
+    Args:
+        seconds: Seconds to profile, or the maximum when profiling tool calls
+        tool_calls: Stop after this many tool calls finished, if given
+        trace_memory: Also report the largest allocation sites traced by tracemalloc
+        interval: Seconds between stack samples
+
+    Returns:
+        Profile, see ProfileSession.run
+
+    Raises:
+        ProfilerBusyError: If a profile is already being taken
+    """
+    global _active_session
+    if _active_session is not None:
+        raise ProfilerBusyError("A profile is already being taken")
+    session = _active_session = ProfileSession(seconds, tool_calls, trace_memory, interval)
+    try:
+        return await session.run()
+    finally:
+        _active_session = None
+
+
+def active_session() -> ProfileSession | None:
+    """Get the profile session being taken, if any."""
+    return _active_session
@@ -0,0 +1,130 @@
+import asyncio
+import hashlib
+import logging
+from typing import Any
+from urllib.parse import quote
+
+import metrics
+from cache import TTLCache
+from context import get_shop_domain, get_shop_id
+from models.order import Order, OrderLineItem, OrderShipping
+from services.storefront_client import StorefrontClient
+from utils import SAMPLED
+
+logger = logging.getLogger(__name__)
+
+
+class OrderRepository:
+    def __init__(self, storefront_client: StorefrontClient, status_cache: TTLCache[tuple, Order] | None = None):
+        """
+        Initialize order repository.
+
+        Args:
+            storefront_client: Shared Storefront API client
+            status_cache: Optional short-lived cache of orders, absorbing agents polling the same orders
+        """
+        self.storefront_client = storefront_client
+        self.status_cache = status_cache
+        self.timeout = 30
+
+    async def get_orders(self, order_ids: list[str], access_token: str) -> dict[str, Order | Exception]:
+        """Look up several of the customer's orders concurrently, fetching each distinct order once.
+
+        Orders are fetched with the customer's access token, so the Storefront API only returns
+        the customer's own orders. Cached orders are kept per shop and per token for the same reason.
+
+        Args:
+            order_ids: Order IDs, may contain duplicates
+            access_token: The customer's access token
+
+        Returns:
+            Mapping of order ID to its Order, or to the exception raised while fetching it
+        """
+        shop_id = get_shop_id()
+        # Only a digest of the token is kept in cache keys
+        customer_key = hashlib.sha256(access_token.encode()).hexdigest()
+        unique_ids = list(dict.fromkeys(order_ids))
+
+        results: dict[str, Order | Exception] = {}
+        missing = []
+        for order_id in unique_ids:
+            cached = None
+            if self.status_cache is not None:
+                cached = self.status_cache.get((shop_id, customer_key, order_id))
+            if cached is not None:
+                results[order_id] = cached
+            else:
+                missing.append(order_id)
+        if self.status_cache is not None:
+            metrics.increment("order_cache.hits", len(results))
+            metrics.increment("order_cache.misses", len(missing))
+        logger.info(
+            "Order lookup for shop_id=%s: %s cached, %s to fetch", shop_id, len(results), len(missing), extra=SAMPLED
+        )
+
+        orders = await asyncio.gather(
+            *[self.get_order(order_id, access_token) for order_id in missing],
+            return_exceptions=True,
+        )
+        for order_id, order in zip(missing, orders):
+            if isinstance(order, BaseException) and not isinstance(order, Exception):
+                raise order
+            if isinstance(order, Order) and self.status_cache is not None:
+                self.status_cache.set((shop_id, customer_key, order_id), order)
+            results[order_id] = order
+        return {order_id: results[order_id] for order_id in unique_ids}
+
+    async def get_order(self, order_id: str, access_token: str) -> Order:
+        """
+        Fetch one of the customer's orders from the Storefront API.
+
+        The access token is sent as is, so it must have been issued for the Storefront API
+        (see STOREFRONT_TOKEN_AUDIENCE), which check_order verifies before calling this.
+
+        Raises:
+            httpx.HTTPStatusError: If the order does not exist or does not belong to the customer (404),
+                the token is not accepted (401/403), or the API fails
+        """
+        data = await self.storefront_client.get_json(
+            get_shop_domain(),
+            f"/api/storefront/v1/orders/{quote(order_id, safe='')}",
+            endpoint="order_detail",
+            timeout=self.timeout,
+            headers={"Authorization": f"Bearer {access_token}"},
+        )
+        return self._parse_order(data, order_id)
+
+    @staticmethod
+    def _parse_order(data: dict[str, Any], order_id: str) -> Order:
+        """Convert a Storefront API order JSON object into an Order."""
+        line_items = [
+            OrderLineItem(
+                product_id=item.get("product_id"),
+                variant_id=item.get("variant_id"),
+                title=item.get("title", ""),
+                quantity=item.get("quantity", 0),
+                price=item.get("price"),
+            )
+            for item in data.get("line_items") or []
+        ]
+
+        shipping = None
+        if data.get("shipping"):
+            shipping = OrderShipping(
+                status=data["shipping"].get("status"),
+                carrier=data["shipping"].get("carrier"),
+                tracking_number=data["shipping"].get("tracking_number"),
+                estimated_delivery=data["shipping"].get("estimated_delivery"),
+            )
+
+        return Order(
+            id=str(data.get("id", order_id)),
+            status=data.get("status"),
+            payment_status=data.get("financial_status"),
+            fulfillment_status=data.get("fulfillment_status"),
+            created_at=data.get("created_at"),
+            total_price=data.get("total_price"),
+            currency=data.get("currency"),
+            line_items=line_items,
+            shipping=shipping,
+        )
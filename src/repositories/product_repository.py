@@ -1,10 +1,12 @@
 import asyncio
 import logging
-from typing import Any
+from typing import Any, AsyncIterator, Awaitable, Callable
 from pprint import pformat
 
 import httpx
 
+import metrics
+from cache import TTLCache
 from config import config
 from context import get_shop_domain, get_shop_id
 from models.product import (
@@ -12,24 +14,49 @@ from models.product import (
     ProductVariant,
     ProductDescription,
     ProductOption,
+    ProductSearchResult,
     ProductVariantPhoto,
     StoreType,
     Genre,
 )
+from services.catalog_snapshot import CatalogSnapshot
+from services.circuit_breaker import get_circuit_breaker
 from services.cyberbiz_bigquery_client import CyberbizBigQueryClient
 from services.embedding_client import EmbeddingClient
+from services.keyword_index import KeywordIndex
+from services.search_cursors import SearchCursorStore
+from services.storefront_client import StorefrontClient
+from services.vector_search_options import VectorSearchOptions, VectorSearchOptionsResolver
+from utils import SAMPLED
 
 logger = logging.getLogger(__name__)
 
 
+class ProductNotFoundError(LookupError):
+    """Raised (or returned among bulk details) for a product the Storefront API does not have."""
+
+
 class ProductRepository:
     def __init__(
         self,
         bigquery_client: CyberbizBigQueryClient,
-        embedding_client: EmbeddingClient
+        embedding_client: EmbeddingClient,
+        storefront_client: StorefrontClient,
+        search_cursor_store: SearchCursorStore,
+        catalog_snapshot: CatalogSnapshot | None = None,
+        keyword_index: KeywordIndex | None = None,
+        vector_search_options: VectorSearchOptionsResolver | None = None,
+        bulk_fetch_support: TTLCache[str, bool] | None = None,
     ):
         self.bigquery_client = bigquery_client
         self.embedding_client = embedding_client
+        self.storefront_client = storefront_client
+        self.search_cursor_store = search_cursor_store
+        self.catalog_snapshot = catalog_snapshot
+        self.keyword_index = keyword_index
+        self.vector_search_options = vector_search_options or VectorSearchOptionsResolver(VectorSearchOptions())
+        # Shop domain -> whether its list endpoint serves bulk detail fetches filtered by ID
+        self.bulk_fetch_support = bulk_fetch_support
         self.timeout = 30
 
     async def search_by_vector_similarity(
@@ -40,48 +67,277 @@ class ProductRepository:
         max_price: float | None = None,
         store_type: str | None = None,
         genre: str | None = None,
-    ) -> list[Product]:
+        page: int = 1,
+        cursor: str | None = None,
+        on_product: Callable[[Product, int, int], Awaitable[None]] | None = None,
+        search_options: VectorSearchOptions | None = None,
+    ) -> ProductSearchResult:
+        """Search products by embedding similarity.
+
+        A ranked candidate list deeper than one page is searched once and kept behind a cursor,
+        so that following pages only fetch the product details of the new page.
+
+        Degrades instead of failing when an upstream is unavailable: falls back to keyword
+        search if embeddings or BigQuery fail, and builds products from the BigQuery row
+        if their Storefront details cannot be fetched.
+
+        Args:
+            query: Natural language query
+            limit: Number of products per page
+            page: Page number, used when no cursor is given
+            cursor: Cursor returned as next_cursor by a previous search
+            on_product: Optional callback receiving (product, rank, total) for each product of the page
+                in rank order, as soon as its details and the details of all better ranked products arrived.
+                total is the number of products the page can still have, it decreases when products are skipped
+            search_options: VECTOR_SEARCH options of this request, overriding the shop's configured ones
+
+        Returns:
+            ProductSearchResult with products in similarity order
+
+        Raises:
+            ValueError: If page or limit is not positive, or the cursor is invalid, expired or was returned
+                for another query or filters
+        """
+        if page < 1:
+            raise ValueError("page must be 1 or more")
+        if limit < 1:
+            raise ValueError("limit must be 1 or more")
+
         # Get shop context
         shop_id = get_shop_id()
         shop_domain = get_shop_domain()
+        search_key = self.search_cursor_store.search_key(
+            query=query, min_price=min_price, max_price=max_price, store_type=store_type, genre=genre
+        )
 
-        logger.info(f"Vector search for shop_id={shop_id}, shop_domain={shop_domain}, query='{query}'")
+        if cursor:
+            loaded = await self.search_cursor_store.load(shop_id, cursor, search_key)
+            if loaded is None:
+                raise ValueError(
+                    "Search cursor is invalid or expired, or was returned for another query or filters, "
+                    "search again without a cursor"
+                )
+            search_id, rows, offset = loaded
+            logger.info("Vector search page for shop_id=%s from cursor, offset=%s", shop_id, offset, extra=SAMPLED)
+            return await self._build_search_page(search_id, rows, offset, limit, on_product)
+
+        logger.info(
+            "Vector search for shop_id=%s, shop_domain=%s, query=%r", shop_id, shop_domain, query, extra=SAMPLED
+        )
+
+        offset = (page - 1) * limit
+        top_k = max(config.VECTOR_SEARCH_CANDIDATE_DEPTH, offset + limit)
+
+        try:
+            embedding = await get_circuit_breaker("vertex_ai", shop_id).call(
+                lambda: self.embedding_client.generate_embedding(query)
+            )
+        except Exception as e:
+            logger.warning("Embedding unavailable, falling back to keyword search: %s", e)
+            return await self._keyword_fallback(
+                query,
+                limit,
+                min_price,
+                max_price,
+                store_type,
+                genre,
+                reason="embedding_unavailable",
+                page=page,
+                on_product=on_product,
+            )
 
-        embedding = await self.embedding_client.generate_embedding(query)
-        product_embedding_table = f"{config.CYBERBIZ_GCP_PROJECT_ID}.cyberbiz_embedding_gemini.product_embeddings"
         similarity_threshold = 0.2
 
         # Build filter conditions and query params
-        filter_conditions = []
+        where_filter, filter_params = self._build_vector_filters(min_price, max_price, store_type, genre)
         query_params = {
             "shop_id": shop_id,
             "embedding": embedding,
+            "limit": top_k,
+            "threshold": similarity_threshold,
+            **filter_params,
+        }
+
+        options = self.vector_search_options.resolve(shop_id, search_options)
+        sql = self._vector_search_sql(where_filter, options)
+
+        # Log the query for debugging
+        logger.info(
+            "Executing vector search with query_params: shop_id=%s, limit=%s, threshold=%s, options=%s",
+            query_params.get("shop_id"),
+            top_k,
+            similarity_threshold,
+            options.label(),
+            extra=SAMPLED,
+        )
+
+        try:
+            res = await self.bigquery_client.query(sql, query_params, kind="vector_search")
+        except Exception as e:
+            logger.warning("Vector search unavailable, falling back to keyword search: %s", e)
+            return await self._keyword_fallback(
+                query,
+                limit,
+                min_price,
+                max_price,
+                store_type,
+                genre,
+                reason="vector_search_unavailable",
+                page=page,
+                on_product=on_product,
+            )
+
+        if res:
+            if logger.isEnabledFor(logging.DEBUG):
+                # Building the summary is not free, skip it unless it is logged
+                logger.debug(
+                    "Vector search returned %s results, top similarity scores: %s, top results content: %s",
+                    len(res),
+                    [f"{r.get('similarity_score', 0):.4f}" for r in res[:3]],
+                    [(r.get("content") or "N/A")[:50] for r in res[:3]],
+                )
+        else:
+            logger.info("No results found for query: %r with threshold %s", query, similarity_threshold, extra=SAMPLED)
+
+        # Keep the candidates behind a cursor only if there are more pages to serve
+        search_id = None
+        if len(res) > offset + limit:
+            search_id = await self.search_cursor_store.save(shop_id, res, search_key)
+        return await self._build_search_page(search_id, res, offset, limit, on_product)
+
+    async def _build_search_page(
+        self,
+        search_id: str | None,
+        rows: list[dict],
+        offset: int,
+        limit: int,
+        on_product: Callable[[Product, int, int], Awaitable[None]] | None = None,
+    ) -> ProductSearchResult:
+        """Fetch the details of one page of ranked rows, with a cursor to the next page if there is one."""
+        page_rows = rows[offset:offset + limit]
+        product_ids = [row["product_id"] for row in page_rows]
+        if on_product is None:
+            details = await self.get_product_details(product_ids)
+        else:
+            rows_by_id = {row["product_id"]: row for row in page_rows}
+            details = {}
+            rank = 0
+            skipped = 0
+            async for product_id, detail in self.iter_product_details(product_ids):
+                details[product_id] = detail
+                product = self._search_row_product(rows_by_id[product_id], detail)
+                if product is None:
+                    skipped += 1
+                else:
+                    rank += 1
+                    await on_product(product, rank, len(page_rows) - skipped)
+
+        result = self._build_search_result(page_rows, details)
+        if search_id is not None and offset + limit < len(rows):
+            result.next_cursor = self.search_cursor_store.encode_cursor(search_id, offset + limit)
+        return result
+
+    async def search_by_vector_similarity_multi(
+        self,
+        queries: list[str],
+        limit: int,
+        min_price: float | None = None,
+        max_price: float | None = None,
+        store_type: str | None = None,
+        genre: str | None = None,
+        search_options: VectorSearchOptions | None = None,
+    ) -> list[ProductSearchResult]:
+        """Search products by embedding similarity for several queries at once.
+
+        All queries are embedded in one batched request and searched in a single
+        VECTOR_SEARCH job. Products found by several queries are fetched only once.
+        Degrades like search_by_vector_similarity, and takes the same search_options.
+
+        Returns:
+            One ProductSearchResult per query, in the order of the queries
+        """
+        shop_id = get_shop_id()
+
+        logger.info("Multi-query vector search for shop_id=%s, queries=%s", shop_id, queries, extra=SAMPLED)
+
+        try:
+            embeddings = await get_circuit_breaker("vertex_ai", shop_id).call(
+                lambda: self.embedding_client.generate_embeddings(queries)
+            )
+        except Exception as e:
+            logger.warning("Embeddings unavailable, falling back to keyword search: %s", e)
+            return await self._keyword_fallback_multi(
+                queries, limit, min_price, max_price, store_type, genre, reason="embedding_unavailable"
+            )
+
+        similarity_threshold = 0.2
+
+        # BigQuery does not support nested array parameters, so the query vectors are sent as one
+        # flat array and split back into one row per query with the vector dimension
+        where_filter, filter_params = self._build_vector_filters(min_price, max_price, store_type, genre)
+        query_params = {
+            "shop_id": shop_id,
+            "embeddings": [value for embedding in embeddings for value in embedding],
+            "dimension": len(embeddings[0]),
             "limit": limit,
-            "threshold": similarity_threshold
+            "threshold": similarity_threshold,
+            **filter_params,
         }
 
-        if min_price is not None:
-            filter_conditions.append("base.price >= @min_price")
-            query_params["min_price"] = min_price
+        options = self.vector_search_options.resolve(shop_id, search_options)
+        sql = self._vector_search_sql(where_filter, options, multi=True)
 
-        if max_price is not None:
-            filter_conditions.append("base.price <= @max_price")
-            query_params["max_price"] = max_price
+        try:
+            res = await self.bigquery_client.query(sql, query_params, kind="vector_search_multi")
+        except Exception as e:
+            logger.warning("Vector search unavailable, falling back to keyword search: %s", e)
+            return await self._keyword_fallback_multi(
+                queries, limit, min_price, max_price, store_type, genre, reason="vector_search_unavailable"
+            )
 
-        if store_type is not None:
-            filter_conditions.append("base.store_type = @store_type")
-            query_params["store_type"] = StoreType[store_type.upper()].value
+        logger.info(
+            "Multi-query vector search returned %s results for %s queries", len(res), len(queries), extra=SAMPLED
+        )
 
-        if genre is not None:
-            filter_conditions.append("base.genre = @genre")
-            query_params["genre"] = Genre[genre.upper()].value
+        rows_per_query: list[list[dict]] = [[] for _ in queries]
+        for row in res:
+            rows_per_query[row["query_index"]].append(row)
 
-        where_filter = ""
-        if filter_conditions:
-            where_filter = "AND " + " AND ".join(filter_conditions)
+        details = await self.get_product_details([row["product_id"] for row in res])
+        return [self._build_search_result(rows, details) for rows in rows_per_query]
+
+    @staticmethod
+    def _vector_search_sql(where_filter: str, options: VectorSearchOptions, multi: bool = False) -> str:
+        """
+        Build the VECTOR_SEARCH query of a shop's product embeddings.
 
-        sql = f"""
+        Args:
+            where_filter: Filter conditions from _build_vector_filters
+            options: VECTOR_SEARCH options
+            multi: Search the query vectors flattened into @embeddings with @dimension values each,
+                returning a query_index per row, instead of the single query vector @embedding
+
+        Returns:
+            SQL with the parameters @shop_id, @limit, @threshold and the filter parameters
+        """
+        product_embedding_table = f"{config.CYBERBIZ_GCP_PROJECT_ID}.cyberbiz_embedding_gemini.product_embeddings"
+        if multi:
+            query_index = "query.query_index,"
+            query_table = """(
+                    SELECT DIV(position, @dimension) AS query_index, ARRAY_AGG(value ORDER BY position) AS query_vector
+                    FROM UNNEST(@embeddings) AS value WITH OFFSET AS position
+                    GROUP BY query_index
+                ),
+                query_column_to_search => 'query_vector',"""
+            order_by = "query_index, similarity_score DESC"
+        else:
+            query_index = ""
+            query_table = "(SELECT @embedding AS query_vector),"
+            order_by = "similarity_score DESC"
+
+        return f"""
             SELECT
+                {query_index}
                 base.id as product_id,
                 base.shop_id,
                 base.content,
@@ -96,115 +352,340 @@ class ProductRepository:
                     WHERE shop_id = @shop_id
                 ),
                 'ml_generate_embedding_result',
-                (SELECT @embedding AS query_vector),
+                {query_table}
                 top_k => @limit,
-                distance_type => 'COSINE'
+                distance_type => 'COSINE'{options.sql_argument()}
                 )
             WHERE (1 - distance) >= @threshold
             {where_filter}
-            ORDER BY similarity_score DESC
+            ORDER BY {order_by}
         """
 
-        # Log the query for debugging
-        logger.info(f"Executing vector search with query_params: shop_id={query_params.get('shop_id')}, limit={limit}, threshold={similarity_threshold}")
+    @staticmethod
+    def _build_vector_filters(
+        min_price: float | None,
+        max_price: float | None,
+        store_type: str | None,
+        genre: str | None,
+    ) -> tuple[str, dict[str, Any]]:
+        """Build the WHERE clause filtering vector search results, and its query params."""
+        filter_conditions = []
+        query_params: dict[str, Any] = {}
 
-        res = await self.bigquery_client.query(sql, query_params)
+        if min_price is not None:
+            filter_conditions.append("base.price >= @min_price")
+            query_params["min_price"] = min_price
 
-        logger.info(f"Vector search returned {len(res)} results")
-        if res:
-            logger.info(f"Top result similarity scores: {[f'{r.get('similarity_score', 0):.4f}' for r in res[:3]]}")
-            # Log titles if available
-            if 'content' in res[0]:
-                logger.info(f"Top results content: {[r.get('content', 'N/A')[:50] for r in res[:3]]}")
-        else:
-            logger.warning(f"No results found for query: '{query}' with threshold {similarity_threshold}")
+        if max_price is not None:
+            filter_conditions.append("base.price <= @max_price")
+            query_params["max_price"] = max_price
 
-        # Extract product IDs and fetch details in parallel
-        product_ids = [result["product_id"] for result in res]
-        products = await asyncio.gather(*[self.get_product_detail(product_id) for product_id in product_ids])
+        if store_type is not None:
+            filter_conditions.append("base.store_type = @store_type")
+            query_params["store_type"] = StoreType[store_type.upper()].value
 
-        logger.info(f"Successfully fetched {len(products)} product details")
-        return products
+        if genre is not None:
+            filter_conditions.append("base.genre = @genre")
+            query_params["genre"] = Genre[genre.upper()].value
 
+        where_filter = ""
+        if filter_conditions:
+            where_filter = "AND " + " AND ".join(filter_conditions)
 
-    async def get_product_detail(self, product_id: int) -> Product:
-        shop_domain = get_shop_domain()
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            url = f"https://{shop_domain}/api/storefront/v1/products/{product_id}"
-            response = await client.get(url)
-            response.raise_for_status()
-            res = response.json()
+        return where_filter, query_params
 
-        variants = []
-        if res.get("variants"):
-            for variant in res["variants"]:
-                photo_urls = []
-                if variant.get("photo_urls"):
-                    for photo in variant["photo_urls"]:
-                        photo_urls.append(
-                            ProductVariantPhoto(
-                                thumb=photo.get("thumb"),
-                                large=photo.get("large"),
-                                original=photo.get("original"),
-                            )
-                        )
+    def _build_search_result(self, rows: list[dict], details: dict[int, Product | Exception]) -> ProductSearchResult:
+        """Combine vector search rows with their fetched details, in rank order."""
+        products = []
+        missing_product_ids = []
+        fallback_count = 0
+        for row in rows:
+            detail = details[row["product_id"]]
+            product = self._search_row_product(row, detail)
+            if product is None:
+                logger.warning("Skipping product %s: %s", row["product_id"], detail)
+                missing_product_ids.append(row["product_id"])
+                continue
+            if not isinstance(detail, Product):
+                logger.warning("Using search data for product %s: %s", row["product_id"], detail)
+                fallback_count += 1
+            products.append(product)
 
-                variants.append(
-                    ProductVariant(
-                        id=variant["id"],
-                        title=variant.get("title", ""),
-                        name=variant.get("name"),
-                        options=variant.get("options"),
-                        price=variant.get("price", 0),
-                        compare_at_price=variant.get("compare_at_price"),
-                        max_usable_bonus=variant.get("max_usable_bonus"),
-                        inventory_availability=variant.get("inventory_availability"),
-                        weight=variant.get("weight"),
-                        featured_image=variant.get("featured_image"),
-                        photo_urls=photo_urls if photo_urls else None,
-                    )
-                )
+        logger.info("Successfully fetched %s product details", len(products) - fallback_count, extra=SAMPLED)
+        if fallback_count:
+            return ProductSearchResult(
+                products=products,
+                degraded=True,
+                degraded_reason="product_details_unavailable",
+                missing_product_ids=missing_product_ids or None,
+            )
+        return ProductSearchResult(products=products, missing_product_ids=missing_product_ids or None)
 
-        descriptions = []
-        if res.get("descriptions"):
-            for desc in res["descriptions"]:
-                descriptions.append(
-                    ProductDescription(
-                        type=desc.get("type"),
-                        body_html=desc.get("body_html"),
-                    )
-                )
+    def _search_row_product(self, row: dict, detail: Product | Exception) -> Product | None:
+        """
+        Get the product to return for a search row.
 
-        options = []
-        if res.get("options"):
-            for opt in res["options"]:
-                options.append(
-                    ProductOption(
-                        name=opt.get("name", ""),
-                        types=opt.get("types", []),
-                    )
-                )
+        Returns the fetched details, a product built from the row if the details could not be
+        fetched, or None if the product is no longer published on the storefront.
+        """
+        if isinstance(detail, Product):
+            return detail
+        if isinstance(detail, ProductNotFoundError):
+            return None
+        if isinstance(detail, httpx.HTTPStatusError) and detail.response.status_code < 500:
+            return None
+        return self._product_from_search_row(row)
+
+    async def _keyword_fallback(
+        self,
+        query: str,
+        limit: int,
+        min_price: float | None,
+        max_price: float | None,
+        store_type: str | None,
+        genre: str | None,
+        reason: str,
+        page: int = 1,
+        on_product: Callable[[Product, int, int], Awaitable[None]] | None = None,
+    ) -> ProductSearchResult:
+        """Serve a vector search through the Storefront keyword search."""
+        products = await self.list_products(
+            query=query,
+            page=page,
+            per_page=limit,
+            store_type=store_type,
+            genre=genre,
+            min_price=min_price,
+            max_price=max_price,
+        )
+        if on_product is not None:
+            for rank, product in enumerate(products, start=1):
+                await on_product(product, rank, len(products))
+        return ProductSearchResult(products=products, degraded=True, degraded_reason=reason)
+
+    async def _keyword_fallback_multi(
+        self,
+        queries: list[str],
+        limit: int,
+        min_price: float | None,
+        max_price: float | None,
+        store_type: str | None,
+        genre: str | None,
+        reason: str,
+    ) -> list[ProductSearchResult]:
+        """Serve a multi-query vector search through concurrent Storefront keyword searches."""
+        return list(
+            await asyncio.gather(
+                *[
+                    self._keyword_fallback(query, limit, min_price, max_price, store_type, genre, reason)
+                    for query in queries
+                ]
+            )
+        )
 
+    @staticmethod
+    def _product_from_search_row(row: dict) -> Product:
+        """Build a minimal Product from a vector search row when Storefront details are unavailable."""
+        content = row.get("content") or ""
+        title = content.strip().split("\n", 1)[0][:100] or f"Product {row['product_id']}"
         return Product(
-            id=product_id,
-            title=res["title"],
-            handle=res.get("handle"),
-            price=res.get("price"),
-            photo_urls=res.get("photo_urls"),
-            brief=res.get("brief"),
-            slogan=res.get("slogan"),
-            vendor=res.get("vendor"),
-            channel=res.get("channel"),
-            temperature_types=res.get("temperature_types"),
-            product_type=res.get("product_type"),
-            store_type=res.get("store_type"),
-            genre=res.get("genre"),
-            product_url=res.get("product_url"),
-            descriptions=descriptions if descriptions else None,
-            options=options if options else None,
-            variants=variants,
+            id=row["product_id"],
+            title=title,
+            price=row.get("price"),
+            brief=content or None,
+            variants=[],
+        )
+
+
+    async def get_product_detail(self, product_id: int) -> Product:
+        snapshot = await self._fresh_catalog_snapshot()
+        if snapshot is not None:
+            payload = await asyncio.to_thread(snapshot.get_product, get_shop_id(), product_id)
+            if payload is not None:
+                metrics.increment("catalog_snapshot.detail_hits")
+                return self._parse_product(payload, product_id)
+            metrics.increment("catalog_snapshot.detail_misses")
+        return await self._get_product_detail_from_api(product_id)
+
+    async def _get_product_detail_from_api(self, product_id: int) -> Product:
+        return await self.storefront_client.get_revalidated(
+            get_shop_domain(),
+            f"/api/storefront/v1/products/{product_id}",
+            endpoint="product_detail",
+            decode=lambda data: self._parse_product(data, product_id),
+            timeout=self.timeout,
         )
 
+    async def iter_product_details(
+        self, product_ids: list[int], use_snapshot: bool = True
+    ) -> AsyncIterator[tuple[int, Product | Exception]]:
+        """Fetch details of several products in bulk, yielding them in the given order.
+
+        Each product is yielded as soon as its details and those of all products before it arrived.
+
+        Args:
+            product_ids: Distinct product IDs, in the order to yield them
+            use_snapshot: Whether details may be served from a fresh catalog snapshot
+
+        Yields:
+            Tuples of (product ID, Product or the exception raised while fetching it)
+        """
+        details, pending = await self._start_product_detail_fetches(product_ids, use_snapshot)
+        try:
+            for product_id in product_ids:
+                if product_id not in details:
+                    chunk_ids, task = next((ids, task) for ids, task in pending if product_id in ids)
+                    try:
+                        chunk_details = await task
+                    except Exception as e:
+                        chunk_details = e
+                    details.update(self._chunk_details(chunk_ids, chunk_details))
+                yield product_id, details[product_id]
+        finally:
+            for _, task in pending:
+                task.cancel()
+
+    async def get_product_details(
+        self, product_ids: list[int], use_snapshot: bool = True
+    ) -> dict[int, Product | Exception]:
+        """Fetch details of several products in bulk, fetching each distinct product once.
+
+        Args:
+            product_ids: Product IDs, may contain duplicates
+            use_snapshot: Whether details may be served from a fresh catalog snapshot, False for
+                reads that must see current stock
+
+        Returns:
+            Mapping of product ID to its Product, or to the exception raised while fetching or parsing it
+            (ProductNotFoundError for products the Storefront API did not return), in the given order
+        """
+        unique_ids = list(dict.fromkeys(product_ids))
+        details, pending = await self._start_product_detail_fetches(unique_ids, use_snapshot)
+        results = await asyncio.gather(*[task for _, task in pending], return_exceptions=True)
+        for (chunk_ids, _), chunk_details in zip(pending, results):
+            if isinstance(chunk_details, BaseException) and not isinstance(chunk_details, Exception):
+                raise chunk_details
+            details.update(self._chunk_details(chunk_ids, chunk_details))
+        return {product_id: details[product_id] for product_id in unique_ids}
+
+    @staticmethod
+    def _chunk_details(
+        chunk_ids: set[int], chunk_details: dict[int, Product | Exception] | Exception
+    ) -> dict[int, Product | Exception]:
+        """Details of a fetched chunk, or its error for each of its products if the whole fetch failed."""
+        if isinstance(chunk_details, Exception):
+            logger.warning("Product detail fetch of %s products failed: %s", len(chunk_ids), chunk_details)
+            return dict.fromkeys(chunk_ids, chunk_details)
+        return chunk_details
+
+    async def _start_product_detail_fetches(
+        self, product_ids: list[int], use_snapshot: bool = True
+    ) -> tuple[dict[int, Product | Exception], list[tuple[set[int], asyncio.Task]]]:
+        """
+        Serve what the catalog snapshot holds, and start fetching the rest in chunks.
+
+        Returns:
+            Details served from the snapshot, and (chunk IDs, task returning their details) per started fetch
+        """
+        details: dict[int, Product | Exception] = {}
+        snapshot = await self._fresh_catalog_snapshot() if use_snapshot else None
+        if snapshot is not None:
+            payloads = await asyncio.to_thread(snapshot.get_products, get_shop_id(), product_ids)
+            for product_id, payload in payloads.items():
+                try:
+                    details[product_id] = self._parse_product(payload, product_id)
+                except Exception as e:
+                    # Fetched from the API instead
+                    logger.warning("Invalid snapshot payload of product_id=%s: %s", product_id, e)
+            metrics.increment("catalog_snapshot.detail_hits", len(details))
+            metrics.increment("catalog_snapshot.detail_misses", len(product_ids) - len(details))
+
+        missing = [product_id for product_id in product_ids if product_id not in details]
+        size = config.PRODUCT_BULK_FETCH_SIZE
+        chunks = [missing[i:i + size] for i in range(0, len(missing), size)]
+        semaphore = asyncio.Semaphore(config.PRODUCT_DETAIL_CONCURRENCY)
+        pending = [
+            (set(chunk), asyncio.create_task(self._fetch_product_chunk(chunk, semaphore)))
+            for chunk in chunks
+        ]
+        return details, pending
+
+    async def _fetch_product_chunk(
+        self, product_ids: list[int], semaphore: asyncio.Semaphore
+    ) -> dict[int, Product | Exception]:
+        """
+        Fetch a chunk of products with one list request filtered by ID.
+
+        Falls back to bounded per-ID requests if the shop's API cannot serve bulk requests, which is
+        remembered for a while, or if the bulk request fails.
+        """
+        shop_domain = get_shop_domain()
+        bulk_supported = self.bulk_fetch_support.get(shop_domain) if self.bulk_fetch_support is not None else None
+        if len(product_ids) > 1 and config.PRODUCT_BULK_FETCH_ENABLED and bulk_supported is not False:
+            try:
+                items = await self.storefront_client.get_json(
+                    shop_domain,
+                    "/api/storefront/v1/products",
+                    endpoint="product_bulk",
+                    params={"ids": ",".join(map(str, product_ids)), "per_page": len(product_ids)},
+                    timeout=self.timeout,
+                )
+                if not isinstance(items, list):
+                    raise ValueError(f"Expected a list of products, got {type(items).__name__}")
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code < 500:
+                    self._mark_bulk_unsupported(shop_domain, f"status {e.response.status_code}")
+                else:
+                    logger.warning("Bulk product fetch failed, fetching products one by one: %s", e)
+            except Exception as e:
+                logger.warning("Bulk product fetch failed, fetching products one by one: %s", e)
+            else:
+                requested = set(product_ids)
+                products = [item for item in items if isinstance(item, dict)]
+                returned = {item["id"]: item for item in products if item.get("id") in requested}
+                if any(item.get("id") not in requested for item in products):
+                    # Products that were not asked for: the API ignores the ID filter
+                    self._mark_bulk_unsupported(shop_domain, "ID filter ignored")
+                else:
+                    if self.bulk_fetch_support is not None:
+                        self.bulk_fetch_support.set(shop_domain, True)
+                    metrics.increment("product_bulk.requests")
+                    details: dict[int, Product | Exception] = {}
+                    for product_id in product_ids:
+                        if product_id not in returned:
+                            details[product_id] = ProductNotFoundError(f"Product {product_id} not found")
+                            continue
+                        try:
+                            details[product_id] = self._parse_product(returned[product_id], product_id)
+                        except Exception as e:
+                            # Only this product is unusable, the rest of the chunk is still served
+                            metrics.increment("product_bulk.invalid")
+                            logger.warning("Invalid bulk product JSON of product_id=%s: %s", product_id, e)
+                            details[product_id] = e
+                    not_found = len(product_ids) - len(returned)
+                    if not_found:
+                        metrics.increment("product_bulk.missing", not_found)
+                        logger.info("Bulk product fetch did not return %s of %s products", not_found, len(product_ids))
+                    return details
+
+        async def fetch(product_id: int) -> Product:
+            async with semaphore:
+                return await self._get_product_detail_from_api(product_id)
+
+        results = await asyncio.gather(*[fetch(product_id) for product_id in product_ids], return_exceptions=True)
+        details = {}
+        for product_id, detail in zip(product_ids, results):
+            if isinstance(detail, BaseException) and not isinstance(detail, Exception):
+                raise detail
+            details[product_id] = detail
+        return details
+
+    def _mark_bulk_unsupported(self, shop_domain: str, reason: str) -> None:
+        metrics.increment("product_bulk.unsupported")
+        logger.warning("Bulk product fetch unsupported by %s (%s), fetching products one by one", shop_domain, reason)
+        if self.bulk_fetch_support is not None:
+            self.bulk_fetch_support.set(shop_domain, False)
+
     async def list_products(
         self,
         query: str | None = None,
@@ -215,9 +696,13 @@ class ProductRepository:
         min_price: float | None = None,
         max_price: float | None = None,
         sort_by: str | None = None,
+        api_default_sort_by: str | None = None,
     ) -> list[Product]:
         """List published products with filtering and sorting options.
 
+        Keyword searches are answered from the shop's keyword index when it is built and
+        fresh, ranked by relevance unless sort_by is given, and from the Storefront API otherwise.
+
         Args:
             query: Search keyword (searches product name, description, type, vendor, channel)
             page: Page number (default: 1)
@@ -227,10 +712,47 @@ class ProductRepository:
             min_price: Minimum price filter
             max_price: Maximum price filter
             sort_by: Sort method (price-asc, price-desc, sell_from-asc, sell_from-desc, recent_days_sold-asc, recent_days_sold-desc)
+            api_default_sort_by: Sort method sent to the Storefront API when sort_by is not given
 
         Returns:
             List of Product objects
         """
+        snapshot = await self._fresh_catalog_snapshot()
+        if snapshot is not None and not query and snapshot.supports_sort(sort_by or api_default_sort_by):
+            metrics.increment("catalog_snapshot.list_hits")
+            items = await asyncio.to_thread(
+                snapshot.list_products,
+                get_shop_id(),
+                page=page,
+                per_page=per_page,
+                store_type=store_type,
+                genre=genre,
+                min_price=min_price,
+                max_price=max_price,
+                sort_by=sort_by or api_default_sort_by,
+            )
+            return [self._parse_product(item) for item in items]
+
+        if snapshot is not None and query and self.keyword_index is not None and KeywordIndex.supports_sort(sort_by):
+            index = self.keyword_index.get(get_shop_id())
+            if index is not None:
+                products = index.search(
+                    query,
+                    page=page,
+                    per_page=per_page,
+                    store_type=store_type,
+                    genre=genre,
+                    min_price=min_price,
+                    max_price=max_price,
+                    sort_by=sort_by,
+                )
+                # The Storefront search also matches fields the index does not hold, so ask it before
+                # answering with nothing
+                if products:
+                    metrics.increment("keyword_index.hits")
+                    return products
+                metrics.increment("keyword_index.misses")
+
         params: dict[str, Any] = {
             "page": page,
             "per_page": per_page,
@@ -246,87 +768,104 @@ class ProductRepository:
             params["min_price"] = min_price
         if max_price is not None:
             params["max_price"] = max_price
-        if sort_by:
-            params["sort_by"] = sort_by
+        if sort_by or api_default_sort_by:
+            params["sort_by"] = sort_by or api_default_sort_by
 
         shop_domain = get_shop_domain()
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            url = f"https://{shop_domain}/api/storefront/v1/products"
-            response = await client.get(url, params=params)
-            response.raise_for_status()
-            res = response.json()
+        products = await self.storefront_client.get_revalidated(
+            shop_domain,
+            "/api/storefront/v1/products",
+            endpoint="product_list",
+            decode=lambda res: [self._parse_product(item) for item in res],
+            params=params,
+            timeout=self.timeout,
+        )
+        # The decoded list may be served again on a 304, callers get their own copy
+        return list(products)
 
-        products = []
-        for item in res:
-            variants = []
-            if item.get("variants"):
-                for variant in item["variants"]:
-                    photo_urls = []
-                    if variant.get("photo_urls"):
-                        for photo in variant["photo_urls"]:
-                            photo_urls.append(
-                                ProductVariantPhoto(
-                                    thumb=photo.get("thumb"),
-                                    large=photo.get("large"),
-                                    original=photo.get("original"),
-                                )
-                            )
+    async def _fresh_catalog_snapshot(self) -> CatalogSnapshot | None:
+        """
+        Get the catalog snapshot if it can serve reads for the current shop.
 
-                    variants.append(
-                        ProductVariant(
-                            id=variant["id"],
-                            title=variant.get("title", ""),
-                            name=variant.get("name"),
-                            options=variant.get("options"),
-                            price=variant.get("price", 0),
-                            compare_at_price=variant.get("compare_at_price"),
-                            max_usable_bonus=variant.get("max_usable_bonus"),
-                            inventory_availability=variant.get("inventory_availability"),
-                            weight=variant.get("weight"),
-                            featured_image=variant.get("featured_image"),
-                            photo_urls=photo_urls if photo_urls else None,
-                        )
-                    )
+        Also marks the shop as active so that the catalogs of shops using the server are kept in sync.
+        """
+        if self.catalog_snapshot is None:
+            return None
+        shop_id = get_shop_id()
+        self.catalog_snapshot.mark_active(shop_id, get_shop_domain())
+        fresh = await asyncio.to_thread(self.catalog_snapshot.is_fresh, shop_id)
+        return self.catalog_snapshot if fresh else None
 
-            descriptions = []
-            if item.get("descriptions"):
-                for desc in item["descriptions"]:
-                    descriptions.append(
-                        ProductDescription(
-                            type=desc.get("type"),
-                            body_html=desc.get("body_html"),
+    @staticmethod
+    def _parse_product(data: dict, product_id: int | None = None) -> Product:
+        """Convert a Storefront API product JSON object into a Product."""
+        variants = []
+        if data.get("variants"):
+            for variant in data["variants"]:
+                photo_urls = []
+                if variant.get("photo_urls"):
+                    for photo in variant["photo_urls"]:
+                        photo_urls.append(
+                            ProductVariantPhoto(
+                                thumb=photo.get("thumb"),
+                                large=photo.get("large"),
+                                original=photo.get("original"),
+                            )
                         )
+
+                variants.append(
+                    ProductVariant(
+                        id=variant["id"],
+                        title=variant.get("title", ""),
+                        name=variant.get("name"),
+                        options=variant.get("options"),
+                        price=variant.get("price", 0),
+                        compare_at_price=variant.get("compare_at_price"),
+                        max_usable_bonus=variant.get("max_usable_bonus"),
+                        inventory_availability=variant.get("inventory_availability"),
+                        weight=variant.get("weight"),
+                        quantity=variant.get("quantity"),
+                        featured_image=variant.get("featured_image"),
+                        photo_urls=photo_urls if photo_urls else None,
                     )
+                )
 
-            options = []
-            if item.get("options"):
-                for opt in item["options"]:
-                    options.append(
-                        ProductOption(
-                            name=opt.get("name", ""),
-                            types=opt.get("types", []),
-                        )
+        descriptions = []
+        if data.get("descriptions"):
+            for desc in data["descriptions"]:
+                descriptions.append(
+                    ProductDescription(
+                        type=desc.get("type"),
+                        body_html=desc.get("body_html"),
                     )
+                )
 
-            product = Product(
-                id=item["id"],
-                title=item["title"],
-                handle=item.get("handle"),
-                price=item.get("price"),
-                photo_urls=item.get("photo_urls"),
-                brief=item.get("brief"),
-                slogan=item.get("slogan"),
-                vendor=item.get("vendor"),
-                channel=item.get("channel"),
-                temperature_types=item.get("temperature_types"),
-                product_type=item.get("product_type"),
-                store_type=item.get("store_type"),
-                genre=item.get("genre"),
-                product_url=item.get("product_url"),
-                descriptions=descriptions if descriptions else None,
-                options=options if options else None,
-                variants=variants,
-            )
-            products.append(product)
+        options = []
+        if data.get("options"):
+            for opt in data["options"]:
+                options.append(
+                    ProductOption(
+                        name=opt.get("name", ""),
+                        types=opt.get("types", []),
+                    )
+                )
 
-        return products
+        return Product(
+            id=product_id if product_id is not None else data["id"],
+            title=data["title"],
+            handle=data.get("handle"),
+            price=data.get("price"),
+            photo_urls=data.get("photo_urls"),
+            brief=data.get("brief"),
+            slogan=data.get("slogan"),
+            vendor=data.get("vendor"),
+            channel=data.get("channel"),
+            temperature_types=data.get("temperature_types"),
+            product_type=data.get("product_type"),
+            store_type=data.get("store_type"),
+            genre=data.get("genre"),
+            product_url=data.get("product_url"),
+            descriptions=descriptions if descriptions else None,
+            options=options if options else None,
+            variants=variants,
+        )
@@ -1,29 +1,163 @@
 """MCP server initialization and tool registration."""
 # ruff: noqa
 
+import asyncio
 from typing import cast
 from fastmcp.server.server import Transport
 from starlette.middleware import Middleware
 from starlette.requests import Request
-from starlette.responses import JSONResponse, Response
+from starlette.responses import JSONResponse, PlainTextResponse, Response
 from config import config
 from context import get_shop_id, get_shop_domain
+from dependencies import get_bigquery_ledger, get_catalog_change_log, get_memory_budget
+from lifespan import lifespan
 from mcp_instance import mcp
-from middleware import ShopContextMiddleware
+from middleware import CompressionMiddleware, DeadlineMiddleware, ProfilingMiddleware, ShopContextMiddleware
+import hmac
+import metrics
+import profiling
 
 # Import tools module to register all tools via decorators
 import tools
 
+mcp.add_middleware(DeadlineMiddleware(default_timeout=config.REQUEST_TIMEOUT))
+mcp.add_middleware(ProfilingMiddleware())
+
 
 @mcp.custom_route("/health", methods=["GET"])
 async def health_check(request: Request) -> Response:
     """Health check endpoint to verify the tool server is running."""
     return JSONResponse({"status": "ok", "service": "cyberbiz-shopping-mcp"})
 
-if __name__ == "__main__":
-    mcp.run(
-        transport=cast(Transport, config.TRANSPORT),
-        host=config.HOST,
-        port=config.PORT,
-        middleware=[Middleware(ShopContextMiddleware)],
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrics_snapshot(request: Request) -> Response:
+    """
+    Expose in-process counters (e.g. Storefront request hedging) and the memory used by caches.
+
+    Requires `Authorization: Bearer <METRICS_TOKEN>`, and is disabled when METRICS_TOKEN is not set.
+    """
+    if (error := _bearer_auth_error(request, config.METRICS_TOKEN)) is not None:
+        return error
+    return JSONResponse({"counters": metrics.snapshot(), "memory": get_memory_budget().snapshot()})
+
+
+def _bearer_auth_error(request: Request, token: str) -> Response | None:
+    """Check a route's bearer token, returning the error response if it is missing or wrong, or the route disabled."""
+    if not token:
+        return JSONResponse({"error": "Not found"}, status_code=404)
+    authorization = request.headers.get("Authorization", "")
+    if not hmac.compare_digest(authorization.encode(), f"Bearer {token}".encode()):
+        return JSONResponse({"error": "Unauthorized"}, status_code=401)
+    return None
+
+
+def _debug_auth_error(request: Request) -> Response | None:
+    """Check the DEBUG_TOKEN bearer token of a /debug route, returning the error response if it is missing or wrong."""
+    return _bearer_auth_error(request, config.DEBUG_TOKEN)
+
+
+@mcp.custom_route("/debug/profile", methods=["POST"])
+async def debug_profile(request: Request) -> Response:
+    """
+    Profile the live process for `seconds` seconds, or for the next `tool_calls` tool calls.
+
+    Requires `Authorization: Bearer <DEBUG_TOKEN>`, and is disabled when DEBUG_TOKEN is not set.
+    Returns the collapsed stacks as text/plain, or as JSON together with the largest
+    allocation sites when `tracemalloc=true`.
+    """
+    if (error := _debug_auth_error(request)) is not None:
+        return error
+
+    try:
+        tool_calls = int(request.query_params["tool_calls"]) if "tool_calls" in request.query_params else None
+        seconds = float(request.query_params.get("seconds", config.DEBUG_PROFILE_MAX_SECONDS if tool_calls else 10))
+    except ValueError:
+        return JSONResponse({"error": "seconds and tool_calls must be numbers"}, status_code=400)
+    if seconds <= 0 or seconds > config.DEBUG_PROFILE_MAX_SECONDS or (tool_calls is not None and tool_calls <= 0):
+        return JSONResponse(
+            {"error": f"seconds must be in (0, {config.DEBUG_PROFILE_MAX_SECONDS}] and tool_calls positive"},
+            status_code=400,
+        )
+    trace_memory = request.query_params.get("tracemalloc", "false").lower() == "true"
+
+    try:
+        result = await profiling.profile(seconds, tool_calls=tool_calls, trace_memory=trace_memory)
+    except profiling.ProfilerBusyError as e:
+        return JSONResponse({"error": str(e)}, status_code=409)
+    if trace_memory:
+        return JSONResponse(result)
+    return PlainTextResponse(
+        result["collapsed"],
+        headers={
+            "X-Profile-Samples": str(result["samples"]),
+            "X-Profile-Duration": str(result["duration"]),
+            "X-Profile-Tool-Calls": str(result["tool_calls"]),
+        },
     )
+
+
+@mcp.custom_route("/debug/bigquery", methods=["GET"])
+async def debug_bigquery(request: Request) -> Response:
+    """
+    BigQuery job statistics per shop and query kind, most bytes billed first.
+
+    Requires `Authorization: Bearer <DEBUG_TOKEN>`. Pass `shop_id` to only get one shop's statistics.
+    """
+    if (error := _debug_auth_error(request)) is not None:
+        return error
+    try:
+        shop_id = int(request.query_params["shop_id"]) if "shop_id" in request.query_params else None
+    except ValueError:
+        return JSONResponse({"error": "shop_id must be a number"}, status_code=400)
+    return JSONResponse({"queries": get_bigquery_ledger().snapshot(shop_id)})
+
+
+@mcp.custom_route("/webhooks/product-changes", methods=["POST"])
+async def product_changes_webhook(request: Request) -> Response:
+    """
+    Invalidate what every replica cached about changed products.
+
+    Requires `Authorization: Bearer <CACHE_INVALIDATION_TOKEN>`, and is disabled when the token is not set.
+    Takes a JSON body `{"shop_id": 1234, "product_ids": [1, 2]}`. Search cursors holding the products are
+    dropped at once, and every replica refreshes them in its catalog snapshot within the poll interval.
+    """
+    if (error := _bearer_auth_error(request, config.CACHE_INVALIDATION_TOKEN)) is not None:
+        return error
+    try:
+        body = await request.json()
+        shop_id = body["shop_id"]
+        product_ids = body["product_ids"]
+    except (ValueError, KeyError, TypeError):
+        return JSONResponse({"error": "Body must be JSON with shop_id and product_ids"}, status_code=400)
+    if (
+        not isinstance(shop_id, int)
+        or not isinstance(product_ids, list)
+        or not all(isinstance(product_id, int) and not isinstance(product_id, bool) for product_id in product_ids)
+    ):
+        return JSONResponse({"error": "shop_id and product_ids must be integers"}, status_code=400)
+    try:
+        changed_at = await get_catalog_change_log().append(shop_id, product_ids)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    return JSONResponse({"status": "accepted", "changed_at": changed_at}, status_code=202)
+
+
+if __name__ == "__main__":
+    middleware = [Middleware(ShopContextMiddleware)]
+    if config.RESPONSE_COMPRESSION_ENABLED:
+        # Outermost, so that every response including errors can be compressed
+        middleware.insert(0, Middleware(CompressionMiddleware, minimum_size=config.RESPONSE_COMPRESSION_MIN_SIZE))
+
+    async def main() -> None:
+        # Background tasks live as long as the process, not as long as one MCP session
+        async with lifespan():
+            await mcp.run_async(
+                transport=cast(Transport, config.TRANSPORT),
+                host=config.HOST,
+                port=config.PORT,
+                middleware=middleware,
+                stateless_http=config.STATELESS_HTTP,
+            )
+
+    asyncio.run(main())
@@ -0,0 +1,89 @@
+"""Per-shop, per-query-kind ledger of BigQuery job cost and latency."""
+
+import threading
+from dataclasses import asdict, dataclass
+from datetime import datetime
+
+from google.cloud import bigquery
+
+
+@dataclass
+class QueryKindStats:
+    """Accumulated statistics of one shop's queries of one kind."""
+    shop_id: int
+    kind: str
+    jobs: int = 0
+    errors: int = 0
+    bytes_limit_exceeded: int = 0
+    timeouts: int = 0
+    cancellations: int = 0
+    cache_hits: int = 0
+    latency_ms: float = 0.0
+    max_latency_ms: float = 0.0
+    queue_ms: float = 0.0
+    slot_ms: int = 0
+    bytes_processed: int = 0
+    bytes_billed: int = 0
+
+
+class BigQueryLedger:
+    """Records the cost and latency of every BigQuery job, keyed by shop and query kind."""
+
+    def __init__(self):
+        self._stats: dict[tuple[int, str], QueryKindStats] = {}
+        self._lock = threading.Lock()
+
+    def record_job(self, shop_id: int, kind: str, job: bigquery.QueryJob, latency_ms: float) -> None:
+        """
+        Record a completed job.
+
+        Args:
+            shop_id: Shop the query ran for
+            kind: Query template name, e.g. "vector_search"
+            job: Completed query job, read for slot time, bytes, cache hit and queue time
+            latency_ms: Wall time the caller waited for the job and its rows
+        """
+        queue_ms = _milliseconds_between(job.created, job.started)
+        with self._lock:
+            stats = self._get(shop_id, kind)
+            stats.jobs += 1
+            stats.cache_hits += 1 if job.cache_hit else 0
+            stats.latency_ms += latency_ms
+            stats.max_latency_ms = max(stats.max_latency_ms, latency_ms)
+            stats.queue_ms += queue_ms
+            stats.slot_ms += job.slot_millis or 0
+            stats.bytes_processed += job.total_bytes_processed or 0
+            stats.bytes_billed += job.total_bytes_billed or 0
+
+    def record_error(
+        self, shop_id: int, kind: str, bytes_limit_exceeded: bool = False, timed_out: bool = False
+    ) -> None:
+        """Record a failed job, and whether it would bill more than its byte limit or ran out of time."""
+        with self._lock:
+            stats = self._get(shop_id, kind)
+            stats.errors += 1
+            stats.bytes_limit_exceeded += 1 if bytes_limit_exceeded else 0
+            stats.timeouts += 1 if timed_out else 0
+
+    def record_cancellation(self, shop_id: int, kind: str) -> None:
+        """Record a job cancelled because the request waiting for it gave up."""
+        with self._lock:
+            self._get(shop_id, kind).cancellations += 1
+
+    def snapshot(self, shop_id: int | None = None) -> list[dict]:
+        """Get the statistics of all shops, or of one shop, sorted by bytes billed."""
+        with self._lock:
+            stats = [asdict(s) for s in self._stats.values() if shop_id is None or s.shop_id == shop_id]
+        return sorted(stats, key=lambda s: s["bytes_billed"], reverse=True)
+
+    def _get(self, shop_id: int, kind: str) -> QueryKindStats:
+        stats = self._stats.get((shop_id, kind))
+        if stats is None:
+            stats = self._stats[(shop_id, kind)] = QueryKindStats(shop_id=shop_id, kind=kind)
+        return stats
+
+
+def _milliseconds_between(start: datetime | None, end: datetime | None) -> float:
+    if start is None or end is None:
+        return 0.0
+    return max(0.0, (end - start).total_seconds() * 1000)
@@ -0,0 +1,201 @@
+"""Log of merchant product changes, shared by all replicas through the state store."""
+
+import asyncio
+import json
+import logging
+import time
+from dataclasses import dataclass
+
+import metrics
+from services.catalog_snapshot import CatalogSnapshot
+from services.catalog_sync import CatalogSyncer
+from services.state_store import StateStore
+
+logger = logging.getLogger(__name__)
+
+# Product IDs accepted per change event
+MAX_PRODUCT_IDS = 500
+# Change events kept per shop, older ones are dropped
+MAX_EVENTS = 200
+# Seconds a writer may hold a shop's log while appending, and between attempts to take it
+LOCK_TTL = 5
+LOCK_RETRY_INTERVAL = 0.05
+# Seconds of clock difference between replicas tolerated when comparing their timestamps
+CLOCK_SKEW = 60
+
+
+@dataclass
+class ShopChanges:
+    """A shop's retained change events, and when the newest dropped event happened (0 if none was dropped)."""
+    events: list[tuple[float, list[int]]]
+    dropped_at: float
+
+    def changed_since(self, since: float) -> set[int] | None:
+        """Products changed after a timestamp, or None if events after it were dropped."""
+        if self.dropped_at > since:
+            return None
+        return {
+            product_id for changed_at, product_ids in self.events if changed_at > since for product_id in product_ids
+        }
+
+
+class CatalogChangeLog:
+    """
+    Per-shop log of product change events, e.g. reported by the merchant platform's webhook.
+
+    Every replica reads the log to invalidate what it cached about the changed products, so
+    appending on one replica reaches all of them. Events are kept for a retention period and
+    at most MAX_EVENTS per shop; readers that fall behind further learn that events were dropped.
+    The timestamp of each shop's newest event is also stored on its own, so that frequent readers
+    can tell that nothing changed without decoding the log.
+    """
+
+    def __init__(self, state_store: StateStore, retention: float):
+        """
+        Initialize catalog change log.
+
+        Args:
+            state_store: Store shared by all replicas, holding the logs
+            retention: Seconds a shop's log is kept after its last change
+        """
+        self.state_store = state_store
+        self.retention = retention
+
+    async def append(self, shop_id: int, product_ids: list[int]) -> float:
+        """
+        Record that products of a shop changed.
+
+        Args:
+            shop_id: Shop ID
+            product_ids: Changed product IDs, at most MAX_PRODUCT_IDS
+
+        Returns:
+            Timestamp of the change event
+
+        Raises:
+            ValueError: If no or more than MAX_PRODUCT_IDS product IDs are given
+        """
+        if not product_ids or len(product_ids) > MAX_PRODUCT_IDS:
+            raise ValueError(f"Pass between 1 and {MAX_PRODUCT_IDS} product IDs")
+        key = f"catalog_changes:{shop_id}"
+        # Appending is read-modify-write, serialized by a lock that expires if its holder dies
+        while not await self.state_store.add(f"{key}:lock", b"1", LOCK_TTL):
+            await asyncio.sleep(LOCK_RETRY_INTERVAL)
+        try:
+            changes = await self.get(shop_id)
+            # Strictly increasing, even if this replica's clock is behind the previous writer's
+            changed_at = max(time.time(), changes.events[-1][0] + 0.001 if changes.events else 0)
+            changes.events.append((changed_at, list(dict.fromkeys(product_ids))))
+            if len(changes.events) > MAX_EVENTS:
+                changes.dropped_at = changes.events[-MAX_EVENTS - 1][0]
+                changes.events = changes.events[-MAX_EVENTS:]
+            entry = {"events": changes.events, "dropped_at": changes.dropped_at}
+            await self.state_store.set(key, json.dumps(entry).encode(), self.retention)
+            await self.state_store.set(f"{key}:latest", str(changed_at).encode(), self.retention)
+        finally:
+            await self.state_store.delete(f"{key}:lock")
+        metrics.increment("catalog_changes.events")
+        metrics.increment("catalog_changes.products", len(product_ids))
+        return changed_at
+
+    async def latest(self, shop_id: int) -> float | None:
+        """Timestamp of a shop's newest change event, read without decoding its log, or None if unknown."""
+        stored = await self.state_store.get(f"catalog_changes:{shop_id}:latest")
+        return float(stored) if stored is not None else None
+
+    async def changed_since(self, shop_id: int, since: float) -> set[int] | None:
+        """
+        Products of a shop changed after a timestamp, or None if events after it were dropped.
+
+        The log is only decoded if the shop's newest change event is after the timestamp.
+        """
+        latest = await self.latest(shop_id)
+        if latest is not None and latest <= since:
+            return set()
+        return (await self.get(shop_id)).changed_since(since)
+
+    async def get(self, shop_id: int) -> ShopChanges:
+        """Get the retained change events of a shop, oldest first."""
+        stored = await self.state_store.get(f"catalog_changes:{shop_id}")
+        if stored is None:
+            return ShopChanges(events=[], dropped_at=0)
+        entry = json.loads(stored)
+        return ShopChanges(
+            events=[(changed_at, product_ids) for changed_at, product_ids in entry["events"]],
+            dropped_at=entry["dropped_at"],
+        )
+
+
+class CatalogInvalidator:
+    """
+    Applies logged product changes to this process's catalog snapshot and keyword index.
+
+    Polls the change log of every shop the snapshot serves, and refreshes the changed products
+    in the snapshot. If events were dropped before they could be applied, the shop's snapshot
+    stops serving reads until its next full sync.
+    """
+
+    def __init__(
+        self,
+        change_log: CatalogChangeLog,
+        snapshot: CatalogSnapshot,
+        syncer: CatalogSyncer,
+        poll_interval: float,
+    ):
+        """
+        Initialize catalog invalidator.
+
+        Args:
+            change_log: Log of product changes
+            snapshot: Catalog snapshot to keep fresh
+            syncer: Syncer refreshing changed products in the snapshot
+            poll_interval: Seconds between reads of the change log
+        """
+        self.change_log = change_log
+        self.snapshot = snapshot
+        self.syncer = syncer
+        self.poll_interval = poll_interval
+        # shop_id -> timestamp of the newest change event applied to the snapshot
+        self._applied: dict[int, float] = {}
+
+    async def run(self) -> None:
+        """Apply product changes forever, until cancelled."""
+        logger.info("Catalog change polling started")
+        while True:
+            for shop_id, shop_domain in self.snapshot.active_shops(self.syncer.max_idle):
+                try:
+                    await self.apply_changes(shop_id, shop_domain)
+                except Exception as e:
+                    logger.warning("Applying catalog changes failed for shop_id=%s: %s", shop_id, e)
+            await asyncio.sleep(self.poll_interval)
+
+    async def apply_changes(self, shop_id: int, shop_domain: str) -> None:
+        """
+        Refresh the products of a shop changed since the changes last applied.
+
+        If the refresh fails, the changes are not marked as applied, so the next poll retries them.
+        """
+        applied = self._applied.get(shop_id)
+        if applied is not None:
+            latest = await self.change_log.latest(shop_id)
+            if latest is not None and latest <= applied:
+                return
+        changes = await self.change_log.get(shop_id)
+        if applied is None:
+            # First poll of this shop by this process: the snapshot, possibly persisted by a previous
+            # process, holds everything up to its last full sync
+            _, last_full_sync_at = self.snapshot.sync_state(shop_id)
+            if last_full_sync_at is None:
+                # Not synced yet, the first full sync reads every product
+                self._applied[shop_id] = changes.events[-1][0] if changes.events else 0
+                return
+            applied = last_full_sync_at - CLOCK_SKEW
+
+        changed = changes.changed_since(applied)
+        if changed is None:
+            metrics.increment("catalog_changes.resyncs")
+            logger.warning("Catalog changes of shop_id=%s were dropped before being applied, resyncing", shop_id)
+            self.snapshot.expire(shop_id)
+        elif changed:
+            await self.syncer.refresh_products(shop_id, shop_domain, sorted(changed))
+        self._applied[shop_id] = max(applied, changes.events[-1][0]) if changes.events else applied
@@ -0,0 +1,294 @@
+"""Local SQLite snapshot of each shop's Storefront catalog."""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    shop_id INTEGER NOT NULL,
+    product_id INTEGER NOT NULL,
+    price REAL,
+    store_type TEXT,
+    genre TEXT,
+    sell_from_rank INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    synced_at REAL NOT NULL,
+    PRIMARY KEY (shop_id, product_id)
+);
+CREATE INDEX IF NOT EXISTS products_sell_from ON products (shop_id, sell_from_rank);
+CREATE INDEX IF NOT EXISTS products_price ON products (shop_id, price);
+CREATE TABLE IF NOT EXISTS shops (
+    shop_id INTEGER PRIMARY KEY,
+    shop_domain TEXT NOT NULL,
+    last_sync_at REAL,
+    last_full_sync_at REAL
+);
+"""
+
+# Sort options of the Storefront list endpoint that the snapshot can reproduce.
+# sell_from_rank is 0 for the most recently listed product and grows with age.
+SORT_COLUMNS = {
+    "price-asc": "price ASC, sell_from_rank ASC",
+    "price-desc": "price DESC, sell_from_rank ASC",
+    "sell_from-asc": "sell_from_rank DESC",
+    "sell_from-desc": "sell_from_rank ASC",
+}
+
+
+class CatalogSnapshot:
+    """
+    Per-shop copy of the Storefront catalog, filled by CatalogSyncer.
+
+    Products are stored as the Storefront JSON payload plus the columns needed to
+    filter and sort list reads. Reads are only served for shops whose last sync is
+    more recent than the configured staleness limit.
+    """
+
+    def __init__(self, path: str, max_staleness: float):
+        """
+        Initialize catalog snapshot.
+
+        Args:
+            path: SQLite database file path
+            max_staleness: Seconds after the last sync during which the snapshot serves reads
+        """
+        self.max_staleness = max_staleness
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        # shop_id -> (shop_domain, last seen), shops whose catalog the syncer keeps up to date
+        self._active_shops: dict[int, tuple[str, float]] = {}
+
+    def mark_active(self, shop_id: int, shop_domain: str) -> None:
+        """Record that a shop is receiving requests, so that its catalog gets synced."""
+        self._active_shops[shop_id] = (shop_domain, time.time())
+
+    def active_shops(self, max_idle: float) -> list[tuple[int, str]]:
+        """Get (shop_id, shop_domain) of shops seen within the last max_idle seconds."""
+        now = time.time()
+        return [
+            (shop_id, shop_domain)
+            for shop_id, (shop_domain, last_seen) in list(self._active_shops.items())
+            if now - last_seen <= max_idle
+        ]
+
+    def is_fresh(self, shop_id: int) -> bool:
+        """
+        Check if the shop's snapshot is complete and recent enough to serve reads.
+
+        Incremental syncs only add new listings, so the prices, stock and variants of known products
+        are as old as the last full sync. Staleness is measured from the last full sync.
+        """
+        row = self._fetchone("SELECT last_full_sync_at FROM shops WHERE shop_id = ?", (shop_id,))
+        if row is None or row[0] is None:
+            return False
+        return time.time() - row[0] <= self.max_staleness
+
+    def sync_state(self, shop_id: int) -> tuple[float | None, float | None]:
+        """Get the (last sync, last full sync) timestamps of a shop."""
+        row = self._fetchone("SELECT last_sync_at, last_full_sync_at FROM shops WHERE shop_id = ?", (shop_id,))
+        return (row[0], row[1]) if row else (None, None)
+
+    def get_product(self, shop_id: int, product_id: int) -> dict[str, Any] | None:
+        """Get a product's Storefront JSON payload, or None if it is not in the snapshot."""
+        row = self._fetchone(
+            "SELECT payload FROM products WHERE shop_id = ? AND product_id = ?",
+            (shop_id, product_id),
+        )
+        return json.loads(row[0]) if row else None
+
+    def get_products(self, shop_id: int, product_ids: list[int]) -> dict[int, dict[str, Any]]:
+        """Get the Storefront JSON payloads by product ID of those of the products that are in the snapshot."""
+        if not product_ids:
+            return {}
+        placeholders = ",".join("?" * len(product_ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT product_id, payload FROM products WHERE shop_id = ? AND product_id IN ({placeholders})",
+                [shop_id, *product_ids],
+            ).fetchall()
+        return {product_id: json.loads(payload) for product_id, payload in rows}
+
+    def list_products(
+        self,
+        shop_id: int,
+        page: int = 1,
+        per_page: int = 10,
+        store_type: str | None = None,
+        genre: str | None = None,
+        min_price: float | None = None,
+        max_price: float | None = None,
+        sort_by: str | None = None,
+    ) -> list[dict[str, Any]]:
+        """
+        List product payloads like the Storefront list endpoint.
+
+        Raises:
+            ValueError: If sort_by is not supported by the snapshot (see supports_sort)
+        """
+        order_by = SORT_COLUMNS.get(sort_by or "sell_from-desc")
+        if order_by is None:
+            raise ValueError(f"Sort {sort_by} is not supported by the catalog snapshot")
+
+        conditions = ["shop_id = ?"]
+        params: list[Any] = [shop_id]
+        if store_type:
+            conditions.append("store_type = ?")
+            params.append(store_type)
+        if genre:
+            conditions.append("genre = ?")
+            params.append(genre)
+        if min_price is not None:
+            conditions.append("price >= ?")
+            params.append(min_price)
+        if max_price is not None:
+            conditions.append("price <= ?")
+            params.append(max_price)
+        params.extend([per_page, (page - 1) * per_page])
+
+        sql = f"SELECT payload FROM products WHERE {' AND '.join(conditions)} ORDER BY {order_by} LIMIT ? OFFSET ?"
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    @staticmethod
+    def supports_sort(sort_by: str | None) -> bool:
+        """Check if a sort option can be served from the snapshot."""
+        return sort_by is None or sort_by in SORT_COLUMNS
+
+    def all_products(self, shop_id: int) -> list[tuple[int, dict[str, Any]]]:
+        """Get (sell_from_rank, Storefront product JSON) of all products of a shop."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT sell_from_rank, payload FROM products WHERE shop_id = ? ORDER BY sell_from_rank",
+                (shop_id,),
+            ).fetchall()
+        return [(row[0], json.loads(row[1])) for row in rows]
+
+    def known_product_ids(self, shop_id: int, product_ids: list[int]) -> set[int]:
+        """Get which of the given products are already in the snapshot."""
+        if not product_ids:
+            return set()
+        placeholders = ",".join("?" * len(product_ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT product_id FROM products WHERE shop_id = ? AND product_id IN ({placeholders})",
+                [shop_id, *product_ids],
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def min_sell_from_rank(self, shop_id: int) -> int:
+        """Get the rank of the most recently listed product, 0 if the snapshot is empty."""
+        row = self._fetchone("SELECT MIN(sell_from_rank) FROM products WHERE shop_id = ?", (shop_id,))
+        return row[0] if row and row[0] is not None else 0
+
+    def upsert_products(self, shop_id: int, items: list[tuple[int, dict[str, Any]]], synced_at: float) -> None:
+        """
+        Insert or update products.
+
+        Args:
+            shop_id: Shop ID
+            items: Tuples of (sell_from_rank, Storefront product JSON)
+            synced_at: Sync run timestamp
+        """
+        rows = [
+            (
+                shop_id,
+                item["id"],
+                item.get("price"),
+                item.get("store_type"),
+                item.get("genre"),
+                rank,
+                json.dumps(item, ensure_ascii=False),
+                synced_at,
+            )
+            for rank, item in items
+        ]
+        with self._lock:
+            self._conn.executemany(
+                """
+                INSERT INTO products (shop_id, product_id, price, store_type, genre, sell_from_rank, payload, synced_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (shop_id, product_id) DO UPDATE SET
+                    price = excluded.price,
+                    store_type = excluded.store_type,
+                    genre = excluded.genre,
+                    sell_from_rank = excluded.sell_from_rank,
+                    payload = excluded.payload,
+                    synced_at = excluded.synced_at
+                """,
+                rows,
+            )
+
+    def delete_products_synced_before(self, shop_id: int, synced_at: float) -> int:
+        """Delete products not seen by the sync run started at synced_at, returning the number deleted."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM products WHERE shop_id = ? AND synced_at < ?",
+                (shop_id, synced_at),
+            )
+        return cursor.rowcount
+
+    def update_products(self, shop_id: int, items: list[dict[str, Any]]) -> None:
+        """Replace the Storefront JSON of products already in the snapshot, keeping their listing rank."""
+        rows = [
+            (
+                item.get("price"),
+                item.get("store_type"),
+                item.get("genre"),
+                json.dumps(item, ensure_ascii=False),
+                shop_id,
+                item["id"],
+            )
+            for item in items
+        ]
+        with self._lock:
+            self._conn.executemany(
+                """
+                UPDATE products SET price = ?, store_type = ?, genre = ?, payload = ?
+                WHERE shop_id = ? AND product_id = ?
+                """,
+                rows,
+            )
+
+    def delete_products(self, shop_id: int, product_ids: list[int]) -> None:
+        """Delete products from the snapshot."""
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM products WHERE shop_id = ? AND product_id = ?",
+                [(shop_id, product_id) for product_id in product_ids],
+            )
+
+    def expire(self, shop_id: int) -> None:
+        """Stop serving reads of a shop until its next full sync, which the syncer then runs as soon as possible."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE shops SET last_sync_at = NULL, last_full_sync_at = NULL WHERE shop_id = ?",
+                (shop_id,),
+            )
+
+    def mark_synced(self, shop_id: int, shop_domain: str, synced_at: float, full: bool) -> None:
+        """Record a completed sync run."""
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO shops (shop_id, shop_domain, last_sync_at, last_full_sync_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (shop_id) DO UPDATE SET
+                    shop_domain = excluded.shop_domain,
+                    last_sync_at = excluded.last_sync_at,
+                    last_full_sync_at = COALESCE(excluded.last_full_sync_at, shops.last_full_sync_at)
+                """,
+                (shop_id, shop_domain, synced_at, synced_at if full else None),
+            )
+
+    def _fetchone(self, sql: str, params: tuple) -> tuple | None:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()
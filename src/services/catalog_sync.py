@@ -0,0 +1,241 @@
+"""Background sync of active shops' catalogs into the local catalog snapshot."""
+
+import asyncio
+import logging
+import time
+from typing import Any, Callable
+
+import httpx
+
+from models.product import Product
+from services.catalog_snapshot import CatalogSnapshot
+from services.keyword_index import KeywordIndex, ShopKeywordIndex
+from services.storefront_client import StorefrontClient
+
+logger = logging.getLogger(__name__)
+
+# Concurrent detail requests when refreshing changed products
+REFRESH_CONCURRENCY = 10
+
+
+class CatalogRefreshError(Exception):
+    """Raised when changed products could not be read, so that their refresh is retried."""
+
+
+class CatalogSyncer:
+    """
+    Keeps the catalog snapshot of active shops up to date.
+
+    Incremental syncs poll the newest listings (sort_by=sell_from-desc) until they
+    reach a product that is already known. Full reconciliations page through the whole catalog,
+    refreshing every product and removing the ones no longer listed.
+    After each sync the shop's keyword index is rebuilt from the snapshot. Refreshed
+    products are updated in the index in place.
+    """
+
+    def __init__(
+        self,
+        snapshot: CatalogSnapshot,
+        storefront_client: StorefrontClient,
+        interval: float,
+        full_sync_interval: float,
+        page_size: int = 50,
+        max_idle: float = 86400,
+        keyword_index: KeywordIndex | None = None,
+        parse_product: Callable[[dict[str, Any]], Product] | None = None,
+    ):
+        """
+        Initialize catalog syncer.
+
+        Args:
+            snapshot: Catalog snapshot to fill
+            storefront_client: Client used to list products
+            interval: Seconds between incremental syncs of a shop
+            full_sync_interval: Seconds between full reconciliations of a shop
+            page_size: Products requested per list page
+            max_idle: Shops without requests for this many seconds are no longer synced
+            keyword_index: Optional keyword index to rebuild after each sync
+            parse_product: Converts Storefront product JSON into a Product, required with keyword_index
+        """
+        self.snapshot = snapshot
+        self.storefront_client = storefront_client
+        self.interval = interval
+        self.full_sync_interval = full_sync_interval
+        self.page_size = page_size
+        self.max_idle = max_idle
+        self.keyword_index = keyword_index
+        self.parse_product = parse_product
+        # Serializes keyword index maintenance, so that an update is never overwritten by a
+        # rebuild from a snapshot read before the update
+        self._keyword_index_lock = asyncio.Lock()
+
+    async def run(self) -> None:
+        """Sync active shops forever, until cancelled."""
+        logger.info("Catalog sync started")
+        while True:
+            for shop_id, shop_domain in self.snapshot.active_shops(self.max_idle):
+                try:
+                    await self.sync_shop(shop_id, shop_domain)
+                except Exception as e:
+                    logger.warning("Catalog sync failed for shop_id=%s: %s", shop_id, e)
+            await asyncio.sleep(min(self.interval, 60))
+
+    async def sync_shop(self, shop_id: int, shop_domain: str) -> None:
+        """Run a full or incremental sync of a shop if one is due."""
+        last_sync_at, last_full_sync_at = await asyncio.to_thread(self.snapshot.sync_state, shop_id)
+        now = time.time()
+        if last_full_sync_at is None or now - last_full_sync_at >= self.full_sync_interval:
+            await self.full_sync(shop_id, shop_domain)
+        elif last_sync_at is None or now - last_sync_at >= self.interval:
+            await self.incremental_sync(shop_id, shop_domain)
+        elif self.keyword_index is not None and self.keyword_index.needs_build(shop_id):
+            # Snapshot persisted by a previous process, the index only lives in memory
+            await self.rebuild_keyword_index(shop_id)
+
+    async def rebuild_keyword_index(self, shop_id: int) -> None:
+        """Rebuild a shop's keyword index from the snapshot in a worker thread."""
+        if self.keyword_index is None or self.parse_product is None:
+            return
+        keyword_index = self.keyword_index
+        parse_product = self.parse_product
+
+        def build() -> ShopKeywordIndex:
+            products = [(rank, parse_product(item)) for rank, item in self.snapshot.all_products(shop_id)]
+            return keyword_index.build(shop_id, products)
+
+        async with self._keyword_index_lock:
+            keyword_index.set(shop_id, await asyncio.to_thread(build))
+
+    async def update_keyword_index(self, shop_id: int, items: list[dict[str, Any]], removed_ids: list[int]) -> None:
+        """
+        Update changed and removed products in a shop's keyword index.
+
+        The index is rebuilt instead if too many of its documents are stale, or if it was never built.
+        Evicted indexes are left to the next full sync.
+        """
+        if self.keyword_index is None or self.parse_product is None:
+            return
+        keyword_index = self.keyword_index
+        parse_product = self.parse_product
+
+        def update(index: ShopKeywordIndex) -> ShopKeywordIndex:
+            return index.updated([parse_product(item) for item in items], removed_ids)
+
+        async with self._keyword_index_lock:
+            index = keyword_index.peek(shop_id)
+            if index is not None and not index.needs_rebuild:
+                keyword_index.set(shop_id, await asyncio.to_thread(update, index))
+                return
+        if index is not None or keyword_index.needs_build(shop_id):
+            await self.rebuild_keyword_index(shop_id)
+
+    async def full_sync(self, shop_id: int, shop_domain: str) -> None:
+        """Refresh the whole catalog of a shop and remove products that are no longer listed."""
+        started_at = time.time()
+        count = 0
+        page = 1
+        while True:
+            items = await self._list_page(shop_domain, page)
+            ranked = [(count + index, item) for index, item in enumerate(items)]
+            await asyncio.to_thread(self.snapshot.upsert_products, shop_id, ranked, started_at)
+            count += len(items)
+            if len(items) < self.page_size:
+                break
+            page += 1
+
+        deleted = await asyncio.to_thread(self.snapshot.delete_products_synced_before, shop_id, started_at)
+        await asyncio.to_thread(self.snapshot.mark_synced, shop_id, shop_domain, started_at, True)
+        await self.rebuild_keyword_index(shop_id)
+        logger.info(
+            "Catalog full sync for shop_id=%s: %s products, %s removed, %.1fs",
+            shop_id,
+            count,
+            deleted,
+            time.time() - started_at,
+        )
+
+    async def incremental_sync(self, shop_id: int, shop_domain: str) -> None:
+        """Add products listed since the last sync."""
+        started_at = time.time()
+        new_items: list[dict[str, Any]] = []
+        page = 1
+        while True:
+            items = await self._list_page(shop_domain, page)
+            known = await asyncio.to_thread(self.snapshot.known_product_ids, shop_id, [item["id"] for item in items])
+            new_items.extend(item for item in items if item["id"] not in known)
+            if known or len(items) < self.page_size:
+                break
+            page += 1
+
+        if new_items:
+            # Newer listings get ranks before the current newest product
+            first_rank = await asyncio.to_thread(self.snapshot.min_sell_from_rank, shop_id) - len(new_items)
+            ranked = [(first_rank + index, item) for index, item in enumerate(new_items)]
+            await asyncio.to_thread(self.snapshot.upsert_products, shop_id, ranked, started_at)
+        await asyncio.to_thread(self.snapshot.mark_synced, shop_id, shop_domain, started_at, False)
+        if self.keyword_index is not None and (
+            (new_items and self.keyword_index.peek(shop_id) is not None) or self.keyword_index.needs_build(shop_id)
+        ):
+            await self.rebuild_keyword_index(shop_id)
+        logger.info("Catalog incremental sync for shop_id=%s: %s new products", shop_id, len(new_items))
+
+    async def refresh_products(self, shop_id: int, shop_domain: str, product_ids: list[int]) -> None:
+        """
+        Re-read changed products of a shop, keeping their listing rank.
+
+        Products the Storefront API no longer has (404), e.g. because they were unpublished, are
+        removed. Products not in the snapshot are left to the next sync.
+
+        Raises:
+            CatalogRefreshError: If some products could not be read, e.g. because the Storefront API
+                failed or its circuit is open. The others are still refreshed, and the failed ones keep
+                their previous data until the refresh is retried.
+        """
+        known = await asyncio.to_thread(self.snapshot.known_product_ids, shop_id, product_ids)
+        if not known:
+            return
+        semaphore = asyncio.Semaphore(REFRESH_CONCURRENCY)
+
+        async def fetch(product_id: int) -> dict[str, Any]:
+            async with semaphore:
+                return await self.storefront_client.get_json(
+                    shop_domain, f"/api/storefront/v1/products/{product_id}", endpoint="product_detail_sync"
+                )
+
+        ids = sorted(known)
+        results = await asyncio.gather(*[fetch(product_id) for product_id in ids], return_exceptions=True)
+        items = []
+        removed = []
+        failed: dict[int, BaseException] = {}
+        for product_id, result in zip(ids, results):
+            if isinstance(result, BaseException) and not isinstance(result, Exception):
+                raise result
+            if isinstance(result, dict):
+                items.append({**result, "id": product_id})
+            elif isinstance(result, httpx.HTTPStatusError) and result.response.status_code == 404:
+                removed.append(product_id)
+            else:
+                failed[product_id] = result
+        await asyncio.to_thread(self.snapshot.update_products, shop_id, items)
+        await asyncio.to_thread(self.snapshot.delete_products, shop_id, removed)
+        await self.update_keyword_index(shop_id, items, removed)
+        logger.info(
+            "Catalog refresh for shop_id=%s: %s products, %s removed, %s failed",
+            shop_id,
+            len(items),
+            len(removed),
+            len(failed),
+        )
+        if failed:
+            product_id, error = next(iter(failed.items()))
+            raise CatalogRefreshError(
+                f"{len(failed)} of {len(ids)} changed products could not be read, e.g. product_id={product_id}: {error}"
+            )
+
+    async def _list_page(self, shop_domain: str, page: int) -> list[dict[str, Any]]:
+        return await self.storefront_client.get_json(
+            shop_domain,
+            "/api/storefront/v1/products",
+            endpoint="product_list_sync",
+            params={"page": page, "per_page": self.page_size, "sort_by": "sell_from-desc"},
+        )
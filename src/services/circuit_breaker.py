@@ -0,0 +1,177 @@
+"""Circuit breakers that fail fast when an upstream is unhealthy."""
+
+import asyncio
+import logging
+import time
+from enum import StrEnum
+from typing import Awaitable, Callable, TypeVar
+
+import metrics
+from config import config
+from context import DeadlineExceededError, deadline_passed
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the circuit is open."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Circuit '{name}' is open, retry after {retry_after:.1f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitState(StrEnum):
+    """Circuit breaker state."""
+    CLOSED = "closed"  # Calls pass through
+    OPEN = "open"  # Calls are rejected immediately
+    HALF_OPEN = "half_open"  # A limited number of probe calls pass through
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker for a single upstream.
+
+    Opens after `failure_threshold` consecutive failures, rejects calls for
+    `recovery_timeout` seconds, then lets `half_open_max_calls` probes through.
+    A successful probe closes the circuit, a failed one opens it again. Calls that fail
+    because the request deadline passed are not counted as failures.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        half_open_max_calls: int = 1,
+        is_failure: Callable[[Exception], bool] | None = None,
+    ):
+        """
+        Initialize circuit breaker.
+
+        Args:
+            name: Name used in errors, logs and metrics
+            failure_threshold: Consecutive failures that open the circuit
+            recovery_timeout: Seconds the circuit stays open before probing
+            half_open_max_calls: Concurrent probe calls allowed when half-open
+            is_failure: Predicate deciding whether an exception counts as an upstream failure
+                (e.g. a 404 response should not open the circuit). Defaults to all exceptions.
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.is_failure = is_failure or (lambda e: True)
+        self._state = CircuitState.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+
+    @property
+    def state(self) -> CircuitState:
+        """Current state, moving from open to half-open once the recovery timeout has passed."""
+        if self._state == CircuitState.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = CircuitState.HALF_OPEN
+            self._half_open_calls = 0
+        return self._state
+
+    async def call(self, func: Callable[[], Awaitable[T]]) -> T:
+        """
+        Execute a call through the circuit breaker.
+
+        Args:
+            func: Factory creating the awaitable to execute
+
+        Returns:
+            Result of the call
+
+        Raises:
+            CircuitOpenError: If the circuit is open
+            Exception: Any error raised by the call
+        """
+        self._before_call()
+        try:
+            result = await func()
+        except (asyncio.CancelledError, DeadlineExceededError):
+            # The caller gave up, which says nothing about the upstream's health
+            self._release_probe()
+            raise
+        except Exception as e:
+            if deadline_passed():
+                # Calls are bounded by the request deadline (see context.remaining_time), so a call
+                # failing once it has passed ran out of the caller's time budget, e.g. a short
+                # X-Request-Timeout, rather than finding the upstream unhealthy
+                self._release_probe()
+                raise
+            if self.is_failure(e):
+                self._on_failure()
+            else:
+                self._on_success()
+            raise
+        self._on_success()
+        return result
+
+    def _before_call(self) -> None:
+        state = self.state
+        if state == CircuitState.OPEN:
+            metrics.increment(f"circuit.{self.name}.rejected")
+            raise CircuitOpenError(self.name, self.recovery_timeout - (time.monotonic() - self._opened_at))
+        if state == CircuitState.HALF_OPEN:
+            if self._half_open_calls >= self.half_open_max_calls:
+                metrics.increment(f"circuit.{self.name}.rejected")
+                raise CircuitOpenError(self.name, 0.0)
+            self._half_open_calls += 1
+
+    def _release_probe(self) -> None:
+        if self._state == CircuitState.HALF_OPEN:
+            self._half_open_calls = max(0, self._half_open_calls - 1)
+
+    def _on_success(self) -> None:
+        if self._state == CircuitState.HALF_OPEN:
+            logger.info("Circuit '%s' closed after successful probe", self.name)
+            metrics.increment(f"circuit.{self.name}.closed")
+        self._state = CircuitState.CLOSED
+        self._failures = 0
+
+    def _on_failure(self) -> None:
+        self._failures += 1
+        if self._state == CircuitState.HALF_OPEN or self._failures >= self.failure_threshold:
+            if self._state != CircuitState.OPEN:
+                logger.warning("Circuit '%s' opened after %s failure(s)", self.name, self._failures)
+                metrics.increment(f"circuit.{self.name}.opened")
+            self._state = CircuitState.OPEN
+            self._opened_at = time.monotonic()
+
+
+_breakers: dict[tuple[str, str], CircuitBreaker] = {}
+
+
+def get_circuit_breaker(
+    upstream: str,
+    key: str | int,
+    is_failure: Callable[[Exception], bool] | None = None,
+) -> CircuitBreaker:
+    """
+    Get the circuit breaker for an upstream and shop, creating it on first use.
+
+    Args:
+        upstream: Upstream name (e.g. storefront, vertex_ai, bigquery)
+        key: Shop identifier (shop_id or shop_domain)
+        is_failure: Failure predicate, only used when the breaker is created
+
+    Returns:
+        CircuitBreaker shared by all requests for this upstream and shop
+    """
+    breaker_key = (upstream, str(key))
+    breaker = _breakers.get(breaker_key)
+    if breaker is None:
+        breaker = _breakers[breaker_key] = CircuitBreaker(
+            name=upstream,
+            failure_threshold=config.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+            recovery_timeout=config.CIRCUIT_BREAKER_RECOVERY_TIMEOUT,
+            is_failure=is_failure,
+        )
+    return breaker
@@ -1,29 +1,47 @@
 """Client for executing BigQuery operations for Cyberbiz."""
 
+import asyncio
 import logging
+import time
 from typing import Any, Optional
 
+from google.api_core.exceptions import BadRequest, ClientError, DeadlineExceeded
 from google.cloud import bigquery
 from google.cloud.exceptions import GoogleCloudError
 
+from context import remaining_time
+from services.bigquery_ledger import BigQueryLedger
+from services.circuit_breaker import get_circuit_breaker
+from utils import SAMPLED
+
 logger = logging.getLogger(__name__)
 
 
 class CyberbizBigQueryClient:
     """BigQuery client for Cyberbiz operations with automatic shop_id filtering."""
 
-    def __init__(self, client: bigquery.Client, shop_id: int):
+    def __init__(
+        self,
+        client: bigquery.Client,
+        shop_id: int,
+        ledger: Optional[BigQueryLedger] = None,
+        max_bytes_billed: Optional[dict[str, int]] = None,
+    ):
         """
         Initialize Cyberbiz BigQuery client.
 
         Args:
             client: Shared BigQuery client instance
             shop_id: Shop ID for filtering queries
+            ledger: Optional ledger recording the cost and latency of every job
+            max_bytes_billed: Optional byte limit per query kind, "default" applying to kinds not listed
         """
         self.client = client
         self.shop_id = shop_id
+        self.ledger = ledger
+        self.max_bytes_billed = max_bytes_billed or {}
 
-    async def query(self, sql: str, params: Optional[dict[str, Any]] = None) -> list[dict]:
+    async def query(self, sql: str, params: Optional[dict[str, Any]] = None, kind: str = "default") -> list[dict]:
         """
         Execute a SQL query and return results as list of dictionaries.
 
@@ -31,17 +49,26 @@ class CyberbizBigQueryClient:
         Handles both SELECT queries (returns rows) and DML statements
         (INSERT/UPDATE/DELETE - returns empty list).
 
+        The query runs in a worker thread and is bounded by the request deadline: the job gets
+        the remaining budget as its BigQuery job timeout, and is cancelled if the request gives up.
+        Jobs are billed at most the byte limit configured for their kind, and recorded in the
+        ledger under (shop_id, kind).
+
         Args:
             sql: SQL query or statement (use @param_name for parameters)
             params: Optional dictionary of query parameters for safe parameterization
                    Note: shop_id is automatically added from token
+            kind: Query template name (e.g. "vector_search"), used for byte limits and the ledger
 
         Returns:
             List of dictionaries, where each dict represents a row.
             For DML statements, returns empty list.
 
         Raises:
-            GoogleCloudError: If query execution fails
+            GoogleCloudError: If query execution fails, e.g. BadRequest if the byte limit is exceeded
+            TimeoutError: If the job does not finish before the request deadline
+            CircuitOpenError: If BigQuery has been failing for this shop
+            DeadlineExceededError: If the request deadline has already passed
 
         Example:
             # SELECT query
@@ -56,32 +83,76 @@ class CyberbizBigQueryClient:
                 {"value": "new"}
             )
         """
+        timeout = remaining_time()
+        # Client errors (e.g. invalid SQL) are not a sign of an unhealthy upstream
+        breaker = get_circuit_breaker("bigquery", self.shop_id, is_failure=lambda e: not isinstance(e, ClientError))
+        return await breaker.call(lambda: self._execute(sql, params, timeout, kind))
+
+    async def _execute(
+        self, sql: str, params: Optional[dict[str, Any]], timeout: Optional[float], kind: str
+    ) -> list[dict]:
+        """Execute a query without circuit breaking, within timeout seconds if given."""
+        started = time.monotonic()
         try:
-            logger.info(f"BigQuery executing: {sql[:200]}...")
+            logger.info("BigQuery executing: %.200s...", sql, extra=SAMPLED)
 
             params = params or {}
             params["shop_id"] = self.shop_id
 
             job_config = bigquery.QueryJobConfig()
             job_config.query_parameters = self._build_query_parameters(params)
-            query_job = self.client.query(sql, job_config=job_config)
-            results = query_job.result()
-            rows = [dict(row) for row in results]
+            if timeout is not None:
+                # Stops the job on the BigQuery side too once nobody waits for it
+                job_config.job_timeout_ms = int(timeout * 1000)
+            max_bytes_billed = self.max_bytes_billed.get(kind, self.max_bytes_billed.get("default"))
+            if max_bytes_billed:
+                # Fails the job instead of running a runaway scan, e.g. a brute force VECTOR_SEARCH
+                job_config.maximum_bytes_billed = max_bytes_billed
+            query_job = await asyncio.to_thread(self.client.query, sql, job_config=job_config, timeout=timeout)
+            try:
+                rows = await asyncio.to_thread(lambda: [dict(row) for row in query_job.result(timeout=timeout)])
+            except asyncio.CancelledError:
+                logger.warning("BigQuery cancelling job %s, request gave up", query_job.job_id)
+                # Cancelling is a blocking API call, sent from a worker thread without waiting for it
+                asyncio.get_running_loop().run_in_executor(None, self._cancel_job, query_job)
+                raise
 
             logger.info(
-                f"BigQuery completed - "
-                f"Rows: {len(rows)}, "
-                f"DML affected: {query_job.num_dml_affected_rows or 0}, "
-                f"Bytes processed: {query_job.total_bytes_processed}, "
-                f"Bytes billed: {query_job.total_bytes_billed}"
+                "BigQuery completed - Rows: %s, DML affected: %s, Bytes processed: %s, Bytes billed: %s",
+                len(rows),
+                query_job.num_dml_affected_rows or 0,
+                query_job.total_bytes_processed,
+                query_job.total_bytes_billed,
+                extra=SAMPLED,
             )
+            if self.ledger is not None:
+                self.ledger.record_job(self.shop_id, kind, query_job, (time.monotonic() - started) * 1000)
 
             return rows
 
-        except GoogleCloudError as e:
-            logger.error(f"BigQuery failed: {sql[:200]}... Error: {str(e)}")
+        except asyncio.CancelledError:
+            if self.ledger is not None:
+                self.ledger.record_cancellation(self.shop_id, kind)
+            raise
+        except (GoogleCloudError, TimeoutError) as e:
+            logger.error("BigQuery failed: %.200s... Error: %s", sql, e)
+            if self.ledger is not None:
+                self.ledger.record_error(
+                    self.shop_id,
+                    kind,
+                    bytes_limit_exceeded=_is_bytes_limit_exceeded(e),
+                    timed_out=isinstance(e, (TimeoutError, DeadlineExceeded)),
+                )
             raise
 
+    @staticmethod
+    def _cancel_job(query_job: bigquery.QueryJob) -> None:
+        """Cancel a running job, logging failures instead of raising them."""
+        try:
+            query_job.cancel()
+        except GoogleCloudError as e:
+            logger.warning("BigQuery failed to cancel job %s: %s", query_job.job_id, e)
+
     def _build_query_parameters(self, params: dict[str, Any]) -> list:
         """
         Convert parameter dictionary to BigQuery query parameters.
@@ -120,3 +191,10 @@ class CyberbizBigQueryClient:
             query_params.append(bigquery.ScalarQueryParameter(name, param_type, value))
 
         return query_params
+
+
+def _is_bytes_limit_exceeded(error: Exception) -> bool:
+    """Check if a job failed because it would have billed more than maximum_bytes_billed."""
+    return isinstance(error, BadRequest) and any(
+        detail.get("reason") == "bytesBilledLimitExceeded" for detail in error.errors or []
+    )
@@ -1,15 +1,27 @@
 """Client for generating text embeddings using Google GenAI."""
 
+import asyncio
 import logging
+import time
+from typing import cast
 
 from google import genai
 from google.api_core.exceptions import GoogleAPIError
-from google.genai.types import EmbedContentConfig
+from google.genai.errors import ClientError
+from google.genai.types import EmbedContentConfig, HttpOptions
 
+import metrics
+from cache import MemoryBudget, TTLCache
 from config import config
+from context import remaining_time
+from utils import SAMPLED
+from vectors import VECTOR_DTYPES, EmbeddingVector, VectorDType
 
 logger = logging.getLogger(__name__)
 
+# Seconds after the model rejected a batched request before batches are tried again
+BATCH_RETRY_INTERVAL = 3600
+
 
 class EmbeddingClient:
     """Client for generating text embeddings via Google GenAI."""
@@ -18,18 +30,37 @@ class EmbeddingClient:
     EMBEDDING_DIMENSION = 512
     TASK_TYPE = "RETRIEVAL_QUERY"
 
-    def __init__(self):
-        """Initialize the embedding client with Vertex AI credentials."""
+    def __init__(self, memory_budget: MemoryBudget | None = None):
+        """
+        Initialize the embedding client with Vertex AI credentials.
+
+        Args:
+            memory_budget: Optional memory budget shared by the query embedding cache
+        """
         self._client = genai.Client(
             vertexai=True,
             project=config.CYBERBIZ_GCP_PROJECT_ID,
             location=config.CYBERBIZ_GENAI_LOCATION
         )
+        # Monotonic time until which batches are not sent, after the model rejected one
+        self._batch_unsupported_until = 0.0
+        # Query text -> embedding, repeated queries skip the API call
+        self._cache: TTLCache[str, EmbeddingVector] = TTLCache(
+            maxsize=config.EMBEDDING_CACHE_MAX_ENTRIES,
+            ttl=config.EMBEDDING_CACHE_TTL,
+            budget=memory_budget,
+            name="embeddings",
+        )
+        if config.EMBEDDING_CACHE_DTYPE not in VECTOR_DTYPES:
+            raise ValueError(f"EMBEDDING_CACHE_DTYPE must be one of {', '.join(VECTOR_DTYPES)}")
+        self._cache_dtype = cast(VectorDType, config.EMBEDDING_CACHE_DTYPE)
 
     async def generate_embedding(self, text: str) -> list[float]:
         """
         Generate embedding vector for the given text.
 
+        Embeddings of recently seen texts are served from the in-memory cache.
+
         Args:
             text: Input text to generate embedding for
 
@@ -39,23 +70,28 @@ class EmbeddingClient:
         Raises:
             GoogleAPIError: If API call fails (network, auth, rate limit, etc.)
             ValueError: If embedding generation returns empty or invalid results
+            DeadlineExceededError: If the request deadline has already passed
         """
+        cached = self._get_cached(text)
+        if cached is not None:
+            return cached
+        return await self._generate_embedding(text)
+
+    async def _generate_embedding(self, text: str) -> list[float]:
+        """Generate the embedding of an uncached text and cache it."""
         try:
-            logger.info(f"GenAI generating embedding for text: '{text[:100]}...'")
+            logger.info("GenAI generating embedding for text: %.100r", text, extra=SAMPLED)
 
             response = await self._client.aio.models.embed_content(
                 model=self.EMBEDDING_MODEL,
                 contents=text,
-                config=EmbedContentConfig(
-                    output_dimensionality=self.EMBEDDING_DIMENSION,
-                    task_type=self.TASK_TYPE
-                ),
+                config=self._embed_config(),
             )
 
             # Validate response
             if not response.embeddings or len(response.embeddings) == 0:
                 error_msg = f"Embedding generation returned no results for text: '{text[:100]}...'"
-                logger.error(f"{error_msg}, full response: {response}")
+                logger.error("%s, full response: %s", error_msg, response)
                 raise ValueError(error_msg)
 
             embedding = response.embeddings[0]
@@ -66,16 +102,111 @@ class EmbeddingClient:
             # Validate embedding values
             if not embedding.values or len(embedding.values) == 0:
                 error_msg = f"Embedding contains no values for text: '{text[:100]}...'"
-                logger.error(f"{error_msg}, full response: {response}")
+                logger.error("%s, full response: %s", error_msg, response)
                 raise ValueError(error_msg)
 
-            logger.info(f"GenAI embedding generated successfully - dimension: {len(embedding.values)}")
+            logger.info("GenAI embedding generated successfully - dimension: %s", len(embedding.values), extra=SAMPLED)
+            self._cache.set(text, EmbeddingVector.from_values(embedding.values, self._cache_dtype))
             return embedding.values
 
         except GoogleAPIError as e:
-            logger.error(f"GenAI API error while generating embedding: {str(e)}")
+            logger.error("GenAI API error while generating embedding: %s", e)
+            raise
+
+    async def generate_embeddings(self, texts: list[str]) -> list[list[float]]:
+        """
+        Generate embedding vectors for several texts in one request.
+
+        Only texts missing from the cache are requested. Falls back to concurrent single-text
+        requests if the model does not accept batches.
+
+        Args:
+            texts: Input texts to generate embeddings for
+
+        Returns:
+            Embedding vectors, in the same order as the input texts
+
+        Raises:
+            GoogleAPIError: If API call fails (network, auth, rate limit, etc.)
+            ValueError: If embedding generation returns empty or invalid results
+            DeadlineExceededError: If the request deadline has already passed
+        """
+        embeddings: dict[str, list[float]] = {}
+        missing = []
+        for text in dict.fromkeys(texts):
+            cached = self._get_cached(text)
+            if cached is None:
+                missing.append(text)
+            else:
+                embeddings[text] = cached
+        if missing:
+            embeddings.update(zip(missing, await self._generate_embeddings(missing)))
+        return [embeddings[text] for text in texts]
+
+    async def _generate_embeddings(self, texts: list[str]) -> list[list[float]]:
+        """Generate embedding vectors of distinct, uncached texts."""
+        if len(texts) == 1 or time.monotonic() < self._batch_unsupported_until:
+            return list(await asyncio.gather(*[self._generate_embedding(text) for text in texts]))
+
+        try:
+            logger.info("GenAI generating embeddings for %s texts", len(texts), extra=SAMPLED)
+
+            response = await self._client.aio.models.embed_content(
+                model=self.EMBEDDING_MODEL,
+                contents=texts,
+                config=self._embed_config(),
+            )
+        except ClientError as e:
+            # Only a rejected request means batches are unsupported, rate limits and other client
+            # errors would fail the single requests as well
+            if e.code != 400 or e.status != "INVALID_ARGUMENT":
+                logger.error("GenAI API error while generating embeddings: %s", e)
+                raise
+            logger.warning("GenAI rejected batched embedding request, using single requests: %s", e)
+            metrics.increment("embedding.batch_rejected")
+            self._batch_unsupported_until = time.monotonic() + BATCH_RETRY_INTERVAL
+            return await self._generate_embeddings(texts)
+        except GoogleAPIError as e:
+            logger.error("GenAI API error while generating embeddings: %s", e)
             raise
 
+        # Validate response
+        if not response.embeddings or len(response.embeddings) != len(texts):
+            error_msg = f"Embedding generation returned {len(response.embeddings or [])} results for {len(texts)} texts"
+            logger.error("%s, full response: %s", error_msg, response)
+            raise ValueError(error_msg)
+
+        embeddings = []
+        for text, embedding in zip(texts, response.embeddings):
+            self._log_token_usage(embedding)
+            if not embedding.values:
+                error_msg = "Embedding contains no values in batched response"
+                logger.error("%s, full response: %s", error_msg, response)
+                raise ValueError(error_msg)
+            self._cache.set(text, EmbeddingVector.from_values(embedding.values, self._cache_dtype))
+            embeddings.append(embedding.values)
+
+        logger.info("GenAI embeddings generated successfully - count: %s", len(embeddings), extra=SAMPLED)
+        return embeddings
+
+    def _embed_config(self) -> EmbedContentConfig:
+        """Request config, with the remaining request deadline as HTTP timeout."""
+        timeout = remaining_time()
+        return EmbedContentConfig(
+            output_dimensionality=self.EMBEDDING_DIMENSION,
+            task_type=self.TASK_TYPE,
+            http_options=HttpOptions(timeout=int(timeout * 1000)) if timeout is not None else None,
+        )
+
+    def _get_cached(self, text: str) -> list[float] | None:
+        """Get a cached embedding, recording a cache hit or miss."""
+        vector = self._cache.get(text)
+        if vector is None:
+            metrics.increment("embedding_cache.misses")
+            return None
+        metrics.increment("embedding_cache.hits")
+        return vector.to_list()
+
     def _log_token_usage(self, embedding) -> None:
         """Log token usage statistics for the embedding."""
         token_count = 0
@@ -83,7 +214,5 @@ class EmbeddingClient:
             token_count = getattr(embedding.statistics, "token_count", 0)
 
         logger.info(
-            f"GenAI Embedding Token Usage - "
-            f"Model: {self.EMBEDDING_MODEL}, "
-            f"Tokens: {token_count}"
+            "GenAI Embedding Token Usage - Model: %s, Tokens: %s", self.EMBEDDING_MODEL, token_count, extra=SAMPLED
         )
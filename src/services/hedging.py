@@ -0,0 +1,175 @@
+"""Request hedging for idempotent upstream calls."""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, TypeVar
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class LatencyTracker:
+    """Sliding window of observed latencies per endpoint."""
+
+    def __init__(self, window_size: int = 512, min_samples: int = 20):
+        """
+        Initialize latency tracker.
+
+        Args:
+            window_size: Number of most recent samples kept per endpoint
+            min_samples: Samples required before a percentile is reported
+        """
+        self.window_size = window_size
+        self.min_samples = min_samples
+        self._samples: dict[str, deque[float]] = {}
+
+    def record(self, endpoint: str, latency: float) -> None:
+        """Record a latency sample (seconds) for an endpoint."""
+        samples = self._samples.get(endpoint)
+        if samples is None:
+            samples = self._samples[endpoint] = deque(maxlen=self.window_size)
+        samples.append(latency)
+
+    def percentile(self, endpoint: str, percentile: float) -> float | None:
+        """
+        Get the latency at the given percentile for an endpoint.
+
+        Returns:
+            Latency in seconds, or None if not enough samples were recorded yet
+        """
+        samples = self._samples.get(endpoint)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(len(ordered) * percentile / 100))
+        return ordered[index]
+
+
+class HedgeBudget:
+    """Token bucket that caps hedged requests to a fraction of all requests."""
+
+    def __init__(self, ratio: float, burst: float = 10.0):
+        """
+        Initialize hedge budget.
+
+        Args:
+            ratio: Tokens earned per request (e.g. 0.05 allows ~5% extra load)
+            burst: Maximum number of tokens that can accumulate
+        """
+        self.ratio = ratio
+        self.burst = burst
+        self._tokens = burst
+
+    def deposit(self) -> None:
+        """Earn tokens for a primary request."""
+        self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def try_acquire(self) -> bool:
+        """Spend one token for a hedge, returning False if the budget is exhausted."""
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+
+class RequestHedger:
+    """
+    Sends a duplicate request when the primary is slower than a latency percentile.
+
+    Only use for idempotent requests: both attempts may reach the upstream,
+    the first one to succeed wins and the other is cancelled.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 95.0,
+        budget_ratio: float = 0.05,
+        tracker: LatencyTracker | None = None,
+        enabled: bool = True,
+        metric_prefix: str = "hedging",
+    ):
+        """
+        Initialize request hedger.
+
+        Args:
+            percentile: Latency percentile after which a hedge is sent
+            budget_ratio: Maximum fraction of extra requests caused by hedging
+            tracker: Latency tracker, a new one is created if not given
+            enabled: If False, requests are sent once and only latencies are recorded
+            metric_prefix: Prefix of the counters, naming the upstream (e.g. "storefront")
+        """
+        self.percentile = percentile
+        self.tracker = tracker or LatencyTracker()
+        self.budget = HedgeBudget(budget_ratio)
+        self.enabled = enabled
+        self.metric_prefix = metric_prefix
+
+    async def run(self, endpoint: str, request: Callable[[], Awaitable[T]]) -> T:
+        """
+        Execute a request, hedging it if it is slower than usual.
+
+        Args:
+            endpoint: Endpoint name used for latency tracking and counters
+            request: Factory creating a new attempt of the request
+
+        Returns:
+            Result of the first successful attempt
+
+        Raises:
+            Exception: Error of the last failing attempt if all attempts fail
+        """
+        metrics.increment(f"{self.metric_prefix}.{endpoint}.requests")
+        self.budget.deposit()
+
+        delay = self.tracker.percentile(endpoint, self.percentile) if self.enabled else None
+        if delay is None:
+            return await self._attempt(endpoint, request)
+
+        primary = asyncio.create_task(self._attempt(endpoint, request))
+        pending = {primary}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if done:
+                return primary.result()
+
+            if not self.budget.try_acquire():
+                metrics.increment(f"{self.metric_prefix}.{endpoint}.hedges_skipped")
+                return await primary
+
+            metrics.increment(f"{self.metric_prefix}.{endpoint}.hedges_fired")
+            logger.debug("Hedging %s request after %.3fs", endpoint, delay)
+            hedge = asyncio.create_task(self._attempt(endpoint, request))
+            pending = {primary, hedge}
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            metrics.increment(f"{self.metric_prefix}.{endpoint}.hedges_won")
+                        return task.result()
+                if not pending:
+                    # Both attempts failed, surface the error of the last one
+                    return next(iter(done)).result()
+        finally:
+            # Cancel the losing attempt, or all attempts if the caller was cancelled
+            for task in pending:
+                task.cancel()
+
+    async def _attempt(self, endpoint: str, request: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run a single attempt and record its latency, whether it succeeds, fails or is cancelled.
+
+        Recording only the attempts that win a race would leave out the slow ones and bias the
+        percentile low, firing more hedges. A cancelled attempt records the time it ran, which is
+        a lower bound of its latency.
+        """
+        started = time.monotonic()
+        try:
+            return await request()
+        finally:
+            self.tracker.record(endpoint, time.monotonic() - started)
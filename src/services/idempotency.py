@@ -0,0 +1,147 @@
+"""Idempotent execution of mutating tool calls that clients may retry."""
+
+import asyncio
+import hashlib
+import json
+import logging
+from typing import Any, Awaitable, Callable
+
+import metrics
+from services.state_store import StateStore
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks for the result of a duplicate call running on another replica
+POLL_INTERVAL = 0.1
+
+
+class IdempotencyKeyReusedError(ValueError):
+    """Raised when an idempotency key is reused with different arguments."""
+
+
+def fingerprint(arguments: dict[str, Any]) -> str:
+    """Stable digest of tool arguments, independent of key order."""
+    canonical = json.dumps(arguments, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class IdempotencyStore:
+    """
+    Runs each idempotent call once per key within a time window.
+
+    Keys are scoped to the shop and the customer making the call. A client supplied key is kept
+    for the long window (ttl), so that retries after a timeout are safe. A key derived from the
+    arguments only absorbs duplicates sent within derived_ttl seconds of each other, so that a
+    customer deliberately repeating a call, e.g. ordering the same product again, is not refused.
+
+    A retry within the window returns the stored result of the first call. A duplicate arriving
+    while the first call is still running waits for it instead of running again, whether it runs
+    in this process or, through the shared state store, on another replica. Failed calls are not
+    stored, so they can be retried.
+    """
+
+    def __init__(self, state_store: StateStore, ttl: float, lock_ttl: float, derived_ttl: float):
+        """
+        Initialize idempotency store.
+
+        Args:
+            state_store: Store shared by all replicas, holding results and running-call markers
+            ttl: Seconds a result is returned to retries with the same client supplied key
+            lock_ttl: Seconds after which a call that neither finished nor failed, e.g. because its
+                replica died, no longer blocks its duplicates
+            derived_ttl: Seconds a result is returned to duplicates of a call made without a key
+        """
+        self.state_store = state_store
+        self.ttl = ttl
+        self.lock_ttl = lock_ttl
+        self.derived_ttl = derived_ttl
+        self._running: dict[str, tuple[str, asyncio.Task]] = {}
+
+    async def run(
+        self,
+        tool: str,
+        shop_id: int,
+        arguments: dict[str, Any],
+        call: Callable[[], Awaitable[Any]],
+        idempotency_key: str | None = None,
+        customer: str = "",
+    ) -> Any:
+        """
+        Run a call, or return the result of the identical call made before.
+
+        Args:
+            tool: Tool name
+            shop_id: Shop the call is made for
+            arguments: Tool arguments, excluding the idempotency key
+            call: Makes the call, returning a JSON serializable result
+            idempotency_key: Client supplied key, derived from the arguments when not given
+            customer: Identifies the customer making the call, "" for anonymous calls
+
+        Returns:
+            Result of the call
+
+        Raises:
+            IdempotencyKeyReusedError: If the key was used with different arguments
+        """
+        arguments_fingerprint = fingerprint(arguments)
+        # Client keys and derived keys are kept apart, so that a client key cannot collide with a fingerprint
+        scoped_key = f"key:{idempotency_key}" if idempotency_key else f"args:{arguments_fingerprint}"
+        key_digest = hashlib.sha256(f"{customer}\n{scoped_key}".encode()).hexdigest()
+        key = f"idempotency:{tool}:{shop_id}:{key_digest}"
+        ttl = self.ttl if idempotency_key else self.derived_ttl
+
+        waiting = False
+        while True:
+            stored = await self.state_store.get(key)
+            if stored is not None:
+                result = json.loads(stored)
+                self._check_fingerprint(tool, result["fingerprint"], arguments_fingerprint)
+                metrics.increment(f"idempotency.{tool}.replayed")
+                logger.info("Replaying stored result of %s for shop_id=%s", tool, shop_id)
+                return result["value"]
+
+            running = self._running.get(key)
+            if running is not None:
+                running_fingerprint, task = running
+                self._check_fingerprint(tool, running_fingerprint, arguments_fingerprint)
+                metrics.increment(f"idempotency.{tool}.joined")
+                logger.info("Waiting for the running %s call of shop_id=%s", tool, shop_id)
+                return await asyncio.shield(task)
+
+            if await self.state_store.add(f"{key}:running", arguments_fingerprint.encode(), self.lock_ttl):
+                break
+
+            # Running on another replica: wait until it stores its result, or fails and releases its marker
+            running_fingerprint = await self.state_store.get(f"{key}:running")
+            if running_fingerprint is not None:
+                self._check_fingerprint(tool, running_fingerprint.decode(), arguments_fingerprint)
+                if not waiting:
+                    waiting = True
+                    metrics.increment(f"idempotency.{tool}.joined")
+                    logger.info("Waiting for the %s call of shop_id=%s running on another replica", tool, shop_id)
+                await asyncio.sleep(POLL_INTERVAL)
+
+        metrics.increment(f"idempotency.{tool}.executed")
+        task = asyncio.create_task(self._execute(key, arguments_fingerprint, call, ttl))
+        self._running[key] = (arguments_fingerprint, task)
+        # Shielded: a mutation must not be abandoned halfway because its first caller gave up,
+        # its retry will find the result
+        return await asyncio.shield(task)
+
+    async def _execute(
+        self, key: str, arguments_fingerprint: str, call: Callable[[], Awaitable[Any]], ttl: float
+    ) -> Any:
+        try:
+            value = await call()
+            result = {"fingerprint": arguments_fingerprint, "value": value}
+            await self.state_store.set(key, json.dumps(result, default=str).encode(), ttl)
+            return value
+        finally:
+            del self._running[key]
+            await self.state_store.delete(f"{key}:running")
+
+    @staticmethod
+    def _check_fingerprint(tool: str, stored: str, requested: str) -> None:
+        if stored != requested:
+            metrics.increment(f"idempotency.{tool}.key_reused")
+            raise IdempotencyKeyReusedError("This idempotency key was already used with different arguments")
@@ -0,0 +1,343 @@
+"""In-memory BM25 keyword index of each shop's catalog."""
+
+import html
+import logging
+import math
+import re
+import sys
+import time
+import unicodedata
+from collections import Counter
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+
+from cache import MemoryBudget, TTLCache, estimate_size
+from models.compact_product import CompactProduct
+from models.product import Product
+
+logger = logging.getLogger(__name__)
+
+# Runs of CJK characters (Hiragana, Katakana, Bopomofo, Han, Hangul) or of Latin/Greek/Cyrillic letters and digits
+TOKEN_PATTERN = re.compile(
+    r"(?P<cjk>[\u3040-\u30ff\u3100-\u312f\u31a0-\u31bf\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]+)"
+    r"|(?P<word>[0-9a-z\u00c0-\u024f\u0370-\u03ff\u0400-\u04ff]+)"
+)
+HTML_TAG_PATTERN = re.compile(r"<[^>]+>")
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+# Title tokens count this many times, so that title matches rank above description matches
+TITLE_WEIGHT = 3
+
+# Sort options of the Storefront list endpoint that the index can reproduce.
+# None sorts by relevance.
+SUPPORTED_SORTS = {None, "price-asc", "price-desc", "sell_from-asc", "sell_from-desc"}
+
+# Updated products leave their old document behind until the index is rebuilt, and
+# are still counted in document frequencies. Past this fraction of stale documents,
+# updates are refused so that the caller rebuilds the index.
+MAX_STALE_FRACTION = 0.25
+
+# Estimated bytes of a posting, a (document index, term frequency) tuple in a list,
+# and of a token's empty posting list
+POSTING_BYTES = sys.getsizeof((0, 0)) + 8
+POSTING_LIST_BYTES = sys.getsizeof([])
+
+# Shops whose indexes are kept at most; the memory budget usually evicts indexes first
+MAX_SHOPS = 1000
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Split text into search tokens.
+
+    Text is NFKC-normalized (full-width to half-width) and lowercased. CJK runs, which
+    have no spaces between words, become overlapping character bigrams (a single CJK
+    character stays a unigram). Other runs of letters and digits become words.
+
+    Example:
+        tokenize("Nike 運動鞋") == ["nike", "運動", "動鞋"]
+    """
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(unicodedata.normalize("NFKC", text).lower()):
+        cjk = match.group("cjk")
+        if cjk is None:
+            tokens.append(match.group("word"))
+        elif len(cjk) == 1:
+            tokens.append(cjk)
+        else:
+            tokens.extend(cjk[i:i + 2] for i in range(len(cjk) - 1))
+    return tokens
+
+
+@dataclass(slots=True)
+class _Document:
+    product: CompactProduct
+    price: float | None
+    store_type: str | None
+    genre: str | None
+    sell_from_rank: int
+    length: int
+    # Estimated bytes of the document
+    size: int
+
+
+@dataclass
+class ShopKeywordIndex:
+    """Inverted index of one shop's products."""
+    # None for documents of removed or updated products
+    documents: list[_Document | None] = field(default_factory=list)
+    # token -> list of (document index, term frequency)
+    postings: dict[str, list[tuple[int, int]]] = field(default_factory=dict)
+    # product ID -> document index
+    positions: dict[int, int] = field(default_factory=dict)
+    total_length: int = 0
+    # Estimated bytes held by the index
+    nbytes: int = 0
+    built_at: float = 0.0
+
+    @classmethod
+    def build(cls, products: list[tuple[int, Product]]) -> "ShopKeywordIndex":
+        """
+        Build an index.
+
+        Args:
+            products: Tuples of (sell_from_rank, Product)
+        """
+        index = cls(built_at=time.time())
+        for rank, product in products:
+            index._add(rank, product)
+        return index
+
+    @property
+    def average_length(self) -> float:
+        """Average token count of the current documents."""
+        return max(1.0, self.total_length / len(self.positions)) if self.positions else 1.0
+
+    @property
+    def stale_fraction(self) -> float:
+        """Fraction of documents left behind by removed or updated products."""
+        return 1 - len(self.positions) / len(self.documents) if self.documents else 0.0
+
+    @property
+    def needs_rebuild(self) -> bool:
+        """Whether too many documents are stale for further updates, see MAX_STALE_FRACTION."""
+        return self.stale_fraction > MAX_STALE_FRACTION
+
+    def updated(self, products: list[Product], removed_ids: Iterable[int]) -> "ShopKeywordIndex":
+        """
+        Get a copy of the index with some products replaced and others removed.
+
+        Products keep their sell_from rank. Products not in the index are skipped; they are
+        added by the next rebuild. The index itself is not modified, so searches running in
+        other threads keep a consistent view: only the posting lists of the updated products'
+        tokens are copied.
+        """
+        index = ShopKeywordIndex(
+            documents=list(self.documents),
+            postings=dict(self.postings),
+            positions=dict(self.positions),
+            total_length=self.total_length,
+            nbytes=self.nbytes,
+            built_at=self.built_at,
+        )
+        ranks = {}
+        for product_id in [*removed_ids, *(product.id for product in products)]:
+            document_id = index.positions.pop(product_id, None)
+            if document_id is None:
+                continue
+            document = index.documents[document_id]
+            assert document is not None
+            ranks[product_id] = document.sell_from_rank
+            index.total_length -= document.length
+            # Its postings stay until the next rebuild
+            index.nbytes -= document.size
+            index.documents[document_id] = None
+
+        copied: set[str] = set()
+        for product in products:
+            if product.id in ranks:
+                index._add(ranks[product.id], product, copied)
+        return index
+
+    def _add(self, rank: int, product: Product, copied: set[str] | None = None) -> None:
+        """
+        Append a product's document.
+
+        Args:
+            copied: Tokens whose posting lists are owned by this index. When given, other posting
+                lists are copied before being appended to, as they are shared with another index.
+        """
+        term_frequencies = Counter(tokenize(product.title) * TITLE_WEIGHT)
+        term_frequencies.update(tokenize(_document_text(product)))
+        length = sum(term_frequencies.values())
+        self.total_length += length
+
+        document_id = len(self.documents)
+        compact = CompactProduct.from_product(product)
+        document = _Document(
+            product=compact,
+            price=compact.price,
+            store_type=compact.store_type,
+            genre=compact.genre,
+            sell_from_rank=rank,
+            length=length,
+            size=0,
+        )
+        document.size = estimate_size(document)
+        self.documents.append(document)
+        self.positions[product.id] = document_id
+        self.nbytes += document.size + len(term_frequencies) * POSTING_BYTES
+        for token, frequency in term_frequencies.items():
+            if token not in self.postings:
+                self.nbytes += sys.getsizeof(token) + POSTING_LIST_BYTES
+            if copied is not None and token not in copied:
+                self.postings[token] = list(self.postings.get(token, ()))
+                copied.add(token)
+            self.postings.setdefault(token, []).append((document_id, frequency))
+
+    def search(
+        self,
+        query: str,
+        page: int = 1,
+        per_page: int = 10,
+        store_type: str | None = None,
+        genre: str | None = None,
+        min_price: float | None = None,
+        max_price: float | None = None,
+        sort_by: str | None = None,
+    ) -> list[Product]:
+        """
+        Search products matching the query, ranked by BM25 unless sort_by is given.
+
+        Raises:
+            ValueError: If sort_by is not supported (see KeywordIndex.supports_sort)
+        """
+        if sort_by not in SUPPORTED_SORTS:
+            raise ValueError(f"Sort {sort_by} is not supported by the keyword index")
+
+        scores: dict[int, float] = {}
+        document_count = len(self.documents)
+        average_length = self.average_length
+        for token in set(tokenize(query)):
+            postings = self.postings.get(token)
+            if not postings:
+                continue
+            idf = math.log(1 + (document_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for document_id, frequency in postings:
+                document = self.documents[document_id]
+                if document is None:
+                    continue
+                length_norm = 1 - B + B * document.length / average_length
+                score = idf * frequency * (K1 + 1) / (frequency + K1 * length_norm)
+                scores[document_id] = scores.get(document_id, 0.0) + score
+
+        matches = []
+        for document_id, score in scores.items():
+            document = self.documents[document_id]
+            assert document is not None
+            if store_type and document.store_type != store_type:
+                continue
+            if genre and document.genre != genre:
+                continue
+            if min_price is not None and (document.price is None or document.price < min_price):
+                continue
+            if max_price is not None and (document.price is None or document.price > max_price):
+                continue
+            matches.append((score, document))
+
+        if sort_by == "price-asc":
+            matches.sort(key=lambda match: (match[1].price is None, match[1].price or 0, match[1].sell_from_rank))
+        elif sort_by == "price-desc":
+            matches.sort(key=lambda match: (match[1].price is None, -(match[1].price or 0), match[1].sell_from_rank))
+        elif sort_by == "sell_from-asc":
+            matches.sort(key=lambda match: -match[1].sell_from_rank)
+        elif sort_by == "sell_from-desc":
+            matches.sort(key=lambda match: match[1].sell_from_rank)
+        else:
+            matches.sort(key=lambda match: (-match[0], match[1].sell_from_rank))
+
+        offset = (page - 1) * per_page
+        return [document.product.to_product() for _, document in matches[offset:offset + per_page]]
+
+
+class KeywordIndex:
+    """
+    Keyword indexes of all shops, built by the catalog syncer and held under the memory budget.
+
+    Indexes are built and updated in worker threads as new ShopKeywordIndex objects, which are
+    then stored with set() on the event loop, as the memory budget is not thread-safe. When the
+    budget evicts a shop's index, its keyword searches use the Storefront API until the index
+    is rebuilt by the shop's next full sync.
+    """
+
+    def __init__(self, budget: MemoryBudget | None = None, max_shops: int = MAX_SHOPS):
+        """
+        Initialize keyword index.
+
+        Args:
+            budget: Optional memory budget shared with the caches, which may evict whole shop indexes
+            max_shops: Maximum number of shops with an index, least recently searched shops are evicted first
+        """
+        # Shops whose index the budget evicted, not rebuilt until their next full sync
+        self._evicted: set[int] = set()
+        self._indexes: TTLCache[int, ShopKeywordIndex] = TTLCache(
+            maxsize=max_shops,
+            ttl=math.inf,
+            budget=budget,
+            name="keyword_index",
+            sizeof=lambda index: index.nbytes,
+            on_evict=self._evicted.add,
+        )
+
+    @staticmethod
+    def build(shop_id: int, products: list[tuple[int, Product]]) -> ShopKeywordIndex:
+        """
+        Build a shop's index without storing it. Runs in a worker thread.
+
+        Args:
+            products: Tuples of (sell_from_rank, Product)
+        """
+        started = time.monotonic()
+        index = ShopKeywordIndex.build(products)
+        logger.info(
+            "Keyword index built for shop_id=%s: %s products, %s tokens, %s bytes, %.2fs",
+            shop_id,
+            len(index.documents),
+            len(index.postings),
+            index.nbytes,
+            time.monotonic() - started,
+        )
+        return index
+
+    def set(self, shop_id: int, index: ShopKeywordIndex) -> None:
+        """Store a shop's built or updated index, replacing the previous one. Runs on the event loop."""
+        self._evicted.discard(shop_id)
+        self._indexes.set(shop_id, index)
+
+    def get(self, shop_id: int) -> ShopKeywordIndex | None:
+        """Get a shop's index for a search, or None if it was not built yet or was evicted."""
+        return self._indexes.get(shop_id)
+
+    def peek(self, shop_id: int) -> ShopKeywordIndex | None:
+        """Get a shop's index to update it, without counting it as a search."""
+        return self._indexes.peek(shop_id)
+
+    def needs_build(self, shop_id: int) -> bool:
+        """Whether a shop's index should be built before its next full sync: it was never built, nor evicted."""
+        return shop_id not in self._indexes and shop_id not in self._evicted
+
+    @staticmethod
+    def supports_sort(sort_by: str | None) -> bool:
+        """Check if a sort option can be served from the index."""
+        return sort_by in SUPPORTED_SORTS
+
+
+def _document_text(product: Product) -> str:
+    """Text indexed for a product besides its title."""
+    parts = [product.brief, product.vendor, product.product_type]
+    for description in product.descriptions or []:
+        if description.body_html:
+            parts.append(html.unescape(HTML_TAG_PATTERN.sub(" ", description.body_html)))
+    return " ".join(part for part in parts if part)
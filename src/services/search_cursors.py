@@ -0,0 +1,144 @@
+"""Server-side storage of ranked search results behind opaque cursors."""
+
+import base64
+import binascii
+import hashlib
+import json
+import logging
+import secrets
+import time
+
+import metrics
+from services.catalog_changes import CLOCK_SKEW, CatalogChangeLog
+from services.state_store import StateStore
+
+logger = logging.getLogger(__name__)
+
+# Keep only what is needed to serve later pages (and degraded results) from a vector search row
+CURSOR_ROW_FIELDS = ("product_id", "content", "price", "similarity_score")
+MAX_CONTENT_LENGTH = 300
+
+
+class SearchCursorStore:
+    """
+    Stores ranked candidate lists so that following pages skip the search.
+
+    Searches are kept in the shared state store, so that any replica can serve the next page.
+    Products changed since a search was stored are dropped from its pages not served yet, as their
+    ranking and filters may no longer hold. Pages already served keep their rows, so that the offsets
+    of issued cursors stay valid.
+    """
+
+    def __init__(self, state_store: StateStore, ttl: float, change_log: CatalogChangeLog | None = None):
+        """
+        Initialize search cursor store.
+
+        Args:
+            state_store: Store holding the searches
+            ttl: Seconds a cursor stays valid
+            change_log: Optional log of product changes invalidating the searches holding changed products
+        """
+        self.state_store = state_store
+        self.ttl = ttl
+        self.change_log = change_log
+
+    async def save(self, shop_id: int, rows: list[dict], search_key: str) -> str:
+        """
+        Store ranked rows and return the ID of the stored search.
+
+        Args:
+            shop_id: Shop owning the search
+            rows: Ranked search rows
+            search_key: Digest of the query and filters of the search (see search_key)
+
+        Returns:
+            Search ID to pass to encode_cursor
+        """
+        search_id = secrets.token_urlsafe(12)
+        compact_rows = []
+        for row in rows:
+            compact = {field: row.get(field) for field in CURSOR_ROW_FIELDS}
+            if compact["content"]:
+                compact["content"] = compact["content"][:MAX_CONTENT_LENGTH]
+            compact_rows.append(compact)
+        entry = {"shop_id": shop_id, "search_key": search_key, "saved_at": time.time(), "rows": compact_rows}
+        await self.state_store.set(f"search:{search_id}", json.dumps(entry, default=float).encode(), self.ttl)
+        return search_id
+
+    async def load(self, shop_id: int, cursor: str, search_key: str) -> tuple[str, list[dict], int] | None:
+        """
+        Load the rows of a cursor.
+
+        Args:
+            shop_id: Shop of the current request
+            cursor: Cursor returned by a previous search
+            search_key: Digest of the query and filters of the current request
+
+        Returns:
+            Tuple of (search ID, ranked rows, offset of the next page), or None if the cursor
+            is invalid, expired, belongs to another shop or another query or filters, or the product
+            changes since it was stored are no longer known
+        """
+        decoded = self.decode_cursor(cursor)
+        if decoded is None:
+            return None
+        search_id, offset = decoded
+        stored = await self.state_store.get(f"search:{search_id}")
+        if stored is None:
+            return None
+        entry = json.loads(stored)
+        if entry["shop_id"] != shop_id:
+            return None
+        if entry.get("search_key") != search_key:
+            logger.info("Search cursor %s was passed with another query or filters", search_id)
+            return None
+        if self.change_log is not None:
+            checked_at = entry.get("checked_at", entry.get("saved_at", 0))
+            changed = await self.change_log.changed_since(shop_id, checked_at - CLOCK_SKEW)
+            if changed is None:
+                metrics.increment("search_cursors.invalidated")
+                logger.info("Product changes of shop_id=%s were dropped, dropping search %s", shop_id, search_id)
+                await self.state_store.delete(f"search:{search_id}")
+                return None
+            if changed:
+                await self._drop_changed_rows(search_id, entry, offset, changed)
+        return search_id, entry["rows"], offset
+
+    async def _drop_changed_rows(self, search_id: str, entry: dict, offset: int, changed: set[int]) -> None:
+        """Drop changed products from the rows after offset, storing the search back with the time of the check."""
+        rows = entry["rows"]
+        kept = rows[:offset] + [row for row in rows[offset:] if row["product_id"] not in changed]
+        if len(kept) < len(rows):
+            metrics.increment("search_cursors.rows_dropped", len(rows) - len(kept))
+            logger.info("Dropped %s changed products from search %s", len(rows) - len(kept), search_id)
+        entry["rows"] = kept
+        now = time.time()
+        entry["checked_at"] = now
+        # Keeps the expiry of the search
+        ttl = entry.get("saved_at", now) + self.ttl - now
+        if ttl > 0:
+            await self.state_store.set(f"search:{search_id}", json.dumps(entry, default=float).encode(), ttl)
+
+    @staticmethod
+    def search_key(**search: object) -> str:
+        """Digest of a search's query and filters, binding its cursors to them."""
+        canonical = json.dumps(search, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    @staticmethod
+    def encode_cursor(search_id: str, offset: int) -> str:
+        """Encode a search ID and page offset into an opaque cursor."""
+        return base64.urlsafe_b64encode(f"{search_id}:{offset}".encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> tuple[str, int] | None:
+        """Decode an opaque cursor into its search ID and page offset, or None if it is malformed."""
+        try:
+            search_id, offset = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit(":", 1)
+            if int(offset) < 0:
+                raise ValueError(f"Negative offset {offset}")
+            return search_id, int(offset)
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            logger.warning("Malformed search cursor: %.50s", cursor)
+            return None
+
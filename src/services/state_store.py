@@ -0,0 +1,119 @@
+"""Key-value store for state that must be visible to every server replica.
+
+Search cursors and idempotent tool results outlive the request that created them, and with
+stateless HTTP serving the next request may reach another replica. They are therefore kept in
+a StateStore: Redis when several replicas run, or an in-process stand-in for a single process
+and local development.
+"""
+
+from abc import ABC, abstractmethod
+
+from cache import MemoryBudget, TTLCache
+
+try:
+    import redis.asyncio as redis
+except ImportError:  # redis is optional, only needed for STATE_STORE_URL=redis://...
+    redis = None
+
+
+class StateStore(ABC):
+    """Byte values stored under string keys, each expiring after its own time-to-live."""
+
+    @abstractmethod
+    async def get(self, key: str) -> bytes | None:
+        """Get a value, or None if it is missing or expired."""
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        """Store a value for ttl seconds."""
+
+    @abstractmethod
+    async def add(self, key: str, value: bytes, ttl: float) -> bool:
+        """Store a value for ttl seconds only if the key is absent, returning whether it was stored."""
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        """Remove a value if present."""
+
+    async def close(self) -> None:
+        """Release connections."""
+
+
+class InMemoryStateStore(StateStore):
+    """Process-local StateStore, only shared by the requests served by this process."""
+
+    def __init__(self, maxsize: int, budget: MemoryBudget | None = None):
+        """
+        Initialize in-memory state store.
+
+        Args:
+            maxsize: Maximum number of entries, least recently used entries are evicted first
+            budget: Optional memory budget shared with the other in-process caches
+        """
+        self._entries: TTLCache[str, bytes] = TTLCache(maxsize=maxsize, ttl=0, budget=budget, name="state_store")
+
+    async def get(self, key: str) -> bytes | None:
+        return self._entries.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._entries.set(key, value, ttl=ttl)
+
+    async def add(self, key: str, value: bytes, ttl: float) -> bool:
+        if key in self._entries:
+            return False
+        self._entries.set(key, value, ttl=ttl)
+        return True
+
+    async def delete(self, key: str) -> None:
+        self._entries.pop(key)
+
+
+class RedisStateStore(StateStore):
+    """StateStore shared by all replicas through Redis."""
+
+    def __init__(self, url: str, prefix: str = "cyberbiz-mcp:"):
+        """
+        Initialize Redis state store.
+
+        Args:
+            url: Redis URL, e.g. redis://redis:6379/0
+            prefix: Prefix of all keys, separating this server's keys from other users of the database
+        """
+        if redis is None:
+            raise RuntimeError("STATE_STORE_URL is a Redis URL but the redis package is not installed")
+        self.prefix = prefix
+        self._client = redis.from_url(url)
+
+    async def get(self, key: str) -> bytes | None:
+        return await self._client.get(self.prefix + key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        await self._client.set(self.prefix + key, value, px=max(1, int(ttl * 1000)))
+
+    async def add(self, key: str, value: bytes, ttl: float) -> bool:
+        return bool(await self._client.set(self.prefix + key, value, px=max(1, int(ttl * 1000)), nx=True))
+
+    async def delete(self, key: str) -> None:
+        await self._client.delete(self.prefix + key)
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+def create_state_store(url: str, maxsize: int, budget: MemoryBudget | None = None) -> StateStore:
+    """
+    Create the StateStore configured by a URL.
+
+    Args:
+        url: redis:// or rediss:// URL of a Redis server, or "" / "memory://" for a process-local store
+        maxsize: Maximum number of entries of a process-local store
+        budget: Optional memory budget of a process-local store
+
+    Raises:
+        ValueError: If the URL scheme is not supported
+    """
+    if not url or url.startswith("memory://"):
+        return InMemoryStateStore(maxsize=maxsize, budget=budget)
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisStateStore(url)
+    raise ValueError(f"Unsupported STATE_STORE_URL: {url.split('://', 1)[0]}://")
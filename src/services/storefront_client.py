@@ -0,0 +1,177 @@
+"""Client for the Cyberbiz Storefront API."""
+
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable, TypeVar
+
+import httpx
+
+import metrics
+from cache import TTLCache
+from context import remaining_time
+from services.circuit_breaker import get_circuit_breaker
+from services.hedging import RequestHedger
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def _is_upstream_failure(error: Exception) -> bool:
+    """Client errors (4xx) mean the Storefront API is healthy, so they must not open the circuit."""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500
+    return True
+
+
+@dataclass
+class RevalidationEntry:
+    """A decoded response stored with the validators needed to revalidate it."""
+    etag: str | None
+    last_modified: str | None
+    value: Any
+
+
+class StorefrontClient:
+    """Storefront API client sharing a pooled HTTP connection across requests."""
+
+    def __init__(
+        self,
+        http_client: httpx.AsyncClient,
+        hedger: RequestHedger,
+        revalidation_cache: TTLCache[tuple, RevalidationEntry] | None = None,
+    ):
+        """
+        Initialize Storefront client.
+
+        Args:
+            http_client: Shared async HTTP client
+            hedger: Request hedger used for idempotent GET requests
+            revalidation_cache: Optional cache of decoded responses revalidated by get_revalidated
+        """
+        self.http_client = http_client
+        self.hedger = hedger
+        self.revalidation_cache = revalidation_cache
+
+    async def get_json(
+        self,
+        shop_domain: str,
+        path: str,
+        endpoint: str,
+        params: dict[str, Any] | None = None,
+        timeout: float | None = None,
+        headers: dict[str, str] | None = None,
+    ) -> Any:
+        """
+        Send a GET request to the shop's Storefront API and decode the JSON body.
+
+        GET requests are idempotent, so slow requests may be hedged. Requests go through
+        the shop's Storefront circuit breaker and fail fast while it is open.
+
+        Args:
+            shop_domain: Shop domain (e.g. yourshop.cyberbiz.co)
+            path: API path starting with /api/storefront
+            endpoint: Endpoint name used for latency tracking and metrics
+            params: Optional query parameters
+            timeout: Optional request timeout in seconds, shortened to the request deadline
+            headers: Optional request headers, e.g. the customer's Authorization
+
+        Returns:
+            Decoded JSON response
+
+        Raises:
+            httpx.HTTPError: If the request fails or returns an error status
+            CircuitOpenError: If the shop's Storefront circuit is open
+            DeadlineExceededError: If the request deadline has already passed
+        """
+        url = f"https://{shop_domain}{path}"
+        timeout = remaining_time(timeout)
+
+        async def request() -> Any:
+            response = await self.http_client.get(
+                url,
+                params=params,
+                headers=headers,
+                timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT,
+            )
+            response.raise_for_status()
+            return response.json()
+
+        breaker = get_circuit_breaker("storefront", shop_domain, is_failure=_is_upstream_failure)
+        return await breaker.call(lambda: self.hedger.run(endpoint, request))
+
+    async def get_revalidated(
+        self,
+        shop_domain: str,
+        path: str,
+        endpoint: str,
+        decode: Callable[[Any], T],
+        params: dict[str, Any] | None = None,
+        timeout: float | None = None,
+    ) -> T:
+        """
+        Send a GET request like get_json, reusing a cached decoded response if it is unchanged.
+
+        Responses carrying an ETag or Last-Modified header are decoded once and cached with
+        their validators. Later requests for the same URL are sent as conditional GETs
+        (If-None-Match / If-Modified-Since), and a 304 Not Modified returns the cached value
+        without transferring or decoding the body again.
+
+        Args:
+            shop_domain: Shop domain (e.g. yourshop.cyberbiz.co)
+            path: API path starting with /api/storefront
+            endpoint: Endpoint name used for latency tracking and metrics
+            decode: Converts the JSON response into the returned value, e.g. into Product models
+            params: Optional query parameters
+            timeout: Optional request timeout in seconds, shortened to the request deadline
+
+        Returns:
+            Decoded response
+
+        Raises:
+            httpx.HTTPError: If the request fails or returns an error status
+            CircuitOpenError: If the shop's Storefront circuit is open
+            DeadlineExceededError: If the request deadline has already passed
+        """
+        if self.revalidation_cache is None:
+            return decode(await self.get_json(shop_domain, path, endpoint, params=params, timeout=timeout))
+
+        url = f"https://{shop_domain}{path}"
+        timeout = remaining_time(timeout)
+        key = (url, tuple(sorted((params or {}).items())))
+        cached = self.revalidation_cache.get(key)
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+
+        async def request() -> httpx.Response:
+            response = await self.http_client.get(
+                url,
+                params=params,
+                headers=headers,
+                timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT,
+            )
+            if response.status_code != httpx.codes.NOT_MODIFIED:
+                response.raise_for_status()
+            return response
+
+        breaker = get_circuit_breaker("storefront", shop_domain, is_failure=_is_upstream_failure)
+        response = await breaker.call(lambda: self.hedger.run(endpoint, request))
+
+        if cached is not None and response.status_code == httpx.codes.NOT_MODIFIED:
+            metrics.increment(f"revalidation.{endpoint}.not_modified")
+            self.revalidation_cache.set(key, cached)
+            return cached.value
+        metrics.increment(f"revalidation.{endpoint}.{'modified' if cached is not None else 'uncached'}")
+
+        value = decode(response.json())
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if etag or last_modified:
+            self.revalidation_cache.set(key, RevalidationEntry(etag=etag, last_modified=last_modified, value=value))
+        else:
+            self.revalidation_cache.pop(key)
+        return value
@@ -0,0 +1,137 @@
+"""Options of BigQuery VECTOR_SEARCH: how much of the vector index to probe, or exact search."""
+
+import json
+from dataclasses import dataclass
+from typing import Any
+
+
+@dataclass(frozen=True)
+class VectorSearchOptions:
+    """
+    VECTOR_SEARCH options trading recall for latency and bytes scanned.
+
+    Attributes:
+        fraction_lists_to_search: Fraction of the IVF index lists probed, None for BigQuery's default.
+            Higher is slower and more expensive but finds more of the exact nearest neighbours.
+        use_brute_force: Skip the index and compute exact distances to every product, which is
+            cheap for tiny shops and the ground truth for recall measurements
+    """
+    fraction_lists_to_search: float | None = None
+    use_brute_force: bool = False
+
+    def __post_init__(self):
+        if self.fraction_lists_to_search is not None:
+            if isinstance(self.fraction_lists_to_search, bool) or not isinstance(
+                self.fraction_lists_to_search, (int, float)
+            ):
+                raise ValueError("fraction_lists_to_search must be a number")
+            if not 0 < self.fraction_lists_to_search <= 1:
+                raise ValueError("fraction_lists_to_search must be in (0, 1]")
+        if not isinstance(self.use_brute_force, bool):
+            raise ValueError("use_brute_force must be a boolean")
+        if self.use_brute_force and self.fraction_lists_to_search is not None:
+            raise ValueError("fraction_lists_to_search cannot be set together with use_brute_force")
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "VectorSearchOptions":
+        """
+        Build options from a dict such as {"fraction_lists_to_search": 0.05}.
+
+        Raises:
+            ValueError: If the dict has unknown keys or invalid values
+        """
+        if not isinstance(data, dict):
+            raise ValueError("Vector search options must be a JSON object")
+        unknown = set(data) - {"fraction_lists_to_search", "use_brute_force"}
+        if unknown:
+            raise ValueError(f"Unknown vector search options: {', '.join(sorted(unknown))}")
+        return cls(**data)
+
+    @classmethod
+    def from_json(cls, value: str) -> "VectorSearchOptions":
+        """
+        Build options from a JSON object, e.g. an X-Vector-Search-Options header.
+
+        Raises:
+            ValueError: If the value is not a JSON object of valid options
+        """
+        return cls.from_dict(json.loads(value))
+
+    def sql_argument(self) -> str:
+        """
+        The `options => '...'` argument of VECTOR_SEARCH, including its leading comma, or "" for the defaults.
+
+        Safe to format into SQL because the JSON is built from validated numbers and booleans only.
+        """
+        options: dict[str, Any] = {}
+        if self.fraction_lists_to_search is not None:
+            options["fraction_lists_to_search"] = float(self.fraction_lists_to_search)
+        if self.use_brute_force:
+            options["use_brute_force"] = True
+        if not options:
+            return ""
+        return f",\n                options => '{json.dumps(options)}'"
+
+    def label(self) -> str:
+        """Short description for logs and benchmark reports."""
+        if self.use_brute_force:
+            return "brute_force"
+        if self.fraction_lists_to_search is not None:
+            return f"fraction_lists_to_search={self.fraction_lists_to_search:g}"
+        return "default"
+
+
+class VectorSearchOptionsResolver:
+    """
+    Resolves the options of a search: the request's, else the shop's, else the default ones.
+
+    Options requested by a client are clamped, so that a client cannot make searches arbitrarily
+    expensive: fraction_lists_to_search is capped at max_requested_fraction, and brute force is
+    only used for shops configured with it.
+    """
+
+    def __init__(
+        self,
+        default: VectorSearchOptions,
+        per_shop: dict[int, VectorSearchOptions] | None = None,
+        max_requested_fraction: float = 1.0,
+    ):
+        """
+        Initialize resolver.
+
+        Args:
+            default: Options of shops without their own
+            per_shop: Options by shop_id, e.g. brute force for shops too small to benefit from the index
+            max_requested_fraction: Highest fraction_lists_to_search a client may request
+        """
+        self.default = default
+        self.per_shop = per_shop or {}
+        self.max_requested_fraction = max_requested_fraction
+
+    @classmethod
+    def from_config(cls, value: str, max_requested_fraction: float = 1.0) -> "VectorSearchOptionsResolver":
+        """
+        Build a resolver from a JSON object of options by shop_id, with "default" for the other shops.
+
+        Example: {"default": {"fraction_lists_to_search": 0.05}, "1234": {"use_brute_force": true}}
+
+        Raises:
+            ValueError: If the value is not valid JSON options
+        """
+        data = json.loads(value) if value.strip() else {}
+        if not isinstance(data, dict):
+            raise ValueError("VECTOR_SEARCH_OPTIONS must be a JSON object")
+        default = VectorSearchOptions.from_dict(data.pop("default", {}))
+        per_shop = {int(shop_id): VectorSearchOptions.from_dict(options) for shop_id, options in data.items()}
+        return cls(default, per_shop, max_requested_fraction)
+
+    def resolve(self, shop_id: int, requested: VectorSearchOptions | None = None) -> VectorSearchOptions:
+        configured = self.per_shop.get(shop_id, self.default)
+        if requested is None or requested == VectorSearchOptions():
+            return configured
+        if requested.use_brute_force and not configured.use_brute_force:
+            return configured
+        if requested.fraction_lists_to_search is not None:
+            fraction = min(requested.fraction_lists_to_search, self.max_requested_fraction)
+            return VectorSearchOptions(fraction_lists_to_search=fraction)
+        return requested
@@ -4,12 +4,14 @@ from .cancel_order import cancel_order
 from .check_order import check_order
 from .check_purchase_feasibility import check_purchase_feasibility
 from .discover_products import discover_products
+from .discover_products_multi import discover_products_multi
 from .handle_after_sales import handle_after_sales
 from .modify_order import modify_order
 from .place_order import place_order
 
 __all__ = [
     "discover_products",
+    "discover_products_multi",
     "check_purchase_feasibility",
     "place_order",
     "check_order",
@@ -1,23 +1,45 @@
 """Tool for canceling orders."""
 
+from context import get_shop_id
+from dependencies import get_customer_scope, get_idempotency_store
 from mcp_instance import mcp
+from services.idempotency import IdempotencyKeyReusedError
 
 
 @mcp.tool()
-def cancel_order(
+async def cancel_order(
     order_id: str,
-    reason: str
+    reason: str,
+    idempotency_key: str | None = None,
 ) -> dict:
     """
     Cancel an existing order.
 
+    Retrying after a timeout is safe: a retry with the same idempotency_key (or, without one,
+    the same arguments) within the idempotency window returns the first result.
+
     Args:
         order_id: The order ID to cancel
         reason: Reason for cancellation
+        idempotency_key: Optional unique key of this cancellation, reused when retrying it
 
     Returns:
         Dictionary containing cancellation confirmation
     """
+    try:
+        return await get_idempotency_store().run(
+            "cancel_order",
+            get_shop_id(),
+            {"order_id": order_id, "reason": reason},
+            lambda: _cancel_order(order_id, reason),
+            idempotency_key=idempotency_key,
+            customer=get_customer_scope(),
+        )
+    except IdempotencyKeyReusedError as e:
+        return {"status": "error", "message": str(e), "error_code": "IDEMPOTENCY_KEY_REUSED"}
+
+
+async def _cancel_order(order_id: str, reason: str) -> dict:
     # Mock order cancellation
     return {
         "status": "success",
@@ -1,84 +1,112 @@
 """Tool for checking order status."""
 
+from typing import Literal
+
+import httpx
 from fastmcp.server.dependencies import get_access_token
+from pydantic import BaseModel
 
 from config import config
+from context import get_shop_id
+from dependencies import get_order_repository
 from mcp_instance import mcp
+from models.order import Order, OrderLookupError
+
+# Orders looked up per call, larger lists must be split
+MAX_ORDER_IDS = 20
+
+
+class CheckOrderResponse(BaseModel):
+    status: Literal["success", "error"]
+    # Found orders, in the order of the requested order_ids
+    orders: list[Order] = []
+    # Requested orders that could not be looked up
+    errors: list[OrderLookupError] = []
+    message: str | None = None
+    error_code: str | None = None
+
+
+def _lookup_error(order_id: str, error: Exception) -> OrderLookupError:
+    """Describe why an order could not be looked up."""
+    if isinstance(error, httpx.HTTPStatusError):
+        if error.response.status_code == 404:
+            return OrderLookupError(order_id=order_id, error_code="ORDER_NOT_FOUND", message="Order not found")
+        if error.response.status_code in (401, 403):
+            return OrderLookupError(
+                order_id=order_id, error_code="ACCESS_DENIED", message="Not allowed to view this order"
+            )
+    return OrderLookupError(
+        order_id=order_id, error_code="UPSTREAM_UNAVAILABLE", message="Order status is temporarily unavailable"
+    )
+
+
+def _issued_for_storefront(claims: dict) -> bool:
+    """Whether the token's audience includes the Storefront API (STOREFRONT_TOKEN_AUDIENCE)."""
+    if not config.STOREFRONT_TOKEN_AUDIENCE:
+        return False
+    audience = claims.get("aud")
+    audiences = [audience] if isinstance(audience, str) else audience or []
+    return config.STOREFRONT_TOKEN_AUDIENCE in audiences
 
 
 @mcp.tool()
-def check_order(
-    order_id: str,
-) -> dict:
+async def check_order(
+    order_ids: list[str],
+) -> CheckOrderResponse:
     """
-    Check the status of an existing order.
+    Check the status of one or more existing orders in a single call.
+
+    Pass every order the customer asks about at once (e.g. "where are my orders?") instead
+    of calling this tool once per order. Order statuses may be up to a few seconds old.
 
     Args:
-        order_id: The order ID to check
+        order_ids: The order IDs to check, at most 20
 
     Returns:
-        Dictionary containing order status and details
+        The found orders with status, items, payment and shipping details, and an error for
+        each order that could not be looked up
     """
     token = get_access_token()
 
     if not token:
-        return {
-            "status": "error",
-            "message": "Authentication required",
-            "error_code": "AUTHENTICATION_REQUIRED"
-        }
+        return CheckOrderResponse(
+            status="error", message="Authentication required", error_code="AUTHENTICATION_REQUIRED"
+        )
 
     # 驗證用戶是否有 read_orders scope
     required_scope = config.REQUIRED_SCOPES_CHECK_ORDER
     if required_scope not in token.scopes:
-        return {
-            "status": "error",
-            "message": f"Insufficient permissions. Required scope: {required_scope}",
-            "error_code": "INSUFFICIENT_SCOPE"
-        }
-
-    # 從 token claims 取得用戶資訊
-    shop_id = token.claims.get("shop_id")
-    shop_domain = token.claims.get("shop_domain")
-
-    # TODO: 實際呼叫 cyberbiz.co API 查詢訂單
-    # 使用 shop_id 來確保用戶只能查詢自己的訂單
-
-    # Mock order status
-    return {
-        "status": "success",
-        "order_id": order_id,
-        "order_status": "shipped",
-        "order_date": "2025-11-01",
-        "items": [
-            {
-                "product_id": "PROD-001",
-                "product_name": "Premium Laptop - Model A",
-                "quantity": 1,
-                "unit_price": 299.99,
-                "subtotal": 299.99
-            }
-        ],
-        "total_price": 299.99,
-        "currency": "USD",
-        "shipping": {
-            "status": "in_transit",
-            "tracking_number": "TRK-123456",
-            "estimated_delivery": "2025-11-10",
-            "carrier": "Standard Shipping"
-        },
-        "payment": {
-            "method": "credit_card",
-            "status": "paid",
-            "last_four_digits": "1234"
-        },
-        "customer": {
-            "name": "John Doe",
-            "email": "john@example.com"
-        },
-        # 包含驗證後的商店資訊
-        "shop_info": {
-            "shop_id": shop_id,
-            "shop_domain": shop_domain
-        }
-    }
+        return CheckOrderResponse(
+            status="error",
+            message=f"Insufficient permissions. Required scope: {required_scope}",
+            error_code="INSUFFICIENT_SCOPE",
+        )
+
+    # The token is sent to the Storefront API, which is only allowed if it was issued for it too
+    if not _issued_for_storefront(token.claims or {}):
+        return CheckOrderResponse(
+            status="error",
+            message="Token was not issued for the Storefront API",
+            error_code="INVALID_TOKEN_AUDIENCE",
+        )
+
+    # 確保 token 所屬商店與請求的商店一致，用戶只能查詢自己商店的訂單
+    token_shop_id = (token.claims or {}).get("shop_id")
+    if token_shop_id is not None and str(token_shop_id) != str(get_shop_id()):
+        return CheckOrderResponse(
+            status="error", message="Token does not belong to this shop", error_code="INSUFFICIENT_SCOPE"
+        )
+
+    if not order_ids or len(order_ids) > MAX_ORDER_IDS:
+        return CheckOrderResponse(
+            status="error",
+            message=f"Pass between 1 and {MAX_ORDER_IDS} order IDs",
+            error_code="INVALID_ARGUMENT",
+        )
+
+    results = await get_order_repository().get_orders(order_ids, token.token)
+    orders = [result for result in results.values() if isinstance(result, Order)]
+    errors = [
+        _lookup_error(order_id, result) for order_id, result in results.items() if not isinstance(result, Order)
+    ]
+    return CheckOrderResponse(status="success" if orders or not errors else "error", orders=orders, errors=errors)
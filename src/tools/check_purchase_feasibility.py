@@ -1,39 +1,152 @@
 """Tool for checking if a purchase is feasible."""
 
+from typing import Annotated, Literal
+
+import httpx
+from pydantic import BaseModel, Field
+
+from config import config
+from dependencies import get_product_repository
 from mcp_instance import mcp
+from models.product import Product, ProductVariant
+from repositories.product_repository import ProductNotFoundError
+
+
+class PurchaseItem(BaseModel):
+    product_id: int
+    # Required for products with several variants
+    variant_id: int | None = None
+    quantity: int = Field(ge=1)
+
+
+class PurchaseItemFeasibility(BaseModel):
+    product_id: int
+    variant_id: int | None
+    requested_quantity: int
+    # None when the shop does not track stock for the variant
+    available_stock: int | None = None
+    inventory_availability: str | None = None
+    is_feasible: bool
+    error_code: str | None = None
+    message: str
+
+
+class PurchaseFeasibilityResponse(BaseModel):
+    status: Literal["success", "error"]
+    is_feasible: bool
+    items: list[PurchaseItemFeasibility]
 
 
 @mcp.tool()
-def check_purchase_feasibility(
-    product_id: str,
-    quantity: int
-) -> dict:
+async def check_purchase_feasibility(
+    items: Annotated[list[PurchaseItem], Field(min_length=1)],
+) -> PurchaseFeasibilityResponse:
     """
-    Check if a purchase is feasible for a given product and quantity.
+    Check if a purchase is feasible for every line item of a cart in one call.
+
+    Each item identifies a product by product_id, narrowed to a variant by variant_id.
+    Products with several variants require a variant_id. Quantities of the same variant
+    across items are checked against stock together.
 
     Args:
-        product_id: The product ID to check
-        quantity: Desired quantity to purchase
+        items: At least one line item, each with product_id, variant_id if the product has several
+            variants, and the desired quantity
 
     Returns:
-        Dictionary containing feasibility status and details
+        Feasibility of each item and of the whole cart
     """
-    # Mock feasibility check
-    available_stock = 50
-    is_available = quantity <= available_stock
-
-    return {
-        "status": "success",
-        "product_id": product_id,
-        "requested_quantity": quantity,
-        "available_stock": available_stock,
-        "is_feasible": is_available,
-        "can_purchase": is_available,
-        "restrictions": {
-            "min_order_quantity": 1,
-            "max_order_quantity": 100,
-            "requires_age_verification": False,
-            "ships_to_region": True
-        },
-        "message": "Purchase is feasible" if is_available else f"Only {available_stock} units available"
-    }
+    repository = get_product_repository()
+
+    # Stock must be current, never served from the catalog snapshot
+    details = await repository.get_product_details([item.product_id for item in items], use_snapshot=False)
+
+    # Resolve each item to a variant before checking stock so that quantities can be summed per variant
+    resolved: list[tuple[PurchaseItem, ProductVariant | None, PurchaseItemFeasibility | None]] = []
+    for item in items:
+        resolved.append((item, *_resolve_variant(item, details)))
+
+    requested_per_variant: dict[int, int] = {}
+    for item, variant, _ in resolved:
+        if variant is not None:
+            requested_per_variant[variant.id] = requested_per_variant.get(variant.id, 0) + item.quantity
+
+    results: list[PurchaseItemFeasibility] = []
+    for item, variant, error in resolved:
+        if error is not None:
+            results.append(error)
+        elif variant is not None:
+            results.append(_check_stock(item, variant, requested_per_variant[variant.id]))
+
+    return PurchaseFeasibilityResponse(
+        status="success",
+        is_feasible=all(result.is_feasible for result in results),
+        items=results,
+    )
+
+
+def _resolve_variant(
+    item: PurchaseItem,
+    details: dict[int, Product | Exception],
+) -> tuple[ProductVariant | None, PurchaseItemFeasibility | None]:
+    """Find the variant an item refers to, or build the error result explaining why it cannot be found."""
+
+    def error(code: str, message: str) -> PurchaseItemFeasibility:
+        return PurchaseItemFeasibility(
+            product_id=item.product_id,
+            variant_id=item.variant_id,
+            requested_quantity=item.quantity,
+            is_feasible=False,
+            error_code=code,
+            message=message,
+        )
+
+    detail = details[item.product_id]
+    if isinstance(detail, ProductNotFoundError) or (
+        isinstance(detail, httpx.HTTPStatusError) and detail.response.status_code == 404
+    ):
+        return None, error("PRODUCT_NOT_FOUND", f"Product {item.product_id} not found")
+    if isinstance(detail, Exception):
+        return None, error("PRODUCT_UNAVAILABLE", f"Could not fetch product {item.product_id}, please retry")
+
+    if item.variant_id is not None:
+        for variant in detail.variants:
+            if variant.id == item.variant_id:
+                return variant, None
+        return None, error("VARIANT_NOT_FOUND", f"Variant {item.variant_id} not found in product {item.product_id}")
+
+    if len(detail.variants) == 1:
+        return detail.variants[0], None
+    if not detail.variants:
+        return None, error("NO_VARIANTS", f"Product {item.product_id} has no purchasable variants")
+    choices = ", ".join(f"{variant.id} ({variant.title})" for variant in detail.variants)
+    return None, error(
+        "VARIANT_REQUIRED",
+        f"Product {item.product_id} has several variants, choose one of: {choices}",
+    )
+
+
+def _check_stock(item: PurchaseItem, variant: ProductVariant, total_requested: int) -> PurchaseItemFeasibility:
+    """Check a resolved item against its variant's stock."""
+    if variant.inventory_availability in config.UNAVAILABLE_INVENTORY_AVAILABILITY:
+        is_feasible = False
+        message = f"Variant {variant.id} is {variant.inventory_availability}"
+    elif variant.quantity is None:
+        is_feasible = True
+        message = "Purchase is feasible"
+    elif total_requested <= variant.quantity:
+        is_feasible = True
+        message = "Purchase is feasible"
+    else:
+        is_feasible = False
+        message = f"Only {variant.quantity} units available, {total_requested} requested in total"
+
+    return PurchaseItemFeasibility(
+        product_id=item.product_id,
+        variant_id=variant.id,
+        requested_quantity=item.quantity,
+        available_stock=variant.quantity,
+        inventory_availability=variant.inventory_availability,
+        is_feasible=is_feasible,
+        error_code=None if is_feasible else "INSUFFICIENT_STOCK",
+        message=message,
+    )
@@ -1,17 +1,49 @@
 """Tool for discovering and searching products."""
 
-from typing import Literal
+import logging
+from typing import Annotated, Literal
 
-from pydantic import BaseModel
+from fastmcp import Context
+from pydantic import BaseModel, Field
 
-from dependencies import get_bigquery_client, get_embedding_client
+from dependencies import get_product_repository, get_requested_vector_search_options
 from mcp_instance import mcp
 from models.product import Product
-from repositories.product_repository import ProductRepository
+
+logger = logging.getLogger(__name__)
+
 
 class DiscoverProductsResponse(BaseModel):
     status: Literal["success", "error"]
     products: list[Product]
+    # Set when an upstream was unavailable and results come from a fallback path
+    degraded: bool = False
+    degraded_reason: str | None = None
+    # Pass as cursor to get the next page of a vector search
+    next_cursor: str | None = None
+    # Vector search results left out because the products no longer exist
+    missing_product_ids: list[int] | None = None
+
+
+class _ProductStream:
+    """Sends products to the client as progress notifications, in rank order."""
+
+    def __init__(self, ctx: Context):
+        self.ctx = ctx
+        self.sent = 0
+        self.total: int | None = None
+
+    async def send(self, product: Product, rank: int, total: int) -> None:
+        """Send a product, total being the number of products the response can still have."""
+        self.sent = rank
+        self.total = total
+        await self.ctx.report_progress(progress=rank, total=total, message=product.model_dump_json())
+
+    async def finish(self) -> None:
+        """Report completion against the number of products sent, if products were skipped after the last one."""
+        if self.total is not None and self.sent != self.total:
+            await self.ctx.report_progress(progress=self.sent, total=self.sent)
+
 
 # Description 後續可補[shop: 線上商店 ; pos_shop: POS商店 ; branch_store: 門市]
 
@@ -37,6 +69,15 @@ IMPORTANT: Use 'vector' mode when user query contains:
 
 Use 'keyword' mode ONLY for direct product names without extra words.
 
+Pagination:
+- 'keyword' mode: use page and per_page.
+- 'vector' mode: to get more results, pass the returned next_cursor as cursor together with
+  the same query; next_cursor is empty when there are no more results.
+
+Streaming:
+- Set stream=true to receive each product as a JSON progress notification message as soon as
+  it is available, in rank order. The complete response is still returned at the end.
+
 Filter options:
 - store_type: Filter by store type
   * 'shop': 線上商店 (Online store)
@@ -57,18 +98,28 @@ Filter options:
 async def discover_products(
     search_mode: Literal["keyword", "vector"],
     query: str,
-    page: int = 1,
-    per_page: int = 10,
+    page: Annotated[int, Field(ge=1)] = 1,
+    per_page: Annotated[int, Field(ge=1)] = 10,
     min_price: float | None = None,
     max_price: float | None = None,
     store_type: Literal["shop"] = "shop",
     genre: Literal["normal", "eticket", "combo"] | None = None,
-    sort_by: Literal["price-asc", "price-desc", "sell_from-asc", "sell_from-desc", "recent_days_sold-asc", "recent_days_sold-desc"] | None = None,
+    sort_by: Literal[
+        "price-asc", "price-desc", "sell_from-asc", "sell_from-desc", "recent_days_sold-asc", "recent_days_sold-desc"
+    ] | None = None,
+    cursor: str | None = None,
+    stream: bool = False,
+    ctx: Context | None = None,
 ) -> DiscoverProductsResponse:
-    repository = ProductRepository(
-        bigquery_client=get_bigquery_client(),
-        embedding_client=get_embedding_client(),
-    )
+    repository = get_product_repository()
+
+    product_stream = None
+    if stream:
+        if ctx is None:
+            logger.warning("Streaming requested without a request context, returning the products at the end only")
+        else:
+            product_stream = _ProductStream(ctx)
+    on_product = product_stream.send if product_stream is not None else None
 
     if search_mode == "keyword":
         products = await repository.list_products(
@@ -79,23 +130,40 @@ async def discover_products(
             genre=genre,
             min_price=min_price,
             max_price=max_price,
-            sort_by=sort_by or "recent_days_sold-desc",
+            sort_by=sort_by,
+            api_default_sort_by="recent_days_sold-desc",
         )
+        if on_product is not None:
+            # Keyword results arrive in a single response, stream them for a uniform client experience
+            for rank, product in enumerate(products, start=1):
+                await on_product(product, rank, len(products))
+        if product_stream is not None:
+            await product_stream.finish()
         return DiscoverProductsResponse(
             status="success",
             products=products
         )
     elif search_mode == "vector":
-        products = await repository.search_by_vector_similarity(
+        result = await repository.search_by_vector_similarity(
             query=query,
             limit=per_page,
             min_price=min_price,
             max_price=max_price,
             store_type=store_type,
             genre=genre,
+            page=page,
+            cursor=cursor,
+            on_product=on_product,
+            search_options=get_requested_vector_search_options(),
         )
+        if product_stream is not None:
+            await product_stream.finish()
 
         return DiscoverProductsResponse(
             status="success",
-            products=products
+            products=result.products,
+            degraded=result.degraded,
+            degraded_reason=result.degraded_reason,
+            next_cursor=result.next_cursor,
+            missing_product_ids=result.missing_product_ids,
         )
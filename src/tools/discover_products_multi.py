@@ -0,0 +1,90 @@
+"""Tool for searching products for several queries in one call."""
+
+import asyncio
+from typing import Annotated, Literal
+
+from pydantic import BaseModel, Field
+
+from dependencies import get_product_repository, get_requested_vector_search_options
+from mcp_instance import mcp
+from models.product import Product, ProductSearchResult
+
+
+class QueryProducts(BaseModel):
+    query: str
+    products: list[Product]
+    degraded: bool = False
+    degraded_reason: str | None = None
+    missing_product_ids: list[int] | None = None
+
+
+class DiscoverProductsMultiResponse(BaseModel):
+    status: Literal["success", "error"]
+    results: list[QueryProducts]
+
+
+@mcp.tool(
+    description="""Search for products for several needs at once, e.g. ["tent", "sleeping bag", "camping stove"].
+
+Prefer this over calling discover_products repeatedly when the user has several distinct needs.
+Search modes and filters behave like discover_products; results are returned per query, in the
+order of the queries, with up to per_page products each."""
+)
+async def discover_products_multi(
+    search_mode: Literal["keyword", "vector"],
+    queries: list[str],
+    per_page: Annotated[int, Field(ge=1)] = 10,
+    min_price: float | None = None,
+    max_price: float | None = None,
+    store_type: Literal["shop"] = "shop",
+    genre: Literal["normal", "eticket", "combo"] | None = None,
+    sort_by: Literal[
+        "price-asc", "price-desc", "sell_from-asc", "sell_from-desc", "recent_days_sold-asc", "recent_days_sold-desc"
+    ] | None = None,
+) -> DiscoverProductsMultiResponse:
+    repository = get_product_repository()
+
+    if not queries:
+        return DiscoverProductsMultiResponse(status="success", results=[])
+
+    if search_mode == "keyword":
+        product_lists = await asyncio.gather(
+            *[
+                repository.list_products(
+                    query=query if query else None,
+                    per_page=per_page,
+                    store_type=store_type,
+                    genre=genre,
+                    min_price=min_price,
+                    max_price=max_price,
+                    sort_by=sort_by,
+                    api_default_sort_by="recent_days_sold-desc",
+                )
+                for query in queries
+            ]
+        )
+        results = [ProductSearchResult(products=products) for products in product_lists]
+    else:
+        results = await repository.search_by_vector_similarity_multi(
+            queries=queries,
+            limit=per_page,
+            min_price=min_price,
+            max_price=max_price,
+            store_type=store_type,
+            genre=genre,
+            search_options=get_requested_vector_search_options(),
+        )
+
+    return DiscoverProductsMultiResponse(
+        status="success",
+        results=[
+            QueryProducts(
+                query=query,
+                products=result.products,
+                degraded=result.degraded,
+                degraded_reason=result.degraded_reason,
+                missing_product_ids=result.missing_product_ids,
+            )
+            for query, result in zip(queries, results)
+        ],
+    )
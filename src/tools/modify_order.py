@@ -1,24 +1,46 @@
 """Tool for modifying existing orders."""
 
+from context import get_shop_id
+from dependencies import get_customer_scope, get_idempotency_store
 from mcp_instance import mcp
+from services.idempotency import IdempotencyKeyReusedError
 
 
 @mcp.tool()
-def modify_order(
+async def modify_order(
     order_id: str,
-    modifications: dict
+    modifications: dict,
+    idempotency_key: str | None = None,
 ) -> dict:
     """
     Modify an existing order.
 
+    Retrying after a timeout is safe: a retry with the same idempotency_key (or, without one,
+    the same arguments) within the idempotency window returns the first result.
+
     Args:
         order_id: The order ID to modify
         modifications: Dictionary containing modifications
             (e.g., quantity, shipping_address, delivery_date)
+        idempotency_key: Optional unique key of this modification, reused when retrying it
 
     Returns:
         Dictionary containing modification confirmation
     """
+    try:
+        return await get_idempotency_store().run(
+            "modify_order",
+            get_shop_id(),
+            {"order_id": order_id, "modifications": modifications},
+            lambda: _modify_order(order_id, modifications),
+            idempotency_key=idempotency_key,
+            customer=get_customer_scope(),
+        )
+    except IdempotencyKeyReusedError as e:
+        return {"status": "error", "message": str(e), "error_code": "IDEMPOTENCY_KEY_REUSED"}
+
+
+async def _modify_order(order_id: str, modifications: dict) -> dict:
     # Mock order modification
     return {
         "status": "success",
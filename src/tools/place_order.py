@@ -1,26 +1,49 @@
 """Tool for placing orders."""
 
+from context import get_shop_id
+from dependencies import get_customer_scope, get_idempotency_store
 from mcp_instance import mcp
+from services.idempotency import IdempotencyKeyReusedError
 
 
 @mcp.tool()
-def place_order(
+async def place_order(
     product_id: str,
     quantity: int,
-    customer_info: dict
+    customer_info: dict,
+    idempotency_key: str | None = None,
 ) -> dict:
     """
     Place an order for a product.
 
+    Retrying after a timeout is safe: a retry with the same idempotency_key (or, without one,
+    the same arguments) within the idempotency window returns the first order instead of
+    placing another one.
+
     Args:
         product_id: The product ID to order
         quantity: Quantity to order
         customer_info: Dictionary containing customer information
             (name, email, phone, shipping_address, payment_method)
+        idempotency_key: Optional unique key of this order, reused when retrying it
 
     Returns:
         Dictionary containing order confirmation details
     """
+    try:
+        return await get_idempotency_store().run(
+            "place_order",
+            get_shop_id(),
+            {"product_id": product_id, "quantity": quantity, "customer_info": customer_info},
+            lambda: _place_order(product_id, quantity, customer_info),
+            idempotency_key=idempotency_key,
+            customer=get_customer_scope(),
+        )
+    except IdempotencyKeyReusedError as e:
+        return {"status": "error", "message": str(e), "error_code": "IDEMPOTENCY_KEY_REUSED"}
+
+
+async def _place_order(product_id: str, quantity: int, customer_info: dict) -> dict:
     # Mock order placement
     import random
     order_id = f"ORD-{random.randint(10000, 99999)}"
@@ -1,3 +1,3 @@
-from .logger import logger
+from .logger import SAMPLED, configure_logging
 
-__all__ = ["logger"]
+__all__ = ["SAMPLED", "configure_logging"]
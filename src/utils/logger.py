@@ -1,8 +1,103 @@
+"""Central, non-blocking logging setup.
+
+Records are put on an in-memory queue by the calling thread and formatted and written to
+stdout by a background listener thread, so logging never blocks the event loop on I/O.
+
+High-volume per-request messages are logged with extra=SAMPLED and only a LOG_SAMPLE_RATE
+fraction of them is kept. Use lazy %-style arguments so that messages dropped by the level
+or the sampler are never formatted:
+
+    logger.info("BigQuery executing: %.200s", sql, extra=SAMPLED)
+"""
+
+import atexit
+import json
 import logging
+import logging.handlers
+import queue
+import random
+import sys
 import time
+import traceback
+
+# Marks a record as high-volume, see SamplingFilter
+SAMPLED = {"sampled": True}
+
+# Attributes of every LogRecord, anything else was passed through extra=
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener: logging.handlers.QueueListener | None = None
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of records logged with extra=SAMPLED. Warnings and errors are always kept."""
+
+    def __init__(self, sample_rate: float):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, "sampled", False) or record.levelno >= logging.WARNING:
+            return True
+        return random.random() < self.sample_rate
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line, including fields passed through extra=."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and key != "sampled":
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = "".join(traceback.format_exception(*record.exc_info))
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread instead of the calling thread."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def configure_logging(level: str = "WARNING", json_format: bool = True, sample_rate: float = 0.01) -> None:
+    """
+    Configure the root logger once per process. Later calls are ignored.
+
+    Args:
+        level: Root log level name
+        json_format: Write JSON lines instead of plain text
+        sample_rate: Fraction of records logged with extra=SAMPLED that is kept
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if json_format:
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        formatter = logging.Formatter("%(asctime)s UTC - %(name)s - %(levelname)s - %(message)s")
+        formatter.converter = time.gmtime
+        stream_handler.setFormatter(formatter)
+
+    log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    queue_handler = _DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(sample_rate))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level.upper())
 
-logging.Formatter.converter = time.gmtime
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s UTC - %(name)s - %(levelname)s - %(message)s'
-)
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
@@ -0,0 +1,81 @@
+"""Compact in-memory embedding vectors.
+
+Embeddings arrive as lists of Python floats (a 24-byte object plus an 8-byte pointer per
+value, ~16 KB for 512 dimensions). EmbeddingVector stores them in one contiguous buffer:
+- float32: 4 bytes per value, lossless for Gemini embeddings
+- float16: 2 bytes per value
+- int8: 1 byte per value, symmetric scalar quantization with a stored scale
+
+Similarities are computed with math.sumprod over the buffers, which runs the loop in C.
+"""
+
+import array
+import math
+import struct
+from dataclasses import dataclass
+from typing import Literal, Sequence, get_args
+
+VectorDType = Literal["float32", "float16", "int8"]
+VECTOR_DTYPES: tuple[str, ...] = get_args(VectorDType)
+
+INT8_MAX = 127
+
+
+def _encode(values: Sequence[float], dtype: VectorDType) -> tuple[bytes | array.array, float]:
+    """Encode values into a buffer of the given dtype, returning (buffer, scale)."""
+    if dtype == "float32":
+        return array.array("f", values), 1.0
+    if dtype == "float16":
+        return struct.pack(f"{len(values)}e", *values), 1.0
+    if dtype == "int8":
+        peak = max((abs(value) for value in values), default=0.0)
+        scale = peak / INT8_MAX if peak else 1.0
+        return array.array("b", [round(value / scale) for value in values]), scale
+    raise ValueError(f"Unsupported vector dtype: {dtype}")
+
+
+def _view(buffer: bytes | array.array, dtype: VectorDType) -> memoryview:
+    """Zero-copy view of a buffer whose items are the stored (unscaled) values."""
+    view = memoryview(buffer)
+    return view.cast("B").cast("e") if dtype == "float16" else view
+
+
+@dataclass(slots=True, frozen=True)
+class EmbeddingVector:
+    """An embedding stored in a contiguous buffer, see the module docstring."""
+    dtype: VectorDType
+    buffer: bytes | array.array
+    # Multiply stored values by scale to get the original values (int8 only)
+    scale: float
+    # L2 norm of the decoded vector
+    norm: float
+
+    @classmethod
+    def from_values(cls, values: Sequence[float], dtype: VectorDType = "float32") -> "EmbeddingVector":
+        """Encode an embedding returned by EmbeddingClient."""
+        buffer, scale = _encode(values, dtype)
+        view = _view(buffer, dtype)
+        return cls(dtype=dtype, buffer=buffer, scale=scale, norm=math.sqrt(math.sumprod(view, view)) * scale)
+
+    def __len__(self) -> int:
+        return len(_view(self.buffer, self.dtype))
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the stored values in bytes."""
+        return _view(self.buffer, self.dtype).nbytes
+
+    def to_list(self) -> list[float]:
+        """Decode into a list of floats, e.g. for a BigQuery query parameter."""
+        values = _view(self.buffer, self.dtype).tolist()
+        return [value * self.scale for value in values] if self.scale != 1.0 else values
+
+    def dot(self, other: "EmbeddingVector") -> float:
+        """Dot product with another vector."""
+        return math.sumprod(_view(self.buffer, self.dtype), _view(other.buffer, other.dtype)) * self.scale * other.scale
+
+    def cosine(self, other: "EmbeddingVector") -> float:
+        """Cosine similarity with another vector, 0 if either is all zeros."""
+        if not self.norm or not other.norm:
+            return 0.0
+        return self.dot(other) / (self.norm * other.norm)
@@ -0,0 +1,6 @@
+"""Shared test setup: the server modules are imported from src/ as top-level modules."""
+
+import os
+
+# Config requires a port at import time, though nothing is served
+os.environ.setdefault("PORT", "8000")
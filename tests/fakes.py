@@ -0,0 +1,88 @@
+"""In-memory stand-ins for upstream clients."""
+
+from typing import Any, Callable
+
+import httpx
+
+
+def product_json(product_id: int, quantity: int | None = 10, price: float = 100.0) -> dict:
+    """Minimal Storefront product JSON with a single variant."""
+    return {
+        "id": product_id,
+        "title": f"Product {product_id}",
+        "price": price,
+        "variants": [
+            {
+                "id": product_id * 100,
+                "title": "Default",
+                "price": price,
+                "inventory_availability": "in_stock",
+                "quantity": quantity,
+            }
+        ],
+    }
+
+
+def http_status_error(status_code: int, url: str = "https://shop.cyberbiz.co/api") -> httpx.HTTPStatusError:
+    request = httpx.Request("GET", url)
+    return httpx.HTTPStatusError(
+        f"status {status_code}", request=request, response=httpx.Response(status_code, request=request)
+    )
+
+
+class FakeStorefrontClient:
+    """
+    Serves product JSON by ID through the detail and list endpoints, recording every request.
+
+    Args:
+        products: Product JSON by product ID
+        bulk_supported: Whether the list endpoint filters by ids, otherwise it ignores the filter
+        errors: Exception raised by the detail endpoint, by product ID
+    """
+
+    def __init__(
+        self,
+        products: dict[int, dict],
+        bulk_supported: bool = True,
+        errors: dict[int, Exception] | None = None,
+    ):
+        self.products = products
+        self.bulk_supported = bulk_supported
+        self.errors = errors or {}
+        self.requests: list[tuple[str, dict[str, Any] | None]] = []
+
+    async def get_json(
+        self,
+        shop_domain: str,
+        path: str,
+        endpoint: str,
+        params: dict[str, Any] | None = None,
+        timeout: float | None = None,
+        headers: dict[str, str] | None = None,
+    ) -> Any:
+        self.requests.append((endpoint, params))
+        if path == "/api/storefront/v1/products":
+            if self.bulk_supported and params and "ids" in params:
+                ids = [int(product_id) for product_id in params["ids"].split(",")]
+                return [self.products[product_id] for product_id in ids if product_id in self.products]
+            return list(self.products.values())
+        product_id = int(path.rsplit("/", 1)[1])
+        if product_id in self.errors:
+            raise self.errors[product_id]
+        if product_id not in self.products:
+            raise http_status_error(404, path)
+        return self.products[product_id]
+
+    async def get_revalidated(
+        self,
+        shop_domain: str,
+        path: str,
+        endpoint: str,
+        decode: Callable[[Any], Any],
+        params: dict[str, Any] | None = None,
+        timeout: float | None = None,
+    ) -> Any:
+        return decode(await self.get_json(shop_domain, path, endpoint, params=params, timeout=timeout))
+
+    def endpoints(self) -> list[str]:
+        return [endpoint for endpoint, _ in self.requests]
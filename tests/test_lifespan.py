@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+from fastmcp import Client
+
+import lifespan as lifespan_module
+from lifespan import lifespan
+from mcp_instance import mcp
+
+
+class FakeLoop:
+    """Stands in for the run() loop of the catalog syncer and invalidator."""
+
+    def __init__(self) -> None:
+        self.running = 0
+        self.started = 0
+
+    async def run(self) -> None:
+        self.started += 1
+        self.running += 1
+        try:
+            await asyncio.Event().wait()
+        finally:
+            self.running -= 1
+
+
+class FakeStateStore:
+    def __init__(self) -> None:
+        self.closed = 0
+
+    async def close(self) -> None:
+        self.closed += 1
+
+
+@pytest.fixture
+def state_store(monkeypatch) -> FakeStateStore:
+    state_store = FakeStateStore()
+    monkeypatch.setattr(lifespan_module, "get_state_store", lambda: state_store)
+    return state_store
+
+
+@pytest.fixture
+def syncer(monkeypatch, state_store) -> FakeLoop:
+    syncer = FakeLoop()
+    monkeypatch.setattr(lifespan_module, "get_catalog_syncer", lambda: syncer)
+    monkeypatch.setattr(lifespan_module, "get_catalog_invalidator", lambda: None)
+    return syncer
+
+
+@pytest.fixture
+def invalidator(monkeypatch, syncer) -> FakeLoop:
+    invalidator = FakeLoop()
+    monkeypatch.setattr(lifespan_module, "get_catalog_invalidator", lambda: invalidator)
+    return invalidator
+
+
+def test_sessions_share_one_syncer(syncer):
+    async def scenario() -> None:
+        async with lifespan():
+            async with Client(mcp) as first, Client(mcp) as second:
+                await asyncio.gather(first.ping(), second.ping())
+                assert syncer.running == 1
+            # Ending a session leaves the process's syncer running
+            await asyncio.sleep(0)
+            assert syncer.running == 1
+        assert syncer.running == 0
+
+    asyncio.run(scenario())
+
+    assert syncer.started == 1
+
+
+def test_state_store_is_closed_only_at_process_exit(syncer, state_store):
+    async def scenario() -> None:
+        async with lifespan():
+            # In stateless HTTP mode every request is a session of its own
+            for _ in range(3):
+                async with Client(mcp) as client:
+                    await client.ping()
+            assert state_store.closed == 0
+            assert syncer.running == 1
+
+    asyncio.run(scenario())
+
+    assert state_store.closed == 1
+    assert syncer.started == 1
+
+
+def test_sessions_share_one_invalidator(invalidator):
+    async def scenario() -> None:
+        async with lifespan():
+            async with Client(mcp) as first, Client(mcp) as second:
+                await asyncio.gather(first.ping(), second.ping())
+            # The invalidator, and the changes it recorded as applied, outlive the sessions
+            await asyncio.sleep(0)
+            assert invalidator.running == 1
+
+    asyncio.run(scenario())
+
+    assert invalidator.started == 1
+    assert invalidator.running == 0
@@ -0,0 +1,96 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastmcp.exceptions import ToolError
+from fastmcp.server.middleware import MiddlewareContext
+from mcp.types import CallToolRequestParams
+
+import metrics
+from context import DeadlineExceededError, deadline_passed, remaining_time, reset_deadline, set_deadline
+from middleware import DeadlineMiddleware
+from services.hedging import RequestHedger
+from services.storefront_client import StorefrontClient
+
+
+def tool_call() -> MiddlewareContext:
+    return MiddlewareContext(message=CallToolRequestParams(name="discover_products", arguments={}))
+
+
+def test_remaining_time_is_capped_by_the_deadline():
+    assert remaining_time(5.0) == 5.0
+    token = set_deadline(1.0)
+    try:
+        assert 0 < remaining_time(5.0) <= 1.0
+        assert remaining_time(0.5) == 0.5
+        assert not deadline_passed()
+    finally:
+        reset_deadline(token)
+    assert remaining_time(None) is None
+
+
+def test_no_upstream_call_starts_after_the_deadline():
+    requests = []
+    storefront_client = StorefrontClient(
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(requests.append)),
+        hedger=RequestHedger(enabled=False),
+    )
+
+    async def call() -> None:
+        token = set_deadline(0.001)
+        try:
+            time.sleep(0.002)
+            assert deadline_passed()
+            await storefront_client.get_json("deadline.cyberbiz.co", "/api/storefront/v1/products", "product_list")
+        finally:
+            reset_deadline(token)
+
+    with pytest.raises(DeadlineExceededError):
+        asyncio.run(call())
+    assert requests == []
+
+
+def test_tool_call_and_its_upstream_calls_are_cancelled_at_the_deadline():
+    cancelled = []
+
+    async def upstream() -> None:
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def call_next(context: MiddlewareContext) -> None:
+        async with asyncio.TaskGroup() as group:
+            group.create_task(upstream())
+            group.create_task(upstream())
+
+    before = metrics.snapshot().get("deadline.exceeded", 0)
+    with pytest.raises(ToolError, match="timed out after 0.1 seconds"):
+        asyncio.run(DeadlineMiddleware(default_timeout=0.1).on_call_tool(tool_call(), call_next))
+
+    assert cancelled == [True, True]
+    assert metrics.snapshot()["deadline.exceeded"] == before + 1
+
+
+def test_deadline_is_set_during_the_call_and_reset_after():
+    seen = []
+
+    async def call_next(context: MiddlewareContext) -> str:
+        seen.append(remaining_time())
+        return "result"
+
+    result = asyncio.run(DeadlineMiddleware(default_timeout=2.0).on_call_tool(tool_call(), call_next))
+
+    assert result == "result"
+    assert 0 < seen[0] <= 2.0
+    assert remaining_time() is None
+
+
+def test_other_timeouts_are_not_reported_as_the_deadline():
+    async def call_next(context: MiddlewareContext) -> None:
+        raise TimeoutError("upstream read timeout")
+
+    with pytest.raises(TimeoutError, match="upstream read timeout"):
+        asyncio.run(DeadlineMiddleware(default_timeout=2.0).on_call_tool(tool_call(), call_next))
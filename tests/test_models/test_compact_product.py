@@ -0,0 +1,90 @@
+from models.compact_product import CompactProduct, _UrlSuffix
+from models.product import Product
+
+CDN = "https://cdn.cyberbiz.co/shops/1/products/"
+
+
+def full_product() -> Product:
+    photo = {"thumb": CDN + "a_thumb.jpg", "large": CDN + "a_large.jpg", "original": CDN + "a.jpg"}
+    return Product.model_validate({
+        "id": 1,
+        "title": "運動鞋",
+        "handle": "sneaker",
+        "price": 1200.0,
+        "photo_urls": [CDN + "a.jpg", CDN + "b.jpg"],
+        "brief": "Light running shoes",
+        "slogan": "Run",
+        "vendor": "Nike",
+        "channel": "online",
+        "temperature_types": ["normal"],
+        "product_type": "shoes",
+        "store_type": "shop",
+        "genre": "normal",
+        "product_url": "https://shop.cyberbiz.co/products/sneaker",
+        "descriptions": [{"type": "main", "body_html": "<p>Breathable</p>"}, {"type": None, "body_html": None}],
+        "options": [{"name": "Size", "types": ["26", "27"]}],
+        "variants": [
+            {
+                "id": 100,
+                "title": "26",
+                "name": "Sneaker 26",
+                "options": ["26"],
+                "price": 1200.0,
+                "compare_at_price": 1500.0,
+                "max_usable_bonus": 50,
+                "inventory_availability": "in_stock",
+                "weight": 0.8,
+                "quantity": 3,
+                "featured_image": {"src": CDN + "a.jpg", "alt": "Sneaker", "sizes": [CDN + "a_thumb.jpg", 64]},
+                "photo_urls": [photo],
+            },
+            {
+                "id": 101,
+                "title": "27",
+                "options": ["27"],
+                "price": 1200.0,
+                "inventory_availability": "out_of_stock",
+                "quantity": 0,
+                "photo_urls": [photo, {"thumb": None, "large": CDN + "b.jpg", "original": None}],
+            },
+        ],
+    })
+
+
+def test_round_trip_preserves_every_field():
+    product = full_product()
+
+    assert CompactProduct.from_product(product).to_product() == product
+
+
+def test_round_trip_of_a_minimal_product():
+    product = Product.model_validate({"id": 2, "title": "Gift card", "variants": []})
+
+    compact = CompactProduct.from_product(product)
+
+    assert compact.url_prefix == ""
+    assert compact.to_product() == product
+
+
+def test_photo_urls_are_stored_as_suffixes_of_the_product_prefix():
+    compact = CompactProduct.from_product(full_product())
+
+    assert compact.url_prefix == CDN
+    assert compact.photo_urls == ("a.jpg", "b.jpg")
+    assert all(isinstance(url, _UrlSuffix) for url in compact.photo_urls)
+    assert compact.variants[0].featured_image.values[0] == "a.jpg"
+    # Strings outside the prefix are kept whole
+    assert compact.variants[0].featured_image.values[1] == "Sneaker"
+    assert not isinstance(compact.variants[0].featured_image.values[1], _UrlSuffix)
+
+
+def test_identical_strings_are_shared():
+    first = CompactProduct.from_product(full_product())
+    second = CompactProduct.from_product(full_product())
+
+    # The same photo on two variants of a product is one object
+    assert first.variants[0].photos[0][0] is first.variants[1].photos[0][0]
+    # Categorical strings are interned across products
+    assert first.vendor is second.vendor
+    assert first.variants[0].inventory_availability is second.variants[0].inventory_availability
+    assert first.variants[0].featured_image.keys is second.variants[0].featured_image.keys
@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+from cache import TTLCache
+from context import set_shop_domain, set_shop_id
+from models.order import Order
+from repositories.order_repository import OrderRepository
+from tests.fakes import http_status_error
+
+SHOP_DOMAIN = "shop.cyberbiz.co"
+
+
+@pytest.fixture(autouse=True)
+def shop_context():
+    set_shop_id(1)
+    set_shop_domain(SHOP_DOMAIN)
+
+
+class FakeOrderStorefront:
+    """Serves order JSON by ID, recording every request and the peak number of concurrent ones."""
+
+    def __init__(self, orders: dict[str, dict]):
+        self.orders = orders
+        self.requests: list[tuple[str, dict[str, str] | None]] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def get_json(self, shop_domain, path, endpoint, params=None, timeout=None, headers=None):
+        self.requests.append((path, headers))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+        finally:
+            self.in_flight -= 1
+        order_id = path.rsplit("/", 1)[1]
+        if order_id not in self.orders:
+            raise http_status_error(404, path)
+        return self.orders[order_id]
+
+
+def order_json(order_id: str) -> dict:
+    return {"id": order_id, "status": "open", "line_items": [{"title": "Shoe", "quantity": 1, "price": 100.0}]}
+
+
+def test_distinct_orders_are_fetched_once_and_concurrently():
+    storefront = FakeOrderStorefront({"A1": order_json("A1"), "A2": order_json("A2")})
+    repository = OrderRepository(storefront)  # type: ignore[arg-type]
+
+    orders = asyncio.run(repository.get_orders(["A1", "A2", "A1"], "token"))
+
+    assert list(orders) == ["A1", "A2"]
+    assert all(isinstance(order, Order) for order in orders.values())
+    assert sorted(path for path, _ in storefront.requests) == [
+        "/api/storefront/v1/orders/A1",
+        "/api/storefront/v1/orders/A2",
+    ]
+    assert storefront.max_in_flight == 2
+    assert storefront.requests[0][1] == {"Authorization": "Bearer token"}
+
+
+def test_failed_lookups_are_returned_per_order():
+    storefront = FakeOrderStorefront({"A1": order_json("A1")})
+    repository = OrderRepository(storefront)  # type: ignore[arg-type]
+
+    orders = asyncio.run(repository.get_orders(["A1", "B9"], "token"))
+
+    assert isinstance(orders["A1"], Order)
+    assert orders["B9"].response.status_code == 404
+
+
+def test_cached_orders_are_not_fetched_again_for_the_same_customer():
+    storefront = FakeOrderStorefront({"A1": order_json("A1")})
+    repository = OrderRepository(storefront, status_cache=TTLCache(maxsize=10, ttl=60))  # type: ignore[arg-type]
+
+    first = asyncio.run(repository.get_orders(["A1", "B9"], "token"))
+    second = asyncio.run(repository.get_orders(["A1", "B9"], "token"))
+
+    assert second["A1"] == first["A1"]
+    # Failures are not cached
+    assert [path for path, _ in storefront.requests].count("/api/storefront/v1/orders/A1") == 1
+    assert [path for path, _ in storefront.requests].count("/api/storefront/v1/orders/B9") == 2
+
+
+def test_cached_orders_are_not_shared_between_customers():
+    storefront = FakeOrderStorefront({"A1": order_json("A1")})
+    status_cache = TTLCache(maxsize=10, ttl=60)
+    repository = OrderRepository(storefront, status_cache=status_cache)  # type: ignore[arg-type]
+
+    asyncio.run(repository.get_orders(["A1"], "token"))
+    asyncio.run(repository.get_orders(["A1"], "other-token"))
+
+    assert len(storefront.requests) == 2
+    assert storefront.requests[1][1] == {"Authorization": "Bearer other-token"}
+    assert len(status_cache) == 2
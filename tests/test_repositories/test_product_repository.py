@@ -0,0 +1,177 @@
+import asyncio
+import time
+
+import pytest
+
+from cache import TTLCache
+from config import config
+from context import set_shop_domain, set_shop_id
+from models.product import Product
+from repositories.product_repository import ProductNotFoundError, ProductRepository
+from services.catalog_snapshot import CatalogSnapshot
+from services.search_cursors import SearchCursorStore
+from services.state_store import InMemoryStateStore
+from tests.fakes import FakeStorefrontClient, http_status_error, product_json
+
+SHOP_DOMAIN = "shop.cyberbiz.co"
+
+
+@pytest.fixture(autouse=True)
+def shop_context():
+    set_shop_id(1)
+    set_shop_domain(SHOP_DOMAIN)
+
+
+class FakeEmbeddingClient:
+    async def generate_embedding(self, text: str) -> list[float]:
+        return [0.1, 0.2]
+
+
+class FakeBigQueryClient:
+    """Returns the same ranked vector search rows for every query."""
+
+    def __init__(self, product_ids: list[int]):
+        self.rows = [
+            {"product_id": product_id, "content": f"Row {product_id}", "price": 10.0, "similarity_score": 0.9}
+            for product_id in product_ids
+        ]
+
+    async def query(self, sql: str, params: dict | None = None, kind: str = "default") -> list[dict]:
+        return [dict(row) for row in self.rows]
+
+
+def _repository(
+    storefront: FakeStorefrontClient,
+    bulk_fetch_support: TTLCache | None = None,
+    catalog_snapshot: CatalogSnapshot | None = None,
+    ranked_ids: list[int] | None = None,
+) -> ProductRepository:
+    return ProductRepository(
+        bigquery_client=FakeBigQueryClient(ranked_ids or []),  # type: ignore[arg-type]
+        embedding_client=FakeEmbeddingClient(),  # type: ignore[arg-type]
+        storefront_client=storefront,  # type: ignore[arg-type]
+        search_cursor_store=SearchCursorStore(InMemoryStateStore(maxsize=10), ttl=60),
+        catalog_snapshot=catalog_snapshot,
+        bulk_fetch_support=bulk_fetch_support,
+    )
+
+
+def test_bulk_fetch_keeps_order_and_reports_missing_and_malformed_products():
+    storefront = FakeStorefrontClient({1: product_json(1), 2: {"id": 2, "variants": "malformed"}, 4: product_json(4)})
+
+    details = asyncio.run(_repository(storefront).get_product_details([4, 3, 2, 1, 4]))
+
+    assert list(details) == [4, 3, 2, 1]
+    assert isinstance(details[4], Product) and isinstance(details[1], Product)
+    assert isinstance(details[3], ProductNotFoundError)
+    assert isinstance(details[2], Exception) and not isinstance(details[2], ProductNotFoundError)
+    assert storefront.endpoints() == ["product_bulk"]
+
+
+def test_shops_ignoring_the_id_filter_fall_back_to_single_fetches():
+    products = {product_id: product_json(product_id) for product_id in (1, 2, 3)}
+    storefront = FakeStorefrontClient(products, bulk_supported=False)
+    bulk_fetch_support = TTLCache(maxsize=10, ttl=60)
+    repository = _repository(storefront, bulk_fetch_support)
+
+    details = asyncio.run(repository.get_product_details([3, 1]))
+    asyncio.run(repository.get_product_details([2, 1]))
+
+    assert [product.id for product in details.values()] == [3, 1]
+    assert bulk_fetch_support.get(SHOP_DOMAIN) is False
+    assert storefront.endpoints() == ["product_bulk"] + ["product_detail"] * 4
+
+
+def test_a_failed_chunk_fails_only_its_products(monkeypatch):
+    monkeypatch.setattr(config, "PRODUCT_BULK_FETCH_SIZE", 2)
+    storefront = FakeStorefrontClient({product_id: product_json(product_id) for product_id in range(1, 5)})
+    repository = _repository(storefront)
+    fetch_chunk = repository._fetch_product_chunk
+
+    async def failing_fetch_chunk(product_ids, semaphore):
+        if 3 in product_ids:
+            raise RuntimeError("chunk failed")
+        return await fetch_chunk(product_ids, semaphore)
+
+    monkeypatch.setattr(repository, "_fetch_product_chunk", failing_fetch_chunk)
+
+    async def iterate():
+        return [item async for item in repository.iter_product_details([1, 2, 3, 4])]
+
+    details = asyncio.run(repository.get_product_details([1, 2, 3, 4]))
+    iterated = asyncio.run(iterate())
+
+    assert [type(detail) for detail in details.values()] == [Product, Product, RuntimeError, RuntimeError]
+    assert [(product_id, type(detail)) for product_id, detail in iterated] == [
+        (1, Product), (2, Product), (3, RuntimeError), (4, RuntimeError)
+    ]
+
+
+def test_lists_are_served_from_the_snapshot_only_after_a_recent_full_sync(tmp_path):
+    snapshot = CatalogSnapshot(path=str(tmp_path / "snapshot.db"), max_staleness=900)
+    snapshot.upsert_products(1, [(0, product_json(1, price=100.0)), (1, product_json(2, price=80.0))], time.time())
+    # The price has changed since the last full sync, which an incremental sync does not notice
+    storefront = FakeStorefrontClient({1: product_json(1, price=50.0), 2: product_json(2, price=80.0)})
+    repository = _repository(storefront, catalog_snapshot=snapshot)
+    snapshot.mark_synced(1, SHOP_DOMAIN, time.time() - 7200, full=True)
+    snapshot.mark_synced(1, SHOP_DOMAIN, time.time(), full=False)
+
+    products = asyncio.run(repository.list_products(sort_by="price-asc"))
+
+    assert [product.price for product in products] == [50.0, 80.0]
+    assert storefront.endpoints() == ["product_list"]
+
+    snapshot.mark_synced(1, SHOP_DOMAIN, time.time(), full=True)
+    storefront.requests.clear()
+
+    products = asyncio.run(repository.list_products(sort_by="price-asc"))
+    details = asyncio.run(repository.get_product_details([2, 1]))
+
+    assert [product.id for product in products] == [2, 1]
+    assert list(details) == [2, 1]
+    assert storefront.requests == []
+
+
+def test_vector_search_keeps_the_ranking_and_reports_missing_products():
+    storefront = FakeStorefrontClient({product_id: product_json(product_id) for product_id in (1, 5, 9)})
+    repository = _repository(storefront, ranked_ids=[5, 3, 9, 1])
+
+    result = asyncio.run(repository.search_by_vector_similarity("shoes", limit=10))
+
+    assert [product.id for product in result.products] == [5, 9, 1]
+    assert result.missing_product_ids == [3]
+    assert not result.degraded
+    assert storefront.endpoints() == ["product_bulk"]
+
+
+def test_streamed_products_arrive_in_rank_order_with_shrinking_totals():
+    storefront = FakeStorefrontClient({product_id: product_json(product_id) for product_id in (1, 5, 9)})
+    repository = _repository(storefront, ranked_ids=[5, 3, 9, 1])
+    streamed = []
+
+    async def on_product(product: Product, rank: int, total: int) -> None:
+        streamed.append((product.id, rank, total))
+
+    result = asyncio.run(repository.search_by_vector_similarity("shoes", limit=10, on_product=on_product))
+
+    assert streamed == [(5, 1, 4), (9, 2, 3), (1, 3, 3)]
+    assert result.missing_product_ids == [3]
+
+
+def test_unavailable_details_fall_back_to_the_search_row(monkeypatch):
+    # Single-product chunks, so that the shop ignoring the ID filter is detected and details are fetched one by one
+    monkeypatch.setattr(config, "PRODUCT_BULK_FETCH_SIZE", 1)
+    storefront = FakeStorefrontClient(
+        {product_id: product_json(product_id) for product_id in (1, 5)},
+        bulk_supported=False,
+        errors={5: http_status_error(503)},
+    )
+    repository = _repository(storefront, ranked_ids=[5, 1])
+
+    result = asyncio.run(repository.search_by_vector_similarity("shoes", limit=10))
+
+    assert [product.id for product in result.products] == [5, 1]
+    assert result.products[0].title == "Row 5"
+    assert result.degraded
+    assert result.degraded_reason == "product_details_unavailable"
+    assert result.missing_product_ids is None
@@ -0,0 +1,26 @@
+import pytest
+from starlette.testclient import TestClient
+
+import server
+from config import config
+
+
+@pytest.fixture
+def client() -> TestClient:
+    return TestClient(server.mcp.http_app())
+
+
+def test_metrics_are_disabled_without_a_token(client, monkeypatch):
+    monkeypatch.setattr(config, "METRICS_TOKEN", "")
+
+    assert client.get("/metrics").status_code == 404
+
+
+def test_metrics_require_the_token(client, monkeypatch):
+    monkeypatch.setattr(config, "METRICS_TOKEN", "secret")
+
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    response = client.get("/metrics", headers={"Authorization": "Bearer secret"})
+    assert response.status_code == 200
+    assert "memory" in response.json()
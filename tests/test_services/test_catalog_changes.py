@@ -0,0 +1,84 @@
+import asyncio
+import time
+
+import pytest
+
+from services.catalog_changes import CatalogChangeLog, CatalogInvalidator
+from services.catalog_snapshot import CatalogSnapshot
+from services.catalog_sync import CatalogRefreshError, CatalogSyncer
+from services.search_cursors import SearchCursorStore
+from services.state_store import InMemoryStateStore
+from tests.fakes import FakeStorefrontClient, http_status_error, product_json
+
+SHOP_ID = 1
+SHOP_DOMAIN = "shop.cyberbiz.co"
+
+
+@pytest.fixture
+def change_log() -> CatalogChangeLog:
+    return CatalogChangeLog(InMemoryStateStore(maxsize=100), retention=3600)
+
+
+@pytest.fixture
+def snapshot(tmp_path) -> CatalogSnapshot:
+    snapshot = CatalogSnapshot(path=str(tmp_path / "snapshot.db"), max_staleness=900)
+    products = [(rank, product_json(product_id)) for rank, product_id in enumerate((1, 2, 3))]
+    snapshot.upsert_products(SHOP_ID, products, time.time())
+    snapshot.mark_synced(SHOP_ID, SHOP_DOMAIN, time.time() - 10, full=True)
+    return snapshot
+
+
+def test_failed_refreshes_keep_products_and_are_retried(change_log, snapshot):
+    # Product 1 changed price, product 2 was unpublished, product 3 cannot be read for now
+    storefront = FakeStorefrontClient(
+        {1: product_json(1, price=50.0), 3: product_json(3)}, errors={3: http_status_error(503)}
+    )
+    syncer = CatalogSyncer(snapshot, storefront, interval=300, full_sync_interval=3600)  # type: ignore[arg-type]
+    invalidator = CatalogInvalidator(change_log, snapshot, syncer, poll_interval=1)
+    changed_at = asyncio.run(change_log.append(SHOP_ID, [1, 2, 3]))
+
+    with pytest.raises(CatalogRefreshError):
+        asyncio.run(invalidator.apply_changes(SHOP_ID, SHOP_DOMAIN))
+
+    assert snapshot.get_product(SHOP_ID, 1)["price"] == 50.0
+    assert snapshot.get_product(SHOP_ID, 2) is None
+    assert snapshot.get_product(SHOP_ID, 3) is not None
+    assert SHOP_ID not in invalidator._applied
+
+    storefront.errors.clear()
+    asyncio.run(invalidator.apply_changes(SHOP_ID, SHOP_DOMAIN))
+
+    assert invalidator._applied[SHOP_ID] == changed_at
+
+
+def test_cursors_drop_only_changed_rows_not_served_yet(change_log):
+    cursors = SearchCursorStore(InMemoryStateStore(maxsize=100), ttl=60, change_log=change_log)
+    rows = [{"product_id": product_id, "content": "", "price": 1.0} for product_id in range(1, 7)]
+
+    async def scenario():
+        search_id = await cursors.save(SHOP_ID, rows, "search")
+        await change_log.append(SHOP_ID, [1, 4])
+        first = await cursors.load(SHOP_ID, cursors.encode_cursor(search_id, 2), "search")
+        again = await cursors.load(SHOP_ID, cursors.encode_cursor(search_id, 2), "search")
+        return first, again
+
+    first, again = asyncio.run(scenario())
+
+    assert [row["product_id"] for row in first[1]] == [1, 2, 3, 5, 6]
+    assert first[1:] == again[1:]
+
+
+def test_cursors_skip_decoding_the_log_without_new_changes(change_log, monkeypatch):
+    cursors = SearchCursorStore(InMemoryStateStore(maxsize=100), ttl=60, change_log=change_log)
+
+    async def scenario():
+        await change_log.state_store.set(f"catalog_changes:{SHOP_ID}:latest", str(time.time() - 3600).encode(), 60)
+        search_id = await cursors.save(SHOP_ID, [{"product_id": 1}], "search")
+        return await cursors.load(SHOP_ID, cursors.encode_cursor(search_id, 0), "search")
+
+    async def decode(shop_id):
+        raise AssertionError("the change log was decoded")
+
+    monkeypatch.setattr(change_log, "get", decode)
+
+    assert asyncio.run(scenario()) is not None
@@ -0,0 +1,38 @@
+import time
+
+import pytest
+
+from services.catalog_snapshot import CatalogSnapshot
+
+SHOP_ID = 1
+
+
+@pytest.fixture
+def snapshot(tmp_path) -> CatalogSnapshot:
+    return CatalogSnapshot(path=str(tmp_path / "snapshot.db"), max_staleness=900)
+
+
+def test_not_fresh_before_a_full_sync(snapshot):
+    snapshot.mark_synced(SHOP_ID, "shop.cyberbiz.co", time.time(), full=False)
+
+    assert not snapshot.is_fresh(SHOP_ID)
+
+
+def test_incremental_sync_does_not_renew_freshness(snapshot):
+    # Only new listings were added, known products' prices and stock are two hours old
+    snapshot.mark_synced(SHOP_ID, "shop.cyberbiz.co", time.time() - 7200, full=True)
+    snapshot.mark_synced(SHOP_ID, "shop.cyberbiz.co", time.time(), full=False)
+
+    assert not snapshot.is_fresh(SHOP_ID)
+
+
+def test_recent_full_sync_is_fresh(snapshot):
+    snapshot.mark_synced(SHOP_ID, "shop.cyberbiz.co", time.time(), full=True)
+
+    assert snapshot.is_fresh(SHOP_ID)
+
+
+def test_stale_sync_is_not_fresh(snapshot):
+    snapshot.mark_synced(SHOP_ID, "shop.cyberbiz.co", time.time() - 1000, full=True)
+
+    assert not snapshot.is_fresh(SHOP_ID)
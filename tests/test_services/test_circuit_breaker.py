@@ -0,0 +1,41 @@
+import asyncio
+import time
+
+import httpx
+
+from context import reset_deadline, set_deadline
+from services.circuit_breaker import CircuitBreaker, CircuitState
+
+
+async def _timeout():
+    raise httpx.ReadTimeout("timed out")
+
+
+def _fail(breaker: CircuitBreaker) -> None:
+    try:
+        asyncio.run(breaker.call(_timeout))
+    except httpx.ReadTimeout:
+        pass
+
+
+def test_timeouts_count_as_failures_within_the_deadline():
+    breaker = CircuitBreaker("test", failure_threshold=2)
+    token = set_deadline(60)
+    try:
+        _fail(breaker)
+        _fail(breaker)
+    finally:
+        reset_deadline(token)
+    assert breaker.state == CircuitState.OPEN
+
+
+def test_timeouts_bound_by_the_request_deadline_are_not_failures():
+    breaker = CircuitBreaker("test", failure_threshold=2)
+    token = set_deadline(0.01)
+    try:
+        time.sleep(0.02)
+        _fail(breaker)
+        _fail(breaker)
+    finally:
+        reset_deadline(token)
+    assert breaker.state == CircuitState.CLOSED
@@ -0,0 +1,108 @@
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from google.api_core.exceptions import BadRequest
+
+from config import _parse_byte_limits
+from services.bigquery_ledger import BigQueryLedger
+from services.cyberbiz_bigquery_client import CyberbizBigQueryClient, _is_bytes_limit_exceeded
+
+BYTES_LIMIT_EXCEEDED = BadRequest(
+    "Query exceeded limit for bytes billed", errors=[{"reason": "bytesBilledLimitExceeded"}]
+)
+
+
+class FakeBigQueryClient:
+    """Records every job config, and runs jobs that return rows or raise an error."""
+
+    def __init__(self, rows: list[dict] | None = None, error: Exception | None = None):
+        self.rows = rows or []
+        self.error = error
+        self.job_configs = []
+
+    def query(self, sql, job_config, timeout=None):
+        self.job_configs.append(job_config)
+        created = datetime(2026, 10, 19, 8, 0, 0)
+        return SimpleNamespace(
+            job_id="job",
+            result=self._result,
+            num_dml_affected_rows=None,
+            total_bytes_processed=2048,
+            total_bytes_billed=10485760,
+            cache_hit=False,
+            slot_millis=120,
+            created=created,
+            started=created + timedelta(milliseconds=30),
+        )
+
+    def _result(self, timeout=None):
+        if self.error is not None:
+            raise self.error
+        return self.rows
+
+
+def test_byte_limit_of_the_query_kind_is_applied():
+    client = FakeBigQueryClient()
+    bigquery_client = CyberbizBigQueryClient(
+        client, shop_id=41001, max_bytes_billed={"default": 10_000, "vector_search": 2_000}
+    )
+
+    asyncio.run(bigquery_client.query("SELECT 1", kind="vector_search"))
+    asyncio.run(bigquery_client.query("SELECT 1", kind="order_lookup"))
+
+    assert [config.maximum_bytes_billed for config in client.job_configs] == [2_000, 10_000]
+
+
+def test_no_byte_limit_without_configuration():
+    client = FakeBigQueryClient()
+
+    asyncio.run(CyberbizBigQueryClient(client, shop_id=41002).query("SELECT 1"))
+
+    assert client.job_configs[0].maximum_bytes_billed is None
+
+
+def test_ledger_records_completed_jobs_by_shop_and_kind():
+    ledger = BigQueryLedger()
+    bigquery_client = CyberbizBigQueryClient(FakeBigQueryClient(rows=[{"id": 1}]), shop_id=41003, ledger=ledger)
+
+    rows = asyncio.run(bigquery_client.query("SELECT 1", kind="vector_search"))
+
+    assert rows == [{"id": 1}]
+    [stats] = ledger.snapshot(41003)
+    assert stats["kind"] == "vector_search"
+    assert stats["jobs"] == 1
+    assert stats["bytes_billed"] == 10485760
+    assert stats["slot_ms"] == 120
+    assert stats["queue_ms"] == 30.0
+
+
+def test_ledger_counts_jobs_stopped_by_the_byte_limit():
+    ledger = BigQueryLedger()
+    bigquery_client = CyberbizBigQueryClient(
+        FakeBigQueryClient(error=BYTES_LIMIT_EXCEEDED), shop_id=41004, ledger=ledger, max_bytes_billed={"default": 1}
+    )
+
+    with pytest.raises(BadRequest):
+        asyncio.run(bigquery_client.query("SELECT 1", kind="vector_search"))
+
+    [stats] = ledger.snapshot(41004)
+    assert stats["errors"] == 1
+    assert stats["bytes_limit_exceeded"] == 1
+    assert stats["jobs"] == 0
+
+
+def test_other_bad_requests_are_not_byte_limit_errors():
+    assert _is_bytes_limit_exceeded(BYTES_LIMIT_EXCEEDED)
+    assert not _is_bytes_limit_exceeded(BadRequest("Syntax error", errors=[{"reason": "invalidQuery"}]))
+    assert not _is_bytes_limit_exceeded(TimeoutError())
+
+
+def test_byte_limits_setting_is_parsed_per_kind():
+    assert _parse_byte_limits("default=100, vector_search=20,") == {"default": 100, "vector_search": 20}
+    assert _parse_byte_limits("") == {}
+
+
+def test_malformed_byte_limits_setting_disables_limits():
+    assert _parse_byte_limits("default=10GB,vector_search=20") == {}
@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+import metrics
+from services.hedging import HedgeBudget, LatencyTracker, RequestHedger
+
+ENDPOINT = "product_detail"
+
+
+def hedger(metric_prefix: str, latency: float = 0.01) -> RequestHedger:
+    tracker = LatencyTracker(min_samples=5)
+    for _ in range(5):
+        tracker.record(ENDPOINT, latency)
+    return RequestHedger(percentile=95, tracker=tracker, metric_prefix=metric_prefix)
+
+
+class SlowThenFast:
+    """Requests whose first attempt hangs and later attempts answer at once."""
+
+    def __init__(self) -> None:
+        self.attempts = 0
+        self.cancelled = 0
+
+    async def __call__(self) -> str:
+        self.attempts += 1
+        if self.attempts == 1:
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                self.cancelled += 1
+                raise
+            return "primary"
+        return "hedge"
+
+
+def test_slow_request_is_hedged_and_the_loser_cancelled():
+    request = SlowThenFast()
+
+    result = asyncio.run(hedger("test_hedged").run(ENDPOINT, request))
+
+    assert result == "hedge"
+    assert request.attempts == 2
+    assert request.cancelled == 1
+    counters = metrics.snapshot()
+    assert counters["test_hedged.product_detail.hedges_fired"] == 1
+    assert counters["test_hedged.product_detail.hedges_won"] == 1
+
+
+def test_hedges_are_skipped_when_the_budget_is_spent():
+    request_hedger = hedger("test_budget", latency=0.001)
+    request_hedger.budget = HedgeBudget(ratio=0, burst=0)
+
+    async def slow() -> str:
+        await asyncio.sleep(0.02)
+        return "primary"
+
+    assert asyncio.run(request_hedger.run(ENDPOINT, slow)) == "primary"
+    counters = metrics.snapshot()
+    assert counters["test_budget.product_detail.hedges_skipped"] == 1
+    assert "test_budget.product_detail.hedges_fired" not in counters
+
+
+def test_no_hedge_before_enough_latencies_are_known():
+    request_hedger = RequestHedger(tracker=LatencyTracker(min_samples=5), metric_prefix="test_cold")
+
+    async def request() -> str:
+        await asyncio.sleep(0.01)
+        return "primary"
+
+    assert asyncio.run(request_hedger.run(ENDPOINT, request)) == "primary"
+    assert "test_cold.product_detail.hedges_skipped" not in metrics.snapshot()
+
+
+def test_failed_attempts_are_recorded_in_the_latency_window():
+    tracker = LatencyTracker(min_samples=1)
+    request_hedger = RequestHedger(tracker=tracker, metric_prefix="test_failed")
+
+    async def failing() -> str:
+        raise RuntimeError("upstream error")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(request_hedger.run(ENDPOINT, failing))
+
+    assert tracker.percentile(ENDPOINT, 50) is not None
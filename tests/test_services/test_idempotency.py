@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+
+import dependencies
+from config import config
+from services.idempotency import IdempotencyKeyReusedError, IdempotencyStore
+from services.state_store import InMemoryStateStore
+
+SHOP_ID = 1
+
+
+class Counter:
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self) -> dict:
+        self.calls += 1
+        return {"order_id": self.calls}
+
+
+def _store(derived_ttl: float = 10) -> IdempotencyStore:
+    return IdempotencyStore(InMemoryStateStore(maxsize=100), ttl=3600, lock_ttl=30, derived_ttl=derived_ttl)
+
+
+def test_derived_keys_only_absorb_duplicates_within_their_window():
+    store = _store(derived_ttl=0.05)
+    call = Counter()
+
+    async def scenario():
+        first = await store.run("place_order", SHOP_ID, {"product_id": "1"}, call)
+        duplicate = await store.run("place_order", SHOP_ID, {"product_id": "1"}, call)
+        await asyncio.sleep(0.1)
+        repeated = await store.run("place_order", SHOP_ID, {"product_id": "1"}, call)
+        return first, duplicate, repeated
+
+    first, duplicate, repeated = asyncio.run(scenario())
+
+    assert first == duplicate == {"order_id": 1}
+    assert repeated == {"order_id": 2}
+
+
+def test_client_keys_are_scoped_to_the_customer():
+    store = _store()
+    call = Counter()
+
+    async def scenario():
+        alice = await store.run("place_order", SHOP_ID, {"product_id": "1"}, call, "key-1", customer="sub:alice")
+        bob = await store.run("place_order", SHOP_ID, {"product_id": "1"}, call, "key-1", customer="sub:bob")
+        retry = await store.run("place_order", SHOP_ID, {"product_id": "1"}, call, "key-1", customer="sub:alice")
+        return alice, bob, retry
+
+    alice, bob, retry = asyncio.run(scenario())
+
+    assert alice == retry == {"order_id": 1}
+    assert bob == {"order_id": 2}
+
+
+def test_retries_replay_the_first_result_and_join_running_calls():
+    store = _store()
+    call = Counter()
+
+    async def slow_call() -> dict:
+        await asyncio.sleep(0.05)
+        return await call()
+
+    async def scenario():
+        first, duplicate = await asyncio.gather(
+            store.run("cancel_order", SHOP_ID, {"order_id": "1"}, slow_call, "key-1"),
+            store.run("cancel_order", SHOP_ID, {"order_id": "1"}, slow_call, "key-1"),
+        )
+        retry = await store.run("cancel_order", SHOP_ID, {"order_id": "1"}, slow_call, "key-1")
+        return first, duplicate, retry
+
+    first, duplicate, retry = asyncio.run(scenario())
+
+    assert first == duplicate == retry == {"order_id": 1}
+    assert call.calls == 1
+
+
+def test_reusing_a_key_with_other_arguments_is_refused():
+    store = _store()
+
+    async def scenario():
+        await store.run("cancel_order", SHOP_ID, {"order_id": "1"}, Counter(), "key-1")
+        await store.run("cancel_order", SHOP_ID, {"order_id": "2"}, Counter(), "key-1")
+
+    with pytest.raises(IdempotencyKeyReusedError):
+        asyncio.run(scenario())
+
+
+def test_search_cursor_traffic_does_not_evict_idempotent_results():
+    store = dependencies.get_idempotency_store()
+    cursor_store = dependencies.get_state_store()
+    call = Counter()
+
+    async def scenario():
+        first = await store.run("place_order", SHOP_ID, {"product_id": "1"}, call, "key-1")
+        for i in range(config.STATE_STORE_MAX_ENTRIES + 1):
+            await cursor_store.set(f"search_cursor:{i}", b"rows", 60)
+        retry = await store.run("place_order", SHOP_ID, {"product_id": "1"}, call, "key-1")
+        return first, retry
+
+    first, retry = asyncio.run(scenario())
+
+    assert first == retry == {"order_id": 1}
+    assert store.state_store is not cursor_store
@@ -0,0 +1,142 @@
+import asyncio
+import time
+
+import pytest
+
+from cache import MemoryBudget
+from repositories.product_repository import ProductRepository
+from services.catalog_snapshot import CatalogSnapshot
+from services.catalog_sync import CatalogSyncer
+from services.keyword_index import KeywordIndex, ShopKeywordIndex, tokenize
+from tests.fakes import FakeStorefrontClient, product_json
+
+SHOP_ID = 1
+SHOP_DOMAIN = "shop.cyberbiz.co"
+
+
+def titled_json(product_id: int, title: str) -> dict:
+    return {**product_json(product_id), "title": title}
+
+
+def product(product_id: int, title: str, **fields):
+    return ProductRepository._parse_product({**titled_json(product_id, title), **fields})
+
+
+@pytest.fixture
+def snapshot(tmp_path) -> CatalogSnapshot:
+    snapshot = CatalogSnapshot(path=str(tmp_path / "snapshot.db"), max_staleness=900)
+    items = [(product_id, titled_json(product_id, f"Blue shoe {product_id}")) for product_id in range(1, 11)]
+    snapshot.upsert_products(SHOP_ID, items, time.time())
+    snapshot.mark_synced(SHOP_ID, SHOP_DOMAIN, time.time(), full=True)
+    return snapshot
+
+
+def test_refreshed_products_are_updated_without_a_rebuild(snapshot):
+    # Product 1 was renamed, product 2 was unpublished
+    products = {product_id: titled_json(product_id, f"Blue shoe {product_id}") for product_id in range(3, 11)}
+    products[1] = titled_json(1, "Red boot")
+    keyword_index = KeywordIndex()
+    syncer = CatalogSyncer(
+        snapshot,
+        FakeStorefrontClient(products),  # type: ignore[arg-type]
+        interval=300,
+        full_sync_interval=3600,
+        keyword_index=keyword_index,
+        parse_product=ProductRepository._parse_product,
+    )
+    asyncio.run(syncer.rebuild_keyword_index(SHOP_ID))
+    before = keyword_index.get(SHOP_ID)
+    assert before is not None
+
+    asyncio.run(syncer.refresh_products(SHOP_ID, SHOP_DOMAIN, [1, 2]))
+
+    after = keyword_index.get(SHOP_ID)
+    assert after is not None and after is not before
+    assert after.built_at == before.built_at
+    assert [found.id for found in after.search("red")] == [1]
+    assert {found.id for found in after.search("blue shoe", per_page=20)} == set(range(3, 11))
+    # Searches holding the previous index still see the catalog as it was
+    assert {found.id for found in before.search("blue shoe", per_page=20)} == set(range(1, 11))
+    assert before.search("red") == []
+
+
+def test_updated_products_keep_their_rank():
+    index = ShopKeywordIndex.build([(0, product(1, "shoe")), (1, product(2, "shoe"))])
+
+    index = index.updated([product(1, "shoe")], [])
+
+    assert [found.id for found in index.search("shoe", sort_by="sell_from-desc")] == [1, 2]
+
+
+def test_updates_stop_once_too_many_documents_are_stale():
+    index = ShopKeywordIndex.build([(rank, product(product_id, "shoe")) for rank, product_id in enumerate(range(1, 5))])
+
+    index = index.updated([product(1, "boot")], [])
+    assert not index.needs_rebuild
+    index = index.updated([product(2, "boot")], [])
+    # Two of the six documents are stale now
+    assert index.needs_rebuild
+
+
+def test_evicted_indexes_fall_back_to_the_api_until_the_next_full_sync(snapshot):
+    index = ShopKeywordIndex.build([(0, product(1, "shoe"))])
+    budget = MemoryBudget(max_bytes=index.nbytes * 3 // 2)
+    keyword_index = KeywordIndex(budget=budget)
+    keyword_index.set(SHOP_ID, index)
+    assert budget.used_bytes == index.nbytes
+
+    # Searched, so it is kept over the other shop's index
+    assert keyword_index.get(SHOP_ID) is index
+    keyword_index.set(2, ShopKeywordIndex.build([(0, product(2, "shoe"))]))
+
+    assert keyword_index.get(2) is None
+    assert keyword_index.get(SHOP_ID) is index
+    assert budget.snapshot()["caches"]["keyword_index"]["evictions"] == 1
+    # Not rebuilt before the shop's next full sync
+    assert not keyword_index.needs_build(2)
+    assert keyword_index.needs_build(3)
+
+
+def test_tokenize_splits_cjk_into_bigrams_and_normalizes_width_and_case():
+    assert tokenize("Nike 運動鞋") == ["nike", "運動", "動鞋"]
+    assert tokenize("ＮＩＫＥ　Air-Max 90") == ["nike", "air", "max", "90"]
+    assert tokenize("鞋") == ["鞋"]
+
+
+def test_title_matches_rank_above_description_matches():
+    index = ShopKeywordIndex.build(
+        [
+            (0, product(1, "Canvas bag", brief="Fits a running shoe")),
+            (1, product(2, "Running shoe")),
+            (2, product(3, "Socks")),
+        ]
+    )
+
+    assert [found.id for found in index.search("running shoe")] == [2, 1]
+    assert index.search("hat") == []
+
+
+def test_rare_terms_outweigh_common_ones():
+    titles = ["Red shoe", "Blue shoe", "Green shoe", "Red hat"]
+    index = ShopKeywordIndex.build([(rank, product(rank + 1, title)) for rank, title in enumerate(titles)])
+
+    # "hat" is in one document, "shoe" in three
+    assert index.search("shoe hat")[0].id == 4
+    assert index.search("blue shoe")[0].id == 2
+
+
+def test_cjk_queries_match_bigrams():
+    index = ShopKeywordIndex.build([(0, product(1, "男款運動鞋")), (1, product(2, "運動外套"))])
+
+    assert [found.id for found in index.search("運動鞋")] == [1, 2]
+
+
+def test_filters_sorts_and_pages():
+    prices = {1: 300.0, 2: 100.0, 3: 200.0}
+    index = ShopKeywordIndex.build([(rank, product(rank + 1, "shoe", price=prices[rank + 1])) for rank in range(3)])
+
+    assert [found.id for found in index.search("shoe", sort_by="price-asc")] == [2, 3, 1]
+    assert [found.id for found in index.search("shoe", sort_by="price-desc", per_page=2, page=2)] == [2]
+    assert [found.id for found in index.search("shoe", min_price=150, max_price=250)] == [3]
+    with pytest.raises(ValueError):
+        index.search("shoe", sort_by="recent_days_sold-desc")
@@ -0,0 +1,15 @@
+import base64
+
+from services.search_cursors import SearchCursorStore
+
+
+def test_cursor_round_trip():
+    cursor = SearchCursorStore.encode_cursor("search-1", 20)
+
+    assert SearchCursorStore.decode_cursor(cursor) == ("search-1", 20)
+
+
+def test_negative_offsets_are_rejected():
+    cursor = base64.urlsafe_b64encode(b"search-1:-10").decode()
+
+    assert SearchCursorStore.decode_cursor(cursor) is None
@@ -0,0 +1,98 @@
+import asyncio
+
+import httpx
+
+import metrics
+from cache import TTLCache
+from models.product import Product
+from services.hedging import RequestHedger
+from services.storefront_client import StorefrontClient
+from tests.fakes import product_json
+
+PATH = "/api/storefront/v1/products/1"
+
+
+class ConditionalServer:
+    """Serves one product JSON with an ETag and answers matching conditional GETs with 304."""
+
+    def __init__(self, etag: str | None = '"v1"', last_modified: str | None = None):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.requests: list[httpx.Request] = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        headers = {}
+        if self.etag:
+            headers["ETag"] = self.etag
+        if self.last_modified:
+            headers["Last-Modified"] = self.last_modified
+        if self.etag and request.headers.get("If-None-Match") == self.etag:
+            return httpx.Response(304, headers=headers)
+        if self.last_modified and request.headers.get("If-Modified-Since") == self.last_modified:
+            return httpx.Response(304, headers=headers)
+        return httpx.Response(200, json=product_json(1), headers=headers)
+
+
+def client(server: ConditionalServer) -> StorefrontClient:
+    return StorefrontClient(
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(server)),
+        hedger=RequestHedger(enabled=False),
+        revalidation_cache=TTLCache(maxsize=10, ttl=60),
+    )
+
+
+def get_product(storefront_client: StorefrontClient, shop_domain: str) -> Product:
+    return asyncio.run(storefront_client.get_revalidated(
+        shop_domain, PATH, endpoint="test_revalidation", decode=Product.model_validate
+    ))
+
+
+def test_not_modified_response_returns_the_cached_product():
+    server = ConditionalServer()
+    storefront_client = client(server)
+
+    first = get_product(storefront_client, "etag.cyberbiz.co")
+    second = get_product(storefront_client, "etag.cyberbiz.co")
+
+    assert "If-None-Match" not in server.requests[0].headers
+    assert server.requests[1].headers["If-None-Match"] == '"v1"'
+    # The decoded product is shared rather than decoded again
+    assert second is first
+    assert metrics.snapshot()["revalidation.test_revalidation.not_modified"] >= 1
+
+
+def test_last_modified_is_revalidated():
+    server = ConditionalServer(etag=None, last_modified="Mon, 19 Oct 2026 08:00:00 GMT")
+    storefront_client = client(server)
+
+    first = get_product(storefront_client, "last-modified.cyberbiz.co")
+    second = get_product(storefront_client, "last-modified.cyberbiz.co")
+
+    assert server.requests[1].headers["If-Modified-Since"] == "Mon, 19 Oct 2026 08:00:00 GMT"
+    assert second is first
+
+
+def test_changed_response_replaces_the_cached_product():
+    server = ConditionalServer()
+    storefront_client = client(server)
+
+    first = get_product(storefront_client, "changed.cyberbiz.co")
+    server.etag = '"v2"'
+    second = get_product(storefront_client, "changed.cyberbiz.co")
+    third = get_product(storefront_client, "changed.cyberbiz.co")
+
+    assert second is not first
+    assert server.requests[2].headers["If-None-Match"] == '"v2"'
+    assert third is second
+
+
+def test_responses_without_validators_are_not_cached():
+    server = ConditionalServer(etag=None)
+    storefront_client = client(server)
+
+    get_product(storefront_client, "no-validators.cyberbiz.co")
+    get_product(storefront_client, "no-validators.cyberbiz.co")
+
+    assert "If-None-Match" not in server.requests[1].headers
+    assert len(storefront_client.revalidation_cache) == 0
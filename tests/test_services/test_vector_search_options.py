@@ -0,0 +1,37 @@
+import logging
+
+from config import config
+from dependencies import get_vector_search_options
+from services.vector_search_options import VectorSearchOptions, VectorSearchOptionsResolver
+
+resolver = VectorSearchOptionsResolver.from_config(
+    '{"default": {"fraction_lists_to_search": 0.02}, "2": {"use_brute_force": true}}', max_requested_fraction=0.1
+)
+
+
+def test_requested_fraction_is_capped():
+    options = resolver.resolve(1, VectorSearchOptions(fraction_lists_to_search=1))
+
+    assert options == VectorSearchOptions(fraction_lists_to_search=0.1)
+
+
+def test_brute_force_is_only_used_for_shops_configured_with_it():
+    requested = VectorSearchOptions(use_brute_force=True)
+
+    assert resolver.resolve(1, requested) == VectorSearchOptions(fraction_lists_to_search=0.02)
+    assert resolver.resolve(2, requested) == requested
+
+
+def test_malformed_config_falls_back_to_default_options_and_is_logged_once(monkeypatch, caplog):
+    monkeypatch.setattr(config, "VECTOR_SEARCH_OPTIONS", '{"default": {"fraction_lists_to_search": 5}}')
+    get_vector_search_options.cache_clear()
+    try:
+        with caplog.at_level(logging.ERROR, logger="dependencies"):
+            first = get_vector_search_options()
+            second = get_vector_search_options()
+    finally:
+        get_vector_search_options.cache_clear()
+
+    assert first is second
+    assert first.resolve(1) == VectorSearchOptions()
+    assert len([record for record in caplog.records if "VECTOR_SEARCH_OPTIONS" in record.getMessage()]) == 1
@@ -0,0 +1,57 @@
+import asyncio
+import sys
+import time
+
+import pytest
+from pydantic import ValidationError
+
+from context import set_shop_domain, set_shop_id
+from repositories.product_repository import ProductRepository
+from services.catalog_snapshot import CatalogSnapshot
+from tests.fakes import FakeStorefrontClient, product_json
+from tools.check_purchase_feasibility import PurchaseItem
+
+SHOP_ID = 1
+SHOP_DOMAIN = "shop.cyberbiz.co"
+
+# The tools package re-exports the tool under the module's name
+tool = sys.modules["tools.check_purchase_feasibility"]
+
+
+@pytest.fixture
+def snapshot(tmp_path) -> CatalogSnapshot:
+    snapshot = CatalogSnapshot(path=str(tmp_path / "snapshot.db"), max_staleness=900)
+    # The snapshot still has stock that has since been sold
+    snapshot.upsert_products(SHOP_ID, [(0, product_json(1, quantity=100))], time.time())
+    snapshot.mark_synced(SHOP_ID, SHOP_DOMAIN, time.time(), full=True)
+    return snapshot
+
+
+def test_stock_is_read_from_the_api_not_the_snapshot(snapshot, monkeypatch):
+    set_shop_id(SHOP_ID)
+    set_shop_domain(SHOP_DOMAIN)
+    storefront = FakeStorefrontClient({1: product_json(1, quantity=2)})
+    repository = ProductRepository(
+        bigquery_client=None,  # type: ignore[arg-type]
+        embedding_client=None,  # type: ignore[arg-type]
+        storefront_client=storefront,  # type: ignore[arg-type]
+        search_cursor_store=None,  # type: ignore[arg-type]
+        catalog_snapshot=snapshot,
+    )
+    monkeypatch.setattr(tool, "get_product_repository", lambda: repository)
+
+    response = asyncio.run(tool.check_purchase_feasibility.fn([PurchaseItem(product_id=1, quantity=5)]))
+
+    assert not response.is_feasible
+    assert response.items[0].available_stock == 2
+    assert storefront.requests
+
+
+def test_variant_id_without_product_id_is_rejected():
+    with pytest.raises(ValueError):
+        PurchaseItem(variant_id=100, quantity=1)  # type: ignore[call-arg]
+
+
+def test_empty_cart_is_rejected():
+    with pytest.raises(ValidationError):
+        asyncio.run(tool.check_purchase_feasibility.run({"items": []}))
@@ -0,0 +1,27 @@
+import asyncio
+
+import pytest
+from fastmcp import Client
+from fastmcp.exceptions import ToolError
+
+import tools  # noqa: F401
+from mcp_instance import mcp
+
+
+def call_tool(name: str, arguments: dict) -> None:
+    async def call() -> None:
+        async with Client(mcp) as client:
+            await client.call_tool(name, arguments)
+
+    asyncio.run(call())
+
+
+@pytest.mark.parametrize("page, per_page", [(0, 10), (1, 0), (1, -5)])
+def test_pages_must_be_positive(page, per_page):
+    with pytest.raises(ToolError, match="less than the minimum of 1"):
+        call_tool("discover_products", {"search_mode": "keyword", "query": "shoe", "page": page, "per_page": per_page})
+
+
+def test_multi_search_page_size_must_be_positive():
+    with pytest.raises(ToolError, match="less than the minimum of 1"):
+        call_tool("discover_products_multi", {"search_mode": "keyword", "queries": ["shoe"], "per_page": 0})